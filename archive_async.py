@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+"""
+Motor de Subida Asíncrono
+=========================
+
+Ejecuta muchas subidas a la vez con asyncio reutilizando la sesión
+HTTP compartida (ArchiveSession y su pool keep-alive) de ArchiveUploader.
+
+La librería internetarchive es bloqueante, así que todo lo que toca la
+red, el disco o el almacén de progreso pasa por un pool de hilos
+acotado: las subidas, el registro de identificadores y los metadatos,
+la lectura del flujo de archivos del escaneo y los callbacks de
+resultado (que sueltan leases de la cola compartida). El bucle de
+eventos solo planifica, y las tareas en espera no ocupan ningún hilo,
+tampoco las que esperan para reintentar un fallo transitorio.
+"""
+
+import asyncio
+import concurrent.futures
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Tuple
+
+from archive_retry import RetryLater
+
+# Subidas en vuelo por defecto
+DEFAULT_CONCURRENCY = 100
+
+# Hilos para las llamadas bloqueantes (red y disco)
+DEFAULT_IO_THREADS = 32
+
+
+class AsyncUploadEngine:
+    """Motor de subida basado en asyncio sobre un ArchiveUploader"""
+
+    def __init__(self, uploader, concurrency: int = DEFAULT_CONCURRENCY,
+                 io_threads: int = DEFAULT_IO_THREADS):
+        self.uploader = uploader
+        self.concurrency = max(1, concurrency)
+        self.io_threads = max(1, min(io_threads, self.concurrency))
+        self._executor = None
+
+    async def _run_io(self, func: Callable, *args):
+        """Ejecutar una llamada bloqueante en el pool de E/S"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def upload_file(self, file_path: Path) -> bool:
+        """Subir un archivo usando la sesión compartida"""
+        uploader = self.uploader
+
+        # Verificar si ya se subió
+        if await self._run_io(uploader.is_uploaded, str(file_path)):
+            uploader.logger.info(f"Archivo ya subido: {file_path.name}")
+            uploader.drop_media_info(file_path)
+            return True
+
+        while True:
+            try:
+                md5, duplicate = await self._run_io(uploader.check_duplicate, file_path)
+                if duplicate:
+                    uploader.drop_media_info(file_path)
+                    return True
+
+                identifier, metadata = await self._run_io(uploader.prepare_upload, file_path)
+                item = await self._run_io(uploader.transfer_file, file_path, identifier, metadata)
+                return await self._run_io(uploader.finish_upload, file_path, identifier, item, md5)
+            except Exception as e:
+                delay = await self._run_io(uploader.retry_delay, file_path, e)
+                if delay is None:
+                    await self._run_io(uploader.record_error, file_path, e)
+                    uploader.drop_media_info(file_path)
+                    return False
+                # Esperar sin ocupar un hilo de E/S
+                await asyncio.sleep(delay)
+
+    async def _drain(self, items: Iterable, start: Callable, on_done: Callable,
+                     should_stop: Optional[Callable[[], bool]] = None):
+        """Ejecutar start(item) para cada item manteniendo como máximo `concurrency` en vuelo
+
+        Los items se leen en el pool de E/S: el flujo puede ser el escaneo,
+        que lista directorios y hace la comprobación previa por lotes.
+        """
+        pending = set()
+        iterator = iter(items)
+        end = object()
+
+        while not (should_stop and should_stop()):
+            item = await self._run_io(next, iterator, end)
+            if item is end:
+                break
+            pending.add(asyncio.ensure_future(start(item)))
+            if len(pending) >= self.concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    on_done(task)
+
+        if pending:
+            done, _ = await asyncio.wait(pending)
+            for task in done:
+                on_done(task)
+
+    async def run(self, files: Iterable[Path],
+                  on_result: Optional[Callable[[Path, bool], None]] = None,
+                  should_stop: Optional[Callable[[], bool]] = None) -> Tuple[int, int]:
+        """Subir archivos de forma concurrente. Devuelve (exitosos, errores)"""
+        success_count = 0
+        error_count = 0
+
+        async def upload_one(file_path: Path) -> bool:
+            ok = await self.upload_file(file_path)
+            if on_result:
+                await self._run_io(on_result, file_path, ok)
+            return ok
+
+        def collect(task):
+            nonlocal success_count, error_count
+            try:
+                ok = task.result()
+            except Exception as e:
+                self.uploader.logger.error(f"❌ Error en tarea de subida: {e}")
+                ok = False
+            if ok:
+                success_count += 1
+            else:
+                error_count += 1
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.io_threads,
+                                                   thread_name_prefix='async-io') as executor:
+            self._executor = executor
+            try:
+                await self._drain(files, upload_one, collect, should_stop)
+            finally:
+                self._executor = None
+
+        return success_count, error_count
+
+    async def run_jobs(self, jobs: Iterable[Callable[[], Tuple[int, int]]]) -> Tuple[int, int]:
+        """Ejecutar trabajos bloqueantes (exitosos, errores), p. ej. items agrupados
+
+        Un trabajo que lanza RetryLater se repite tras su espera sin ocupar
+        ningún hilo de E/S, como en el pool de hilos del uploader.
+        """
+        success_count = 0
+        error_count = 0
+
+        async def run_job(job):
+            while True:
+                try:
+                    return await self._run_io(job)
+                except RetryLater as e:
+                    await asyncio.sleep(e.delay)
+
+        def collect(task):
+            nonlocal success_count, error_count
+            try:
+                job_success, job_errors = task.result()
+            except Exception as e:
+                self.uploader.logger.error(f"❌ Error en tarea de subida: {e}")
+                job_success, job_errors = 0, 1
+            success_count += job_success
+            error_count += job_errors
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.io_threads,
+                                                   thread_name_prefix='async-io') as executor:
+            self._executor = executor
+            try:
+                await self._drain(jobs, run_job, collect)
+            finally:
+                self._executor = None
+
+        return success_count, error_count
+
+    def upload_files(self, files: Iterable[Path],
+                     on_result: Optional[Callable[[Path, bool], None]] = None,
+                     should_stop: Optional[Callable[[], bool]] = None) -> Tuple[int, int]:
+        """Punto de entrada síncrono para la CLI y la GUI"""
+        return asyncio.run(self.run(files, on_result, should_stop))
+
+    def execute_jobs(self, jobs: Iterable[Callable[[], Tuple[int, int]]]) -> Tuple[int, int]:
+        """Punto de entrada síncrono para trabajos bloqueantes"""
+        return asyncio.run(self.run_jobs(jobs))
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+"""
+Disposición de Archivos Subidos
+===============================
+
+Decide qué pasa con cada archivo local una vez subido (y verificado):
+
+    move    se mueve a la carpeta "Uploaded" de su directorio
+    keep    se deja en su sitio; solo se anota en el progreso
+
+Mover nunca copia. Antes de tocar nada se confirma en el almacén de
+progreso una intención (origen -> destino); luego se crea un enlace duro
+en el destino, que falla de forma atómica si el nombre ya existe, y se
+borra el origen. Si el sistema de archivos no admite enlaces duros se usa
+un rename. Si la carpeta destino está en otro dispositivo, el archivo se
+deja en su sitio con un aviso en lugar de copiar varios GB.
+
+Si el proceso muere a mitad, al arrancar se revisan las intenciones
+pendientes: con el enlace ya hecho solo falta borrar el origen; con el
+origen ya borrado no falta nada; sin enlace se repite. Ningún caso obliga
+a copiar de nuevo ni deja dos copias sin saber cuál vale.
+"""
+
+import errno
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+DISPOSITION_MODES = ('move', 'keep')
+
+UPLOADED_FOLDER = 'Uploaded'
+
+# Nombres alternativos (archivo_1.ext, archivo_2.ext...) que se prueban si el destino ya existe
+MAX_NAME_ATTEMPTS = 1000
+
+# Errores de os.link que indican que el sistema de archivos no admite enlaces duros
+NO_HARDLINK_ERRORS = {errno.EPERM, errno.EACCES, errno.ENOTSUP, errno.EOPNOTSUPP, errno.EMLINK, errno.ENOSYS}
+
+
+class CrossDeviceError(OSError):
+    """La carpeta destino está en otro dispositivo: mover sería copiar"""
+
+
+class Disposer:
+    """Mueve (o deja en su sitio) los archivos subidos con un registro de intenciones"""
+
+    def __init__(self, store, mode: str = 'move', folder: str = UPLOADED_FOLDER, logger=None):
+        if mode not in DISPOSITION_MODES:
+            raise ValueError(f"Modo de disposición no válido: {mode}")
+        self.store = store
+        self.mode = mode
+        self.folder = folder
+        self.logger = logger
+        # Carpetas destino ya creadas en esta ejecución -> su dispositivo
+        self._folders: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _log(self, level: str, message: str):
+        if self.logger:
+            getattr(self.logger, level)(message)
+
+    def _target_folder(self, file_path: Path) -> Path:
+        """Carpeta destino de un archivo, creada una sola vez por ejecución
+
+        CrossDeviceError si está en otro dispositivo que el archivo.
+        """
+        folder = file_path.parent / self.folder
+        key = str(folder)
+        with self._lock:
+            device = self._folders.get(key)
+        if device is None:
+            folder.mkdir(exist_ok=True)
+            device = folder.stat().st_dev
+            with self._lock:
+                self._folders[key] = device
+        if os.stat(file_path).st_dev != device:
+            raise CrossDeviceError(errno.EXDEV, f"{folder} está en otro dispositivo")
+        return folder
+
+    def dispose(self, file_path: Path) -> Path:
+        """Aplicar el modo a un archivo subido; devuelve dónde quedó"""
+        if self.mode == 'keep':
+            return file_path
+        try:
+            folder = self._target_folder(file_path)
+        except FileNotFoundError:
+            self._log('warning', f"⚠️ {file_path.name} ya no está en su sitio; no se mueve")
+            return file_path
+        except CrossDeviceError as e:
+            self._log('warning', f"⚠️ {e}: {file_path.name} se deja en su sitio (moverlo sería copiarlo)")
+            return file_path
+
+        for attempt in range(MAX_NAME_ATTEMPTS):
+            name = file_path.name if attempt == 0 else f"{file_path.stem}_{attempt}{file_path.suffix}"
+            destination = folder / name
+            if os.path.lexists(destination):
+                continue
+            # Primero la intención: si el proceso muere ahora, recover() sabe qué estaba pasando
+            self.store.begin_disposition(str(file_path), str(destination))
+            if self._place(file_path, destination):
+                self.store.end_disposition(str(file_path))
+                self._log('info', f"📦 Movido a {destination}")
+                return destination
+        self.store.end_disposition(str(file_path))
+        self._log('error', f"❌ Sin nombre libre en {folder} para {file_path.name}; se deja en su sitio")
+        return file_path
+
+    def _place(self, file_path: Path, destination: Path) -> bool:
+        """Llevar el archivo al destino sin sobrescribir; False si el nombre se ocupó entre medias"""
+        try:
+            os.link(file_path, destination)
+        except FileExistsError:
+            return False
+        except OSError as e:
+            if e.errno not in NO_HARDLINK_ERRORS:
+                raise
+            # Sin enlaces duros: rename atómico, tras comprobar que el nombre sigue libre
+            if os.path.lexists(destination):
+                return False
+            os.rename(file_path, destination)
+            return True
+        os.unlink(file_path)
+        return True
+
+    def recover(self) -> Dict[str, str]:
+        """Terminar las disposiciones que una ejecución anterior dejó a medias
+
+        Devuelve origen -> dónde quedó, para anotarlo en el progreso.
+        """
+        pending = self.store.pending_dispositions()
+        if not pending:
+            return {}
+        self._log('info', f"🩹 Revisando {len(pending)} archivos que se estaban moviendo al cortarse la ejecución")
+        resolved = {}
+        for source, destination in pending:
+            location = self._recover_one(Path(source), Path(destination))
+            if location is not None:
+                resolved[source] = str(location)
+        return resolved
+
+    def _recover_one(self, source: Path, destination: Path) -> Optional[Path]:
+        source_exists = os.path.lexists(source)
+        if not source_exists:
+            self.store.end_disposition(str(source))
+            if os.path.lexists(destination):
+                return destination  # Terminado: solo faltaba borrar la intención
+            self._log('warning', f"⚠️ {source.name} no está ni en su sitio ni en {destination}")
+            return None
+        try:
+            if os.path.samefile(source, destination):
+                # El enlace se hizo y el origen no llegó a borrarse
+                os.unlink(source)
+                self.store.end_disposition(str(source))
+                return destination
+        except FileNotFoundError:
+            pass
+        # No se llegó a mover (o el destino es otro archivo): repetir desde el principio
+        self.store.end_disposition(str(source))
+        return self.dispose(source)
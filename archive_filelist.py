@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+
+"""
+Lista de Archivos Virtualizada
+==============================
+
+Modelo y vista para la lista de archivos de la GUI. El modelo guarda las
+filas en columnas (listas paralelas de nombre, tipo, tamaño y ruta) y
+una vista de índices para el orden y el filtro activos; la vista es un
+ttk.Treeview que solo tiene tantas filas como caben en pantalla y las
+reescribe al desplazarse. Así, insertar o limpiar un millón de archivos
+no crea un millón de items de Tk.
+
+Al añadir filas con un orden activo, se agregan al final de la vista y
+el reordenado se aplaza hasta que se pide una fila; la vista, además,
+agrupa los lotes que llegan seguidos en un solo repintado, así que un
+escaneo grande no reordena la lista en cada lote.
+"""
+
+import tkinter as tk
+from tkinter import ttk
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Tuple
+
+# Columnas ordenables: clave del modelo -> (columna del Treeview, título)
+FILELIST_COLUMNS = {
+    'name': ('#0', 'Archivo'),
+    'type': ('Tipo', 'Tipo'),
+    'size': ('Tamaño', 'Tamaño'),
+}
+
+ALL_TYPES = 'Todos'
+
+# Rangos de tamaño del filtro: etiqueta -> (mínimo, máximo) en bytes, límites incluidos
+SIZE_FILTERS = {
+    'Todos': (None, None),
+    '< 10 MB': (None, 10 * 1024 ** 2 - 1),
+    '10 MB - 100 MB': (10 * 1024 ** 2, 100 * 1024 ** 2 - 1),
+    '100 MB - 1 GB': (100 * 1024 ** 2, 1024 ** 3 - 1),
+    '> 1 GB': (1024 ** 3, None),
+}
+
+# Filas que se desplazan por cada paso de la rueda del ratón
+FILELIST_WHEEL_ROWS = 3
+
+
+class FileListModel:
+    """Filas de la lista en columnas, con una vista filtrada y ordenada"""
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.types: List[str] = []
+        self.sizes: List[int] = []
+        self.paths: List[Path] = []
+        self.total_bytes = 0
+        # None: todas las filas en orden de inserción (sin copiar índices)
+        self.view: Optional[List[int]] = None
+        self.type_filter: Optional[str] = None
+        self.size_range: Tuple[Optional[int], Optional[int]] = (None, None)
+        self.sort_column: Optional[str] = None
+        self.sort_reverse = False
+        self._unsorted = False
+
+    def __len__(self) -> int:
+        """Filas visibles con el filtro actual"""
+        return len(self.names) if self.view is None else len(self.view)
+
+    @property
+    def total(self) -> int:
+        """Filas cargadas, sin filtrar"""
+        return len(self.names)
+
+    def types_seen(self) -> List[str]:
+        return sorted(set(self.types))
+
+    def extend(self, rows: Iterable[Tuple[Path, str, int]]):
+        """Añadir en bloque filas (ruta, tipo, tamaño)"""
+        start = len(self.names)
+        for path, mediatype, size in rows:
+            self.names.append(path.name)
+            self.types.append(mediatype)
+            self.sizes.append(size)
+            self.paths.append(path)
+            self.total_bytes += size
+        if self.view is not None and len(self.names) > start:
+            self.view.extend(index for index in range(start, len(self.names)) if self._matches(index))
+            self._unsorted = self.sort_column is not None
+
+    def clear(self):
+        """Vaciar el modelo conservando el filtro y el orden elegidos"""
+        self.names, self.types, self.sizes, self.paths = [], [], [], []
+        self.total_bytes = 0
+        self._rebuild()
+
+    def set_filter(self, mediatype: Optional[str] = None,
+                   size_range: Tuple[Optional[int], Optional[int]] = (None, None)):
+        self.type_filter = mediatype
+        self.size_range = size_range
+        self._rebuild()
+
+    def sort_by(self, column: Optional[str], reverse: bool = False):
+        """Ordenar por 'name', 'type' o 'size'; None vuelve al orden del escaneo"""
+        self.sort_column = column
+        self.sort_reverse = reverse
+        self._rebuild()
+
+    def row(self, position: int) -> Tuple[str, str, int, Path]:
+        """Fila en la posición `position` de la vista: (nombre, tipo, tamaño, ruta)"""
+        if self._unsorted:
+            self._sort()
+        index = position if self.view is None else self.view[position]
+        return self.names[index], self.types[index], self.sizes[index], self.paths[index]
+
+    def _filtered(self) -> bool:
+        return self.type_filter is not None or self.size_range != (None, None)
+
+    def _matches(self, index: int) -> bool:
+        if self.type_filter is not None and self.types[index] != self.type_filter:
+            return False
+        minimum, maximum = self.size_range
+        size = self.sizes[index]
+        return (minimum is None or size >= minimum) and (maximum is None or size <= maximum)
+
+    def _rebuild(self):
+        if not self._filtered() and self.sort_column is None:
+            self.view = None
+            return
+        if self._filtered():
+            self.view = [index for index in range(len(self.names)) if self._matches(index)]
+        else:
+            self.view = list(range(len(self.names)))
+        self._sort()
+
+    def _sort(self):
+        self._unsorted = False
+        if self.sort_column is None:
+            return
+        column = {'name': self.names, 'type': self.types, 'size': self.sizes}[self.sort_column]
+        self.view.sort(key=column.__getitem__, reverse=self.sort_reverse)
+
+
+class VirtualFileList:
+    """Treeview que solo materializa las filas visibles de un FileListModel"""
+
+    def __init__(self, parent, model: FileListModel, format_size: Callable[[int], str], height: int = 6):
+        self.model = model
+        self.format_size = format_size
+        self.offset = 0
+        self.rows = height
+        self._items: List[str] = []
+        self._height = 0
+        self._refresh_pending = False
+
+        self.tree = ttk.Treeview(parent, columns=("Tipo", "Tamaño"), show="tree headings",
+                                 height=height, selectmode='browse')
+        for key, (column, title) in FILELIST_COLUMNS.items():
+            self.tree.heading(column, text=title, command=lambda key=key: self.toggle_sort(key))
+        self.tree.column("#0", width=300)
+        self.tree.column("Tipo", width=100)
+        self.tree.column("Tamaño", width=100)
+
+        # La barra no desplaza el Treeview (solo tiene las filas visibles), sino la vista del modelo
+        self.scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.yview)
+
+        self.tree.bind('<Configure>', self._on_configure)
+        self.tree.bind('<MouseWheel>', self._on_wheel)
+        self.tree.bind('<Button-4>', lambda event: self.scroll(-FILELIST_WHEEL_ROWS))
+        self.tree.bind('<Button-5>', lambda event: self.scroll(FILELIST_WHEEL_ROWS))
+        for key, step in (('<Prior>', 'page-up'), ('<Next>', 'page-down'),
+                          ('<Home>', 'home'), ('<End>', 'end')):
+            self.tree.bind(key, lambda event, step=step: self._on_key(step))
+        self.refresh()
+
+    def __len__(self) -> int:
+        return len(self.model)
+
+    # Cambios del modelo
+
+    def extend(self, rows: Iterable[Tuple[Path, str, int]]):
+        """Añadir filas; los lotes que llegan seguidos comparten un repintado"""
+        self.model.extend(rows)
+        if not self._refresh_pending:
+            self._refresh_pending = True
+            self.tree.after_idle(self.refresh)
+
+    def clear(self):
+        self.model.clear()
+        self.offset = 0
+        self.refresh()
+
+    def set_filter(self, mediatype: Optional[str] = None,
+                   size_range: Tuple[Optional[int], Optional[int]] = (None, None)):
+        self.model.set_filter(mediatype, size_range)
+        self.offset = 0
+        self.refresh()
+
+    def toggle_sort(self, key: str):
+        """Clic en un encabezado: ascendente, descendente y de vuelta al orden del escaneo"""
+        if self.model.sort_column != key:
+            self.model.sort_by(key)
+        elif not self.model.sort_reverse:
+            self.model.sort_by(key, reverse=True)
+        else:
+            self.model.sort_by(None)
+        for column_key, (column, title) in FILELIST_COLUMNS.items():
+            if column_key == self.model.sort_column:
+                title += ' ▼' if self.model.sort_reverse else ' ▲'
+            self.tree.heading(column, text=title)
+        self.refresh()
+
+    # Desplazamiento
+
+    def scroll(self, rows: int):
+        self.offset += rows
+        self.refresh()
+        return 'break'  # El Treeview no debe desplazar sus propias filas
+
+    def yview(self, *args):
+        """Comando de la barra: ('moveto', fracción) o ('scroll', n, 'units'|'pages')"""
+        if not args:
+            return
+        if args[0] == 'moveto':
+            self.offset = round(float(args[1]) * len(self.model))
+        elif args[0] == 'scroll':
+            step = self.rows if args[2] == 'pages' else 1
+            self.offset += int(args[1]) * step
+        self.refresh()
+
+    def _on_wheel(self, event):
+        # Windows y macOS: delta en múltiplos de 120 (o pasos sueltos en macOS)
+        steps = event.delta // 120 if abs(event.delta) >= 120 else (1 if event.delta > 0 else -1)
+        return self.scroll(-steps * FILELIST_WHEEL_ROWS)
+
+    def _on_key(self, step: str):
+        if step == 'page-up':
+            return self.scroll(-self.rows)
+        if step == 'page-down':
+            return self.scroll(self.rows)
+        self.offset = 0 if step == 'home' else len(self.model)
+        self.refresh()
+        return 'break'
+
+    def _on_configure(self, event):
+        """Ajustar cuántas filas se materializan al alto real del widget"""
+        self._height = event.height
+        if self._fit():
+            self.refresh()
+
+    def _fit(self) -> bool:
+        """Calcular las filas que caben a partir de una fila ya pintada; True si cambió"""
+        if not self._height or not self._items:
+            return False
+        bbox = self.tree.bbox(self._items[0])
+        if not bbox:
+            return False
+        header, row_height = bbox[1], bbox[3]
+        rows = max(1, (self._height - header) // max(1, row_height))
+        changed = rows != self.rows
+        self.rows = rows
+        return changed
+
+    # Pintado
+
+    def refresh(self):
+        """Reescribir las filas visibles y la barra de desplazamiento"""
+        self._refresh_pending = False
+        count = len(self.model)
+        self.offset = max(0, min(self.offset, count - self.rows))
+        visible = min(self.rows, count - self.offset)
+
+        while len(self._items) < visible:
+            self._items.append(self.tree.insert("", tk.END))
+        if len(self._items) > visible:
+            self.tree.delete(*self._items[visible:])
+            del self._items[visible:]
+
+        for item, position in zip(self._items, range(self.offset, self.offset + visible)):
+            name, mediatype, size, _ = self.model.row(position)
+            self.tree.item(item, text=name, values=(mediatype, self.format_size(size)))
+
+        if self._fit():
+            return self.refresh()  # Primera fila pintada: ya se conoce su alto
+
+        if count:
+            self.scrollbar.set(self.offset / count, (self.offset + visible) / count)
+        else:
+            self.scrollbar.set(0.0, 1.0)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+"""
+Identificadores de Archive.org
+==============================
+
+Genera identificadores deterministas (sin fecha): el mismo archivo da
+siempre el mismo identificador. La limpieza usa normalización Unicode
+NFKD y una tabla de traducción, sin reemplazos carácter a carácter.
+
+Un registro local (tabla `identifiers` del almacén de progreso) recuerda
+qué identificador recibió cada archivo y resuelve las colisiones (p. ej.
+"01.mp3" en muchos álbumes) contra todo el registro, no solo el lote,
+añadiendo un sufijo derivado de la ruta relativa a la raíz escaneada: no
+cambia con el directorio actual ni con el punto de montaje.
+"""
+
+import hashlib
+import re
+import threading
+import unicodedata
+from typing import Dict, Optional
+
+IDENTIFIER_MAX_LENGTH = 100
+
+# Caracteres del sufijo de colisión (hash de la ruta)
+COLLISION_HASH_LENGTH = 8
+
+# Letras que NFKD no descompone en ASCII
+IDENTIFIER_TRANSLATION = str.maketrans({
+    'ß': 'ss', 'æ': 'ae', 'œ': 'oe', 'ø': 'o', 'đ': 'd', 'ð': 'd',
+    'ł': 'l', 'þ': 'th', 'ı': 'i', 'ħ': 'h', 'ŧ': 't',
+})
+
+# Cada tramo de caracteres no válidos (guiones incluidos) queda en un solo guion
+_INVALID = re.compile(r'[^a-z0-9_]+')
+
+
+def clean_identifier_part(text: str) -> str:
+    """Reducir un texto a los caracteres válidos de un identificador (a-z, 0-9, - y _)"""
+    text = text.lower()
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text).translate(IDENTIFIER_TRANSLATION)
+        # Quitar las marcas diacríticas que dejó NFKD y cualquier carácter no ASCII
+        text = text.encode('ascii', 'ignore').decode('ascii')
+    return _INVALID.sub('-', text).strip('-_')
+
+
+def finalize_identifier(base: str, suffix: str = '') -> str:
+    """Recortar a 100 caracteres conservando el sufijo y empezar con alfanumérico"""
+    identifier = base[:IDENTIFIER_MAX_LENGTH - len(suffix)].rstrip('-_') + suffix
+    if not identifier or not identifier[0].isalnum():
+        identifier = 'a' + identifier[1:]
+    return identifier
+
+
+def collision_suffix(source: str, length: int = COLLISION_HASH_LENGTH) -> str:
+    """Sufijo estable derivado de la ruta (o clave) de origen"""
+    return '-' + hashlib.sha1(source.encode('utf-8', 'surrogateescape')).hexdigest()[:length]
+
+
+class IdentifierRegistry:
+    """Asignación persistente ruta -> identificador sin colisiones"""
+
+    def __init__(self, store):
+        self.store = store
+        self._assigned: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, source: str) -> Optional[str]:
+        identifier = self._assigned.get(source)
+        if identifier is None:
+            identifier = self.store.get_identifiers([source]).get(source)
+            if identifier is not None:
+                self._assigned[source] = identifier
+        return identifier
+
+    def assign(self, candidates: Dict[str, str], suffix: str = '',
+               keys: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """Asignar identificadores a un lote {origen: base}
+
+        Los orígenes ya registrados conservan su identificador. Para los
+        nuevos, la base se usa tal cual si está libre en el registro; si la
+        reclaman varios orígenes o ya pertenece a otro, se añade un sufijo
+        con el hash de la clave del origen (`keys`, p. ej. su ruta relativa
+        a la raíz; por defecto el propio origen). `suffix` se añade al final
+        (p. ej. "-part2").
+        """
+        with self._lock:
+            return self._assign(candidates, suffix, keys or {})
+
+    def _suffixed(self, key: str, base: str, suffix: str, used: set) -> str:
+        length = COLLISION_HASH_LENGTH
+        while True:
+            identifier = finalize_identifier(base, collision_suffix(key, length) + suffix)
+            if identifier not in used:
+                return identifier
+            length += 4
+
+    def _assign(self, candidates: Dict[str, str], suffix: str, keys: Dict[str, str]) -> Dict[str, str]:
+        result = {source: self._assigned[source] for source in candidates if source in self._assigned}
+        pending = [source for source in candidates if source not in result]
+        if pending:
+            registered = self.store.get_identifiers(pending)
+            result.update(registered)
+            self._assigned.update(registered)
+            pending = [source for source in pending if source not in registered]
+        if not pending:
+            return result
+
+        # Orden estable: el resultado no depende del orden de recorrido
+        pending.sort()
+        wanted = {source: finalize_identifier(candidates[source], suffix) for source in pending}
+        claims: Dict[str, int] = {}
+        for identifier in wanted.values():
+            claims[identifier] = claims.get(identifier, 0) + 1
+        used = set(self.store.taken_identifiers(list(claims)))
+
+        new = {}
+        for source in pending:
+            identifier = wanted[source]
+            if claims[identifier] > 1 or identifier in used:
+                identifier = self._suffixed(keys.get(source, source), candidates[source], suffix, used)
+            used.add(identifier)
+            new[source] = identifier
+
+        # El registro decide: lo que otro proceso registró entre medias (o un
+        # sufijo que ya estaba usado) se rechaza y se resuelve de nuevo
+        while new:
+            rejected = set(self.store.register_identifiers(new))
+            accepted = {source: identifier for source, identifier in new.items() if source not in rejected}
+            self._assigned.update(accepted)
+            result.update(accepted)
+            if not rejected:
+                break
+            registered = self.store.get_identifiers(list(rejected))
+            self._assigned.update(registered)
+            result.update(registered)
+            retry = sorted(source for source in rejected if source not in registered)
+            used.update(self.store.taken_identifiers([new[source] for source in retry]))
+            new = {}
+            for source in retry:
+                new[source] = self._suffixed(keys.get(source, source), candidates[source], suffix, used)
+                used.add(new[source])
+        return result
+
+    def assign_one(self, source: str, base: str, suffix: str = '', key: Optional[str] = None) -> str:
+        return self.assign({source: base}, suffix, {source: key} if key else None)[source]
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+
+"""
+Cola de Trabajo Compartida
+==========================
+
+Permite que varios procesos (en un mismo equipo o en equipos que montan
+el mismo árbol por NFS) vacíen juntos un directorio sin subir dos veces
+el mismo archivo. La cola vive en el propio árbol, en `.archive_jobs/`:
+
+    leases/<clave>.lease    archivo tomado por un trabajador (contenido: quién)
+    done/<clave>.done       archivo terminado por algún trabajador
+    workers/<id>.alive      latido de cada trabajador
+
+La clave es un hash de la ruta relativa, el tamaño y el mtime, así que un
+archivo reemplazado por otro contenido vuelve a ser un trabajo nuevo.
+
+Un lease se toma creando su archivo con O_CREAT | O_EXCL (atómico
+también en NFSv3+). Mientras el trabajador vive, un hilo renueva el mtime
+de sus leases; si deja de hacerlo durante `ttl` segundos (el proceso
+murió o el equipo se cayó), cualquier otro puede quitárselo con un
+rename atómico y repetir el archivo. La caducidad se mide con la hora
+del servidor de archivos (el mtime de un archivo recién tocado), no con
+el reloj de cada equipo.
+"""
+
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+JOBQUEUE_DIR = '.archive_jobs'
+
+# Segundos sin latido tras los que un lease se da por abandonado
+LEASE_TTL = 300.0
+
+# Cada cuánto esperar antes de revisar los archivos que tienen otros trabajadores
+LEASE_RECHECK_SECONDS = 15.0
+
+# Segundos durante los que se reutiliza la última lectura de la hora del servidor
+LEASE_CLOCK_SECONDS = 10.0
+
+ACQUIRED, BUSY, FINISHED = 'acquired', 'busy', 'finished'
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class JobQueue:
+    """Leases por archivo con latido y caducidad sobre un directorio compartido"""
+
+    def __init__(self, root: Path, worker_id: Optional[str] = None, ttl: float = LEASE_TTL, logger=None):
+        self.root = os.path.abspath(root)
+        self.directory = os.path.join(self.root, JOBQUEUE_DIR)
+        self.worker = worker_id or default_worker_id()
+        self.ttl = ttl
+        self.logger = logger
+        for sub in ('leases', 'done', 'workers'):
+            os.makedirs(os.path.join(self.directory, sub), exist_ok=True)
+        self._alive = os.path.join(self.directory, 'workers', f'{self.worker}.alive')
+        with open(self._alive, 'w', encoding='utf-8') as f:
+            json.dump({'host': socket.gethostname(), 'pid': os.getpid(), 'started': time.time()}, f)
+        # Ruta -> clave de los leases propios (la clave no se puede recalcular si el archivo se movió)
+        self._held: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._clock = None  # (hora del servidor, time.monotonic() de la lectura)
+        self._stop = threading.Event()
+        self._heartbeat = threading.Thread(target=self._heartbeat_loop, daemon=True, name='lease-heartbeat')
+        self._heartbeat.start()
+
+    def _log(self, level: str, message: str):
+        if self.logger:
+            getattr(self.logger, level)(message)
+
+    def _path(self, kind: str, key: str) -> str:
+        return os.path.join(self.directory, 'leases' if kind == 'lease' else kind, f'{key}.{kind}')
+
+    def key(self, file_path: Path) -> str:
+        """Clave del trabajo: ruta relativa + tamaño + mtime (OSError si el archivo no existe)"""
+        stat = os.stat(file_path)
+        rel_path = os.path.relpath(os.path.abspath(file_path), self.root).replace(os.sep, '/')
+        source = f"{rel_path}\0{stat.st_size}\0{stat.st_mtime_ns}"
+        return hashlib.sha1(source.encode('utf-8', 'surrogateescape')).hexdigest()
+
+    def server_time(self) -> float:
+        """Hora del servidor de archivos: el mtime del latido recién tocado
+
+        Se relee como mucho cada LEASE_CLOCK_SECONDS; entre lecturas se
+        avanza con el reloj monótono local.
+        """
+        clock = self._clock
+        if clock is None or time.monotonic() - clock[1] > LEASE_CLOCK_SECONDS:
+            os.utime(self._alive)
+            clock = self._clock = (os.stat(self._alive).st_mtime, time.monotonic())
+        return clock[0] + time.monotonic() - clock[1]
+
+    # Leases
+
+    def acquire(self, file_path: Path) -> str:
+        """Intentar tomar un archivo: ACQUIRED, BUSY (lo tiene otro) o FINISHED (hecho o ya no existe)"""
+        try:
+            key = self.key(file_path)
+        except OSError:
+            return FINISHED
+        if os.path.exists(self._path('done', key)):
+            return FINISHED
+        lease = self._path('lease', key)
+        if self._create(lease, file_path):
+            return self._acquired(file_path, key)
+
+        # Ocupado: solo se puede quitar si el dueño dejó de renovarlo
+        try:
+            stat = os.stat(lease)
+        except FileNotFoundError:
+            return self._acquired(file_path, key) if self._create(lease, file_path) else BUSY
+        if stat.st_mtime + self.ttl > self.server_time():
+            return BUSY
+        stale = f"{lease}.{self.worker}.stale"
+        try:
+            os.rename(lease, stale)  # Solo un trabajador gana el rename
+        except FileNotFoundError:
+            return BUSY
+        owner = self._owner(stale)
+        os.unlink(stale)
+        self._log('warning', f"♻️ Lease caducado de {owner} para {Path(file_path).name}; se retoma")
+        return self._acquired(file_path, key) if self._create(lease, file_path) else BUSY
+
+    def _create(self, lease: str, file_path: Path) -> bool:
+        try:
+            fd = os.open(lease, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'worker': self.worker, 'path': str(file_path), 'acquired': time.time()}, f)
+        return True
+
+    def _acquired(self, file_path: Path, key: str) -> str:
+        with self._lock:
+            self._held[str(file_path)] = key
+        return ACQUIRED
+
+    @staticmethod
+    def _owner(lease: str) -> str:
+        try:
+            with open(lease, 'r', encoding='utf-8') as f:
+                return json.load(f).get('worker', '?')
+        except (OSError, ValueError):
+            return '?'
+
+    def release(self, file_path: Path, done: bool = True):
+        """Soltar un archivo; con done=True ningún trabajador lo volverá a tomar
+
+        Tras un error se suelta con done=False: otro trabajador (o una
+        nueva ejecución) puede intentarlo de nuevo.
+        """
+        with self._lock:
+            key = self._held.pop(str(file_path), None)
+        if key is None:
+            return
+        if done:
+            # Primero la marca de terminado: si no, otro podría tomarlo entre medias
+            try:
+                with open(self._path('done', key), 'w', encoding='utf-8') as f:
+                    f.write(str(file_path))
+            except OSError as e:
+                self._log('error', f"❌ Error marcando como terminado {file_path}: {e}")
+        lease = self._path('lease', key)
+        if self._owner(lease) == self.worker:
+            try:
+                os.unlink(lease)
+            except FileNotFoundError:
+                pass
+
+    def reopen(self, file_path: Path):
+        """Devolver a la cola un archivo terminado (p. ej. si su verificación falló)"""
+        try:
+            os.unlink(self._path('done', self.key(file_path)))
+        except OSError:
+            pass
+
+    def _heartbeat_loop(self):
+        """Renovar los leases propios; avisar si alguno se perdió por caducidad"""
+        while not self._stop.wait(self.ttl / 3):
+            try:
+                os.utime(self._alive)
+            except OSError:
+                pass
+            with self._lock:
+                held = list(self._held.items())
+            for file_path, key in held:
+                lease = self._path('lease', key)
+                try:
+                    os.utime(lease)
+                except FileNotFoundError:
+                    self._log('warning', f"⚠️ Se perdió el lease de {Path(file_path).name} (caducado)")
+                    with self._lock:
+                        self._held.pop(file_path, None)
+                except OSError:
+                    pass
+
+    # Reparto
+
+    def claim(self, files: Iterable[Path], should_stop: Optional[Callable[[], bool]] = None,
+              recheck: float = LEASE_RECHECK_SECONDS) -> Iterator[Path]:
+        """Generar solo los archivos que este trabajador consiguió tomar
+
+        Los que tiene otro trabajador se vuelven a mirar al final, cada
+        `recheck` segundos, hasta que terminan o su lease caduca.
+        """
+        busy: List[Path] = []
+        for file_path in files:
+            if should_stop and should_stop():
+                return
+            state = self.acquire(file_path)
+            if state == ACQUIRED:
+                yield file_path
+            elif state == BUSY:
+                busy.append(file_path)
+
+        if busy:
+            self._log('info', f"🤝 {len(busy)} archivos los tienen otros trabajadores; "
+                              f"se retoman si sus leases caducan")
+        while busy and not (should_stop and should_stop()):
+            time.sleep(recheck)
+            waiting = []
+            for file_path in busy:
+                state = self.acquire(file_path)
+                if state == ACQUIRED:
+                    yield file_path
+                elif state == BUSY:
+                    waiting.append(file_path)
+            busy = waiting
+
+    def close(self):
+        """Parar el latido y soltar (sin terminar) los leases que queden"""
+        self._stop.set()
+        with self._lock:
+            held = list(self._held)
+        for file_path in held:
+            self.release(Path(file_path), done=False)
+        try:
+            os.unlink(self._alive)
+        except OSError:
+            pass
@@ -0,0 +1,940 @@
+#!/usr/bin/env python3
+
+"""
+Extracción de Metadatos
+=======================
+
+Lee los metadatos que ya traen los archivos antes de subirlos: etiquetas
+ID3 (MP3), comentarios Vorbis (FLAC), átomos iTunes (M4A/MP4/MOV), el
+diccionario Info de los PDF y la duración de las cabeceras de video
+(MP4/MOV, Matroska/WebM, AVI) y WAV. Solo se leen cabeceras, nunca el
+archivo entero, y sin dependencias externas: de un PDF se lee el final,
+la tabla xref y los pocos objetos que hacen falta.
+
+La extracción corre en un pool de procesos, por lotes, por delante de la
+cola de subida. Los resultados se guardan en el almacén de progreso por
+firma de archivo (dispositivo, inodo, tamaño, mtime), así que una segunda
+ejecución no vuelve a abrir ningún archivo.
+"""
+
+import collections
+import concurrent.futures
+import datetime
+import multiprocessing
+import os
+import re
+import struct
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Archivos por lote enviado al pool de procesos
+METADATA_BATCH_SIZE = 64
+
+# Lotes en vuelo por delante del que se está consumiendo
+METADATA_PREFETCH_BATCHES = 2
+
+# Sube cuando cambia lo que se extrae, para invalidar la caché
+METADATA_VERSION = 1
+
+# Límites de lectura de cabeceras
+ID3_MAX_SIZE = 1024 * 1024  # las portadas embebidas no interesan
+MPEG_SCAN_BYTES = 64 * 1024
+MP4_MAX_MOOV = 64 * 1024 * 1024
+EBML_MAX_ELEMENTS = 256
+PDF_TAIL_BYTES = 4096  # "startxref" está en los últimos bytes
+PDF_OBJECT_BYTES = 64 * 1024  # lectura por objeto indirecto
+PDF_STREAM_MAX = 16 * 1024 * 1024  # tablas xref y flujos de objetos comprimidos
+PDF_MAX_SECTIONS = 64  # secciones xref encadenadas con /Prev (actualizaciones incrementales)
+PDF_SCAN_WINDOW = 1024 * 1024  # sin xref legible: solo se busca en el principio y el final
+
+MPEG_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+MPEG_SAMPLE_RATES = (44100, 48000, 32000)
+
+# Marcos ID3 (v2.3/v2.4 y v2.2) que interesan
+ID3_FRAMES = {
+    'TIT2': 'title', 'TT2': 'title',
+    'TPE1': 'artist', 'TP1': 'artist',
+    'TALB': 'album', 'TAL': 'album',
+    'TDRC': 'date', 'TYER': 'date', 'TYE': 'date',
+    'TLEN': 'length', 'TLE': 'length',
+}
+VORBIS_FIELDS = {'TITLE': 'title', 'ARTIST': 'artist', 'ALBUM': 'album', 'DATE': 'date'}
+MP4_FIELDS = {b'\xa9nam': 'title', b'\xa9ART': 'artist', b'\xa9alb': 'album', b'\xa9day': 'date'}
+PDF_FIELDS = {'Title': 'title', 'Author': 'artist', 'Subject': 'subject', 'CreationDate': 'date'}
+
+_DATE = re.compile(r'(\d{4})(?:-?(\d{2})(?:-?(\d{2}))?)?')
+_PDF_ESCAPES = {ord('n'): b'\n', ord('r'): b'\r', ord('t'): b'\t', ord('b'): b'\b', ord('f'): b'\f'}
+
+
+def file_signature(stat: os.stat_result) -> Tuple[int, int, int, int]:
+    """Firma de un archivo para la caché: cambia si el archivo cambia"""
+    return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def normalize_date(value: str) -> Optional[str]:
+    """Llevar fechas de etiquetas ("2019", "20190312...", "D:2019...") a AAAA[-MM[-DD]]"""
+    match = _DATE.search(value or '')
+    if not match:
+        return None
+    return '-'.join(part for part in match.groups() if part)
+
+
+def format_runtime(seconds: float) -> str:
+    """Duración en el formato HH:MM:SS que usa Archive.org"""
+    seconds = int(round(seconds))
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def _clean(tags: Dict) -> Dict:
+    """Quitar valores vacíos y recortar espacios"""
+    result = {}
+    for key, value in tags.items():
+        if isinstance(value, str):
+            value = value.strip().strip('\x00').strip()
+        if value:
+            result[key] = value
+    return result
+
+
+# MP3: etiquetas ID3 y cabecera MPEG
+
+def _syncsafe(data: bytes) -> int:
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _id3_text(data: bytes) -> str:
+    encoding, data = data[:1], data[1:]
+    if encoding == b'\x01':
+        text = data.decode('utf-16', 'replace')
+    elif encoding == b'\x02':
+        text = data.decode('utf-16-be', 'replace')
+    elif encoding == b'\x03':
+        text = data.decode('utf-8', 'replace')
+    else:
+        text = data.decode('latin-1')
+    # Los valores múltiples van separados por NUL: basta el primero
+    return text.split('\x00')[0]
+
+
+def _read_id3v2(f) -> Tuple[Dict, int]:
+    """Etiquetas ID3v2 y posición donde empieza el audio"""
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b'ID3':
+        return {}, 0
+    major, flags = header[3], header[5]
+    size = _syncsafe(header[6:10])
+    end = 10 + size + (10 if flags & 0x10 else 0)
+    data = f.read(min(size, ID3_MAX_SIZE))
+    if flags & 0x80 and major < 4:
+        data = data.replace(b'\xff\x00', b'\xff')
+
+    pos = 0
+    if flags & 0x40:
+        pos = _syncsafe(data[:4]) if major >= 4 else 4 + struct.unpack('>I', data[:4])[0]
+
+    id_size, header_size = (3, 6) if major == 2 else (4, 10)
+    tags = {}
+    while pos + header_size <= len(data):
+        frame_id = data[pos:pos + id_size]
+        if not frame_id.strip(b'\x00') or not frame_id.isalnum():
+            break
+        if major == 2:
+            frame_size = int.from_bytes(data[pos + 3:pos + 6], 'big')
+        elif major >= 4:
+            frame_size = _syncsafe(data[pos + 4:pos + 8])
+        else:
+            frame_size = struct.unpack('>I', data[pos + 4:pos + 8])[0]
+        body = data[pos + header_size:pos + header_size + frame_size]
+        key = ID3_FRAMES.get(frame_id.decode('latin-1'))
+        if key and body and key not in tags:
+            tags[key] = _id3_text(body)
+        pos += header_size + frame_size
+    return tags, end
+
+
+def _read_id3v1(f, size: int) -> Dict:
+    if size < 128:
+        return {}
+    f.seek(size - 128)
+    data = f.read(128)
+    if data[:3] != b'TAG':
+        return {}
+    text = lambda part: part.split(b'\x00')[0].decode('latin-1')
+    return {'title': text(data[3:33]), 'artist': text(data[33:63]),
+            'album': text(data[63:93]), 'date': text(data[93:97])}
+
+
+def _mpeg_duration(f, start: int, size: int) -> Optional[float]:
+    """Duración por la cabecera Xing/VBRI, o por el bitrate si es CBR"""
+    f.seek(start)
+    data = f.read(MPEG_SCAN_BYTES)
+    for pos in range(len(data) - 4):
+        if data[pos] != 0xFF or data[pos + 1] & 0xE0 != 0xE0:
+            continue
+        b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+        version_bits, layer_bits = (b1 >> 3) & 3, (b1 >> 1) & 3
+        bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 3
+        if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or rate_index == 3:
+            continue
+        version = 1 if version_bits == 3 else 2
+        layer = 4 - layer_bits
+        sample_rate = MPEG_SAMPLE_RATES[rate_index] >> (0 if version_bits == 3 else 1 if version_bits == 2 else 2)
+        samples = 384 if layer == 1 else 1152 if layer == 2 or version == 1 else 576
+        mono = b3 >> 6 == 3
+
+        side_info = (17 if mono else 32) if version == 1 else (9 if mono else 17)
+        xing = pos + 4 + side_info
+        if data[xing:xing + 4] in (b'Xing', b'Info') and len(data) >= xing + 12:
+            if struct.unpack('>I', data[xing + 4:xing + 8])[0] & 1:
+                frames = struct.unpack('>I', data[xing + 8:xing + 12])[0]
+                return frames * samples / sample_rate
+        vbri = pos + 36
+        if data[vbri:vbri + 4] == b'VBRI' and len(data) >= vbri + 18:
+            frames = struct.unpack('>I', data[vbri + 14:vbri + 18])[0]
+            return frames * samples / sample_rate
+
+        bitrate = MPEG_BITRATES[(version, layer)][bitrate_index] * 1000
+        return (size - start - pos) * 8 / bitrate
+    return None
+
+
+def extract_mp3(path: str) -> Dict:
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        tags, audio_start = _read_id3v2(f)
+        id3v1 = _read_id3v1(f, size)
+        tags = tags or id3v1
+        tail = 128 if id3v1 else 0
+        length = tags.pop('length', None)
+        if length and length.isdigit() and int(length) > 0:
+            tags['duration'] = int(length) / 1000
+        else:
+            duration = _mpeg_duration(f, audio_start, size - tail)
+            if duration:
+                tags['duration'] = duration
+    return tags
+
+
+# FLAC: STREAMINFO y comentarios Vorbis
+
+def _vorbis_comments(data: bytes) -> Dict:
+    tags = {}
+    vendor_length = struct.unpack('<I', data[:4])[0]
+    pos = 4 + vendor_length
+    count = struct.unpack('<I', data[pos:pos + 4])[0]
+    pos += 4
+    for _ in range(count):
+        length = struct.unpack('<I', data[pos:pos + 4])[0]
+        name, _, value = data[pos + 4:pos + 4 + length].decode('utf-8', 'replace').partition('=')
+        key = VORBIS_FIELDS.get(name.upper())
+        if key and key not in tags:
+            tags[key] = value
+        pos += 4 + length
+    return tags
+
+
+def extract_flac(path: str) -> Dict:
+    tags = {}
+    with open(path, 'rb') as f:
+        _, start = _read_id3v2(f)
+        f.seek(start)
+        if f.read(4) != b'fLaC':
+            return tags
+        last = False
+        while not last:
+            header = f.read(4)
+            if len(header) < 4:
+                break
+            last, block_type = header[0] & 0x80, header[0] & 0x7F
+            length = int.from_bytes(header[1:4], 'big')
+            if block_type == 0:
+                info = int.from_bytes(f.read(length)[10:18], 'big')
+                sample_rate, total_samples = info >> 44, info & 0xFFFFFFFFF
+                if sample_rate and total_samples:
+                    tags['duration'] = total_samples / sample_rate
+            elif block_type == 4:
+                tags.update(_vorbis_comments(f.read(length)))
+            else:
+                f.seek(length, os.SEEK_CUR)
+    return tags
+
+
+# MP4/M4A/MOV: átomos moov/mvhd y udta/meta/ilst
+
+def _mp4_atoms(data: bytes, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[bytes, int, int]]:
+    """(tipo, inicio del contenido, fin) de cada átomo en data[start:end]"""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack('>I4s', data[pos:pos + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', data[pos + 8:pos + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            break
+        yield kind, pos + header, min(pos + size, end)
+        pos += size
+
+
+def _find_moov(f, size: int) -> Optional[bytes]:
+    """Leer el átomo moov, esté antes o después de los datos (mdat)"""
+    pos = 0
+    while pos + 8 <= size:
+        f.seek(pos)
+        header = f.read(16)
+        atom_size, kind = struct.unpack('>I4s', header[:8])
+        header_size = 8
+        if atom_size == 1:
+            atom_size = struct.unpack('>Q', header[8:16])[0]
+            header_size = 16
+        elif atom_size == 0:
+            atom_size = size - pos
+        if atom_size < header_size:
+            return None
+        if kind == b'moov':
+            if atom_size > MP4_MAX_MOOV:
+                return None
+            f.seek(pos + header_size)
+            return f.read(atom_size - header_size)
+        pos += atom_size
+    return None
+
+
+def extract_mp4(path: str) -> Dict:
+    tags = {}
+    with open(path, 'rb') as f:
+        moov = _find_moov(f, os.path.getsize(path))
+    if moov is None:
+        return tags
+
+    for kind, start, end in _mp4_atoms(moov):
+        if kind == b'mvhd':
+            if moov[start] == 1:
+                timescale, duration = struct.unpack('>IQ', moov[start + 20:start + 32])
+            else:
+                timescale, duration = struct.unpack('>II', moov[start + 12:start + 20])
+            if timescale:
+                tags['duration'] = duration / timescale
+        elif kind == b'udta':
+            for meta, meta_start, meta_end in _mp4_atoms(moov, start, end):
+                if meta != b'meta':
+                    continue
+                # En MP4 "meta" lleva versión y flags; en QuickTime no
+                if moov[meta_start + 4:meta_start + 8] != b'hdlr':
+                    meta_start += 4
+                for ilst, ilst_start, ilst_end in _mp4_atoms(moov, meta_start, meta_end):
+                    if ilst != b'ilst':
+                        continue
+                    for name, item_start, item_end in _mp4_atoms(moov, ilst_start, ilst_end):
+                        key = MP4_FIELDS.get(name)
+                        if not key:
+                            continue
+                        for data_kind, data_start, data_end in _mp4_atoms(moov, item_start, item_end):
+                            if data_kind == b'data':
+                                tags[key] = moov[data_start + 8:data_end].decode('utf-8', 'replace')
+                                break
+    return tags
+
+
+# Matroska/WebM: elemento Segment/Info
+
+def _ebml_vint(f, keep_marker: bool) -> Optional[int]:
+    first = f.read(1)
+    if not first:
+        return None
+    value = first[0]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not value & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        return None
+    if not keep_marker:
+        value &= mask - 1
+    rest = f.read(length - 1)
+    for byte in rest:
+        value = (value << 8) | byte
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        return -1  # tamaño desconocido
+    return value
+
+
+def extract_matroska(path: str) -> Dict:
+    tags = {}
+    with open(path, 'rb') as f:
+        if _ebml_vint(f, True) != 0x1A45DFA3:
+            return tags
+        f.seek(_ebml_vint(f, False), os.SEEK_CUR)
+        if _ebml_vint(f, True) != 0x18538067:
+            return tags
+        _ebml_vint(f, False)
+
+        for _ in range(EBML_MAX_ELEMENTS):
+            element, size = _ebml_vint(f, True), _ebml_vint(f, False)
+            if element is None or size is None or size < 0 or element == 0x1F43B675:
+                break  # los clusters de datos vienen después de Info
+            if element != 0x1549A966:
+                f.seek(size, os.SEEK_CUR)
+                continue
+
+            scale, duration = 1000000, None
+            info_end = f.tell() + size
+            while f.tell() < info_end:
+                child, child_size = _ebml_vint(f, True), _ebml_vint(f, False)
+                if child is None or child_size is None or child_size < 0:
+                    break
+                value = f.read(child_size)
+                if child == 0x2AD7B1:
+                    scale = int.from_bytes(value, 'big')
+                elif child == 0x4489 and child_size in (4, 8):
+                    duration = struct.unpack('>f' if child_size == 4 else '>d', value)[0]
+                elif child == 0x7BA9:
+                    tags['title'] = value.decode('utf-8', 'replace')
+                elif child == 0x4461 and child_size == 8:
+                    nanoseconds = struct.unpack('>q', value)[0]
+                    created = datetime.datetime(2001, 1, 1) + datetime.timedelta(microseconds=nanoseconds // 1000)
+                    tags['date'] = created.strftime('%Y-%m-%d')
+            if duration:
+                tags['duration'] = duration * scale / 1e9
+            break
+    return tags
+
+
+# AVI y WAV: fragmentos RIFF
+
+def _riff_chunks(f, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """(id, posición de los datos, tamaño) de cada fragmento hasta `end`"""
+    while f.tell() + 8 <= end:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        chunk_id, size = struct.unpack('<4sI', header)
+        start = f.tell()
+        yield chunk_id, start, size
+        f.seek(start + size + (size & 1))
+
+
+def extract_riff(path: str) -> Dict:
+    tags = {}
+    with open(path, 'rb') as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b'RIFF':
+            return tags
+        form = header[8:12]
+        end = min(8 + struct.unpack('<I', header[4:8])[0], os.path.getsize(path))
+
+        if form == b'AVI ':
+            for chunk_id, start, size in _riff_chunks(f, end):
+                if chunk_id == b'LIST' and f.read(4) == b'hdrl':
+                    f.seek(start + 4)
+                    for sub_id, _, sub_size in _riff_chunks(f, start + size):
+                        if sub_id == b'avih':
+                            microseconds, _, _, _, frames = struct.unpack('<5I', f.read(20))
+                            if microseconds and frames:
+                                tags['duration'] = microseconds * frames / 1e6
+                            break
+                    break
+        elif form == b'WAVE':
+            byte_rate = None
+            for chunk_id, start, size in _riff_chunks(f, end):
+                if chunk_id == b'fmt ':
+                    byte_rate = struct.unpack('<I', f.read(12)[8:12])[0]
+                elif chunk_id == b'data' and byte_rate:
+                    tags['duration'] = size / byte_rate
+                    break
+    return tags
+
+
+# PDF: trailer, diccionario Info y árbol de páginas
+
+def _pdf_string(data: bytes, pos: int) -> Optional[str]:
+    """Leer una cadena PDF literal "(...)" o hexadecimal "<...>" que empieza en `pos`"""
+    while pos < len(data) and data[pos] in b' \t\r\n':
+        pos += 1
+    if pos >= len(data):
+        return None
+    if data[pos:pos + 1] == b'(':
+        raw = bytearray()
+        depth = 0
+        pos += 1
+        while pos < len(data):
+            byte = data[pos]
+            if byte == 0x5C:  # barra invertida
+                pos += 1
+                escaped = data[pos]
+                if escaped in _PDF_ESCAPES:
+                    raw += _PDF_ESCAPES[escaped]
+                elif 0x30 <= escaped <= 0x37:
+                    octal = data[pos:pos + 3]
+                    digits = len(octal) - len(octal.lstrip(b'01234567'))
+                    raw.append(int(octal[:digits], 8) & 0xFF)
+                    pos += digits - 1
+                elif escaped not in b'\r\n':
+                    raw.append(escaped)
+            elif byte == 0x28:
+                depth += 1
+                raw.append(byte)
+            elif byte == 0x29:
+                if depth == 0:
+                    break
+                depth -= 1
+                raw.append(byte)
+            else:
+                raw.append(byte)
+            pos += 1
+        raw = bytes(raw)
+    elif data[pos:pos + 1] == b'<':
+        end = data.find(b'>', pos)
+        digits = re.sub(rb'\s', b'', data[pos + 1:end])
+        raw = bytes.fromhex((digits + b'0' * (len(digits) % 2)).decode('ascii'))
+    else:
+        return None  # referencia indirecta u otro tipo
+
+    if raw.startswith(b'\xfe\xff'):
+        return raw[2:].decode('utf-16-be', 'replace')
+    return raw.decode('latin-1')
+
+
+def _pdf_object(data, number: int, generation: int) -> Optional[bytes]:
+    """Contenido del objeto indirecto buscándolo en `data` (la última versión si hay varias)"""
+    match = None
+    for match in re.finditer(rb'(?<!\d)%d\s+%d\s+obj\b' % (number, generation), data):
+        pass
+    if match is None:
+        return None
+    end = data.find(b'endobj', match.end())
+    return data[match.end():end if end >= 0 else match.end() + 4096]
+
+
+def _pdf_reference(data, key: bytes) -> Optional[Tuple[int, int]]:
+    match = None
+    for match in re.finditer(rb'/' + key + rb'\s+(\d+)\s+(\d+)\s+R', data):
+        pass
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def _pdf_int(data: bytes, key: bytes) -> Optional[int]:
+    match = re.search(rb'/' + key + rb'\s+(\d+)(?!\s+\d+\s+R)', data)
+    return int(match.group(1)) if match else None
+
+
+def _png_unpredict(data: bytes, columns: int) -> bytes:
+    """Deshacer los predictores PNG (/Predictor >= 10) de un flujo de un byte por muestra"""
+    out = bytearray()
+    previous = bytearray(columns)
+    for start in range(0, len(data) - columns, columns + 1):
+        kind = data[start]
+        row = bytearray(data[start + 1:start + 1 + columns])
+        for j in range(len(row)):
+            left = row[j - 1] if j else 0
+            up = previous[j]
+            if kind == 1:
+                row[j] = (row[j] + left) & 0xFF
+            elif kind == 2:
+                row[j] = (row[j] + up) & 0xFF
+            elif kind == 3:
+                row[j] = (row[j] + (left + up) // 2) & 0xFF
+            elif kind == 4:
+                upper_left = previous[j - 1] if j else 0
+                estimate = left + up - upper_left
+                distances = (abs(estimate - left), abs(estimate - up), abs(estimate - upper_left))
+                row[j] = (row[j] + (left, up, upper_left)[distances.index(min(distances))]) & 0xFF
+        out += row
+        previous = row
+    return bytes(out)
+
+
+class _PdfReader:
+    """Objetos de un PDF a partir de su tabla xref, leyendo solo lo que se pide
+
+    Sigue "startxref" desde el final del archivo, encadena las secciones
+    /Prev y admite tablas clásicas, flujos xref y objetos comprimidos en
+    flujos de objetos (PDF 1.5+). ValueError si la tabla no se puede leer.
+    """
+
+    _ENTRY = re.compile(rb'(\d{10})[ ](\d{5})[ ]([nf])\s*')
+
+    def __init__(self, f, size: int):
+        self.f = f
+        self.entries: Dict[int, Tuple] = {}  # número -> ('n', offset) o ('s', flujo, índice)
+        self.trailer = b''
+        self._object_streams: Dict[int, Tuple[bytes, Dict[int, int], int]] = {}
+
+        f.seek(max(0, size - PDF_TAIL_BYTES))
+        found = re.findall(rb'startxref\s+(\d+)', f.read())
+        if not found:
+            raise ValueError('sin startxref')
+        offset, seen = int(found[-1]), set()
+        while offset is not None and offset not in seen and len(seen) < PDF_MAX_SECTIONS:
+            seen.add(offset)
+            section = self._read_section(offset)
+            # Las secciones antiguas van delante: _pdf_reference se queda con la última aparición
+            self.trailer = section + self.trailer
+            offset = _pdf_int(section, b'Prev')
+        if b'/Root' not in self.trailer:
+            raise ValueError('trailer sin /Root')
+
+    def _read_section(self, offset: int) -> bytes:
+        self.f.seek(offset)
+        data = self.f.read(PDF_OBJECT_BYTES)
+        if data.lstrip().startswith(b'xref'):
+            return self._read_table(data, data.index(b'xref') + 4)
+        return self._read_xref_stream(offset)
+
+    def _read_table(self, data: bytes, cursor: int) -> bytes:
+        """Tabla xref clásica: subsecciones "inicio cantidad" y entradas de 20 bytes"""
+        while True:
+            header = re.compile(rb'\s*(\d+)\s+(\d+)\s*').match(data, cursor)
+            if header is None:
+                break
+            first, count = int(header.group(1)), int(header.group(2))
+            cursor = header.end()
+            missing = cursor + count * 20 + 64 - len(data)
+            if missing > 0:
+                if len(data) + missing > PDF_STREAM_MAX:
+                    raise ValueError('tabla xref demasiado grande')
+                data += self.f.read(missing)
+            for number in range(first, first + count):
+                entry = self._ENTRY.match(data, cursor)
+                if entry is None:
+                    raise ValueError('entrada xref no válida')
+                cursor = entry.end()
+                if entry.group(3) == b'n':
+                    self.entries.setdefault(number, ('n', int(entry.group(1))))
+        trailer = re.compile(rb'\s*trailer').match(data, cursor)
+        if trailer is None:
+            raise ValueError('tabla xref sin trailer')
+        end = data.find(b'startxref', trailer.end())
+        if end < 0:
+            data += self.f.read(PDF_OBJECT_BYTES)
+            end = data.find(b'startxref', trailer.end())
+        return data[trailer.end():end if end >= 0 else len(data)]
+
+    def _read_xref_stream(self, offset: int) -> bytes:
+        """Flujo xref (PDF 1.5+): el diccionario hace de trailer"""
+        body, start = self._read_at(offset)
+        dictionary, content = self._stream(body, start)
+        widths = [int(w) for w in re.search(rb'/W\s*\[\s*([\d\s]+)\]', dictionary).group(1).split()]
+        index = re.search(rb'/Index\s*\[\s*([\d\s]+)\]', dictionary)
+        ranges = [int(n) for n in index.group(1).split()] if index else [0, _pdf_int(dictionary, b'Size') or 0]
+        position = 0
+        for first, count in zip(ranges[::2], ranges[1::2]):
+            for number in range(first, first + count):
+                fields = []
+                for width in widths:
+                    fields.append(int.from_bytes(content[position:position + width], 'big'))
+                    position += width
+                kind = fields[0] if widths[0] else 1
+                if kind == 1:
+                    self.entries.setdefault(number, ('n', fields[1]))
+                elif kind == 2:
+                    self.entries.setdefault(number, ('s', fields[1], fields[2]))
+        return dictionary
+
+    def _read_at(self, offset: int, number: Optional[int] = None) -> Tuple[bytes, int]:
+        """(contenido del objeto en `offset`, posición absoluta de ese contenido)"""
+        self.f.seek(offset)
+        chunk = self.f.read(PDF_OBJECT_BYTES)
+        header = re.match(rb'\s*(\d+)\s+(\d+)\s+obj\b', chunk)
+        if header is None or (number is not None and int(header.group(1)) != number):
+            raise ValueError(f'no hay objeto en {offset}')
+        end = chunk.find(b'endobj', header.end())
+        return chunk[header.end():end if end >= 0 else len(chunk)], offset + header.end()
+
+    def _stream(self, body: bytes, start: int) -> Tuple[bytes, bytes]:
+        """(diccionario, datos decodificados) de un objeto con flujo"""
+        keyword = body.find(b'stream')
+        if keyword < 0:
+            raise ValueError('objeto sin flujo')
+        dictionary = body[:keyword]
+        data_start = keyword + 6
+        data_start += 2 if body[data_start:data_start + 2] == b'\r\n' else 1
+        length = _pdf_int(dictionary, b'Length')
+        if length is None:
+            reference = _pdf_reference(dictionary, b'Length')
+            length_object = self.get(reference[0]) if reference else None
+            length = int(length_object.split()[0]) if length_object else None
+        if length is None or length > PDF_STREAM_MAX:
+            raise ValueError('flujo sin /Length o demasiado grande')
+        if data_start + length <= len(body):
+            raw = body[data_start:data_start + length]
+        else:
+            self.f.seek(start + data_start)
+            raw = self.f.read(length)
+        filters = re.findall(rb'/(\w+Decode)', dictionary)
+        if filters == [b'FlateDecode']:
+            raw = zlib.decompress(raw)
+        elif filters:
+            raise ValueError(f'filtro no admitido: {filters}')
+        predictor = _pdf_int(dictionary, b'Predictor') or 1
+        if predictor >= 10:
+            raw = _png_unpredict(raw, _pdf_int(dictionary, b'Columns') or 1)
+        return dictionary, raw
+
+    def get(self, number: int) -> Optional[bytes]:
+        """Contenido de un objeto indirecto, o None si no está en la tabla"""
+        entry = self.entries.get(number)
+        if entry is None:
+            return None
+        if entry[0] == 'n':
+            return self._read_at(entry[1], number)[0]
+        stream_number = entry[1]
+        if stream_number not in self._object_streams:
+            container = self.entries.get(stream_number)
+            if container is None or container[0] != 'n':
+                return None
+            dictionary, content = self._stream(*self._read_at(container[1], stream_number))
+            first = _pdf_int(dictionary, b'First') or 0
+            numbers = [int(n) for n in content[:first].split()]
+            offsets = dict(zip(numbers[::2], numbers[1::2]))
+            self._object_streams[stream_number] = (content, offsets, first)
+        content, offsets, first = self._object_streams[stream_number]
+        if number not in offsets:
+            return None
+        begin = first + offsets[number]
+        following = [first + offset for offset in offsets.values() if first + offset > begin]
+        return content[begin:min(following) if following else len(content)]
+
+    def resolve(self, data: bytes, key: bytes) -> Optional[bytes]:
+        reference = _pdf_reference(data, key)
+        return self.get(reference[0]) if reference else None
+
+
+def _pdf_info_tags(info: bytes) -> Dict:
+    tags = {}
+    for name, key in PDF_FIELDS.items():
+        match = re.search(rb'/' + name.encode('ascii') + rb'(?![A-Za-z])', info)
+        if match:
+            value = _pdf_string(info, match.end())
+            if value:
+                tags[key] = value
+    return tags
+
+
+def _pdf_page_count(pages: Optional[bytes]) -> Optional[int]:
+    count = re.search(rb'/Count\s+(\d+)', pages) if pages else None
+    return int(count.group(1)) if count else None
+
+
+def _extract_pdf_window(f, size: int) -> Dict:
+    """Sin tabla xref legible: buscar en el principio y el final del archivo (todo, si es pequeño)"""
+    f.seek(0)
+    if size <= 2 * PDF_SCAN_WINDOW:
+        data, whole = f.read(), True
+    else:
+        head = f.read(PDF_SCAN_WINDOW)
+        f.seek(size - PDF_SCAN_WINDOW)
+        data, whole = head + f.read(PDF_SCAN_WINDOW), False
+    info_ref = _pdf_reference(data, b'Info')
+    info = _pdf_object(data, *info_ref) if info_ref else None
+    tags = _pdf_info_tags(info) if info else {}
+    root_ref = _pdf_reference(data, b'Root')
+    catalog = _pdf_object(data, *root_ref) if root_ref else None
+    pages_ref = _pdf_reference(catalog, b'Pages') if catalog else None
+    pages = _pdf_page_count(_pdf_object(data, *pages_ref) if pages_ref else None)
+    if pages is None and whole:
+        # Contar los objetos /Page solo tiene sentido si se leyó el archivo entero
+        pages = len(re.findall(rb'/Type\s*/Page(?![a-zA-Z])', data)) or None
+    if pages:
+        tags['pages'] = pages
+    return tags
+
+
+def extract_pdf(path: str) -> Dict:
+    """Diccionario Info y número de páginas siguiendo la tabla xref, sin leer el archivo entero"""
+    with open(path, 'rb') as f:
+        if f.read(5) != b'%PDF-':
+            return {}
+        size = os.fstat(f.fileno()).st_size
+        try:
+            reader = _PdfReader(f, size)
+        except (ValueError, IndexError, AttributeError, zlib.error):
+            return _extract_pdf_window(f, size)
+
+        tags = {}
+        try:
+            info = reader.resolve(reader.trailer, b'Info')
+            if info:
+                tags.update(_pdf_info_tags(info))
+            catalog = reader.resolve(reader.trailer, b'Root')
+            pages = _pdf_page_count(reader.resolve(catalog, b'Pages') if catalog else None)
+        except (ValueError, IndexError, AttributeError, zlib.error):
+            pages = None
+        if pages:
+            tags['pages'] = pages
+        return tags
+
+
+EXTRACTORS = {
+    '.mp3': extract_mp3,
+    '.flac': extract_flac,
+    '.m4a': extract_mp4,
+    '.mp4': extract_mp4,
+    '.mov': extract_mp4,
+    '.mkv': extract_matroska,
+    '.webm': extract_matroska,
+    '.avi': extract_riff,
+    '.wav': extract_riff,
+    '.pdf': extract_pdf,
+}
+
+
+def extract_metadata(path: str) -> Dict:
+    """Metadatos embebidos de un archivo; {} si el formato no se conoce o está dañado
+
+    Se ejecuta en los procesos del pool, así que nunca lanza excepciones.
+    """
+    extractor = EXTRACTORS.get(os.path.splitext(path)[1].lower())
+    if extractor is None:
+        return {}
+    try:
+        tags = _clean(extractor(path))
+    except Exception:
+        return {}
+    if 'date' in tags:
+        tags['date'] = normalize_date(tags['date'])
+    return _clean(tags)
+
+
+class MetadataExtractor:
+    """Etapa de extracción en un pool de procesos con caché por firma de archivo"""
+
+    def __init__(self, store, workers: Optional[int] = None,
+                 batch_size: int = METADATA_BATCH_SIZE, logger=None):
+        self.store = store
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = max(1, batch_size)
+        self.logger = logger
+        self._executor = None
+        self._inline = self.workers <= 1
+
+    def _pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        if self._executor is None:
+            # "spawn": el uploader ya tiene hilos de subida y fork no es seguro con hilos
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _signatures(self, files: List[Path]) -> Dict[Path, Tuple]:
+        signatures = {}
+        for file_path in files:
+            try:
+                signatures[file_path] = file_signature(file_path.stat())
+            except OSError:
+                continue
+        return signatures
+
+    def _submit(self, files: List[Path], inline: bool = False):
+        """Lanzar la extracción de un lote; devuelve lo necesario para recogerla"""
+        signatures = self._signatures(files)
+        stored = self.store.get_media_metadata(list(signatures.values()), METADATA_VERSION)
+        missing = [file_path for file_path, signature in signatures.items() if signature not in stored]
+        future = None
+        if missing:
+            paths = [str(file_path) for file_path in missing]
+            if not (self._inline or inline):
+                try:
+                    future = self._pool().submit(_extract_batch, paths)
+                except (OSError, RuntimeError, NotImplementedError) as e:
+                    if self.logger:
+                        self.logger.warning(f"⚠️ Pool de procesos no disponible, metadatos en este proceso: {e}")
+                    self._inline = True
+            if future is None:
+                future = concurrent.futures.Future()
+                future.set_result(_extract_batch(paths))
+        return files, signatures, stored, missing, future
+
+    @staticmethod
+    def _ready(submitted) -> bool:
+        future = submitted[4]
+        return future is None or future.done()
+
+    def _collect(self, submitted) -> Dict[Path, Dict]:
+        files, signatures, stored, missing, future = submitted
+        results = {file_path: stored[signatures[file_path]] for file_path in files
+                   if signatures.get(file_path) in stored}
+        if future is not None:
+            try:
+                extracted = future.result()
+            except Exception as e:
+                # Un proceso del pool murió: este lote y los siguientes, en este proceso
+                if self.logger:
+                    self.logger.warning(f"⚠️ Pool de procesos caído, metadatos en este proceso: {e}")
+                self._inline = True
+                extracted = _extract_batch([str(file_path) for file_path in missing])
+            self.store.cache_media_metadata(
+                {signatures[file_path]: tags for file_path, tags in zip(missing, extracted)}, METADATA_VERSION)
+            results.update(zip(missing, extracted))
+        return results
+
+    def extract(self, files: Iterable[Path]) -> Dict[Path, Dict]:
+        """Metadatos de muchos archivos: caché primero, el resto en paralelo"""
+        results = {}
+        for file_path, tags in self.iter_extract(files):
+            results[file_path] = tags
+        return results
+
+    def extract_one(self, file_path: Path) -> Dict:
+        """Metadatos de un solo archivo, en este proceso"""
+        signature = self._signatures([file_path]).get(file_path)
+        if signature is None:
+            return {}
+        stored = self.store.get_media_metadata([signature], METADATA_VERSION)
+        if signature in stored:
+            return stored[signature]
+        tags = extract_metadata(str(file_path))
+        self.store.cache_media_metadata({signature: tags}, METADATA_VERSION)
+        return tags
+
+    def iter_extract(self, files: Iterable[Path]) -> Iterator[Tuple[Path, Dict]]:
+        """Extraer un flujo de archivos por lotes, con varios lotes en vuelo
+
+        Entrega (archivo, metadatos) en el orden de entrada; mientras se
+        consume un lote, el pool ya trabaja en los siguientes. El primer
+        archivo se extrae en este proceso y los lotes crecen hasta
+        batch_size, así la primera subida no espera al arranque del pool
+        ni a que se llenen varios lotes; los lotes ya terminados se
+        entregan en cuanto están listos.
+        """
+        in_flight = collections.deque()
+        batch = []
+        limit = 1
+        for file_path in files:
+            batch.append(file_path)
+            if len(batch) >= limit:
+                in_flight.append(self._submit(batch, inline=limit == 1))
+                batch = []
+                limit = min(limit * 2, self.batch_size)
+                while in_flight and (len(in_flight) > METADATA_PREFETCH_BATCHES or self._ready(in_flight[0])):
+                    yield from self._drain(in_flight.popleft())
+        if batch:
+            in_flight.append(self._submit(batch))
+        while in_flight:
+            yield from self._drain(in_flight.popleft())
+
+    def _drain(self, submitted) -> Iterator[Tuple[Path, Dict]]:
+        results = self._collect(submitted)
+        for file_path in submitted[0]:
+            yield file_path, results.get(file_path, {})
+
+
+def _extract_batch(paths: List[str]) -> List[Dict]:
+    """Tarea del pool: un lote por proceso reduce el coste de comunicación"""
+    return [extract_metadata(path) for path in paths]
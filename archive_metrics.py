@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+
+"""
+Métricas de Ejecución
+=====================
+
+Tiempo por fase (escaneo, hash, identificador, metadatos, transferencia,
+registro, mover...), contadores e histogramas de bytes, rendimiento y
+latencia. Al final de la ejecución se exportan en formato de texto de
+Prometheus (para el textfile collector de node_exporter) y como resumen
+JSON con percentiles.
+
+El tiempo de cada fase es exclusivo: si una fase ocurre dentro de otra
+(p. ej. el escaneo mientras se espera la extracción de metadatos), se
+descuenta de la exterior, así que las fases de un mismo hilo no se
+solapan. Con las métricas desactivadas se usa NullMetrics, cuyos
+métodos no hacen nada.
+"""
+
+import bisect
+import contextlib
+import json
+import math
+import os
+import threading
+import time
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+METRICS_PREFIX = 'archive_uploader'
+
+# Límites superiores de los histogramas (escala geométrica)
+SECONDS_BUCKETS = tuple(0.001 * 2 ** k for k in range(22))  # 1 ms .. ~35 min
+BYTES_BUCKETS = tuple(1024 * 4 ** k for k in range(14))  # 1 KB .. 64 GB
+THROUGHPUT_BUCKETS = tuple(1024 * 2 ** k for k in range(21))  # 1 KB/s .. 1 GB/s
+
+# Histogramas conocidos: límites y descripción
+HISTOGRAMS = {
+    'phase_seconds': (SECONDS_BUCKETS, 'Tiempo exclusivo por fase, en segundos'),
+    'file_bytes': (BYTES_BUCKETS, 'Tamaño de los archivos transferidos'),
+    'throughput_bytes_per_second': (THROUGHPUT_BUCKETS, 'Rendimiento por archivo transferido'),
+}
+COUNTERS = {
+    'files_total': 'Archivos por estado registrado',
+    'bytes_uploaded_total': 'Bytes transferidos con éxito',
+}
+
+PERCENTILES = (50, 90, 99)
+
+
+class Histogram:
+    """Histograma de cubetas fijas: memoria constante, percentiles aproximados"""
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def percentile(self, p: float) -> float:
+        """Interpolación lineal dentro de la cubeta, acotada por el mínimo y el máximo vistos"""
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else self.max
+                value = lower + (upper - lower) * (rank - seen) / count
+                return min(max(value, self.min), self.max)
+            seen += count
+        return self.max
+
+
+def _number(value: float) -> str:
+    """Número exacto para el formato de Prometheus (sin notación abreviada)"""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _label_text(labels: Tuple[Tuple[str, str], ...], extra: str = '') -> str:
+    parts = [f'{key}="{value}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class Metrics:
+    """Contadores, histogramas y temporizadores por fase, seguros entre hilos"""
+
+    enabled = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._histograms: Dict[Tuple[str, Tuple], Histogram] = {}
+        self._local = threading.local()
+        self.started = time.time()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(HISTOGRAMS[name][0])
+            histogram.observe(value)
+
+    @contextlib.contextmanager
+    def timer(self, phase: str):
+        """Medir una fase; el tiempo de las fases anidadas se descuenta de esta"""
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        frame = [0.0]  # tiempo de las fases hijas
+        stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            if stack:
+                stack[-1][0] += elapsed
+            self.observe('phase_seconds', max(0.0, elapsed - frame[0]), phase=phase)
+
+    def timed_iter(self, iterable: Iterable, phase: str) -> Iterator:
+        """Medir como `phase` el tiempo de producir cada elemento de un iterable"""
+        iterator = iter(iterable)
+        while True:
+            with self.timer(phase):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def transfer(self, size: int, seconds: float):
+        """Registrar un archivo transferido con éxito"""
+        self.inc('bytes_uploaded_total', size)
+        self.observe('file_bytes', size)
+        if seconds > 0:
+            self.observe('throughput_bytes_per_second', size / seconds)
+
+    # Exportación
+
+    def to_prometheus(self) -> str:
+        """Todas las métricas en el formato de texto de Prometheus"""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+
+            seen = set()
+            for (name, labels), value in counters:
+                metric = f'{METRICS_PREFIX}_{name}'
+                if name not in seen:
+                    seen.add(name)
+                    lines.append(f'# HELP {metric} {COUNTERS.get(name, name)}')
+                    lines.append(f'# TYPE {metric} counter')
+                lines.append(f'{metric}{_label_text(labels)} {_number(value)}')
+
+            for (name, labels), histogram in histograms:
+                metric = f'{METRICS_PREFIX}_{name}'
+                if name not in seen:
+                    seen.add(name)
+                    lines.append(f'# HELP {metric} {HISTOGRAMS[name][1]}')
+                    lines.append(f'# TYPE {metric} histogram')
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    bucket = _label_text(labels, 'le="%g"' % bound)
+                    lines.append(f'{metric}_bucket{bucket} {cumulative}')
+                bucket = _label_text(labels, 'le="+Inf"')
+                lines.append(f'{metric}_bucket{bucket} {histogram.count}')
+                lines.append(f'{metric}_sum{_label_text(labels)} {_number(histogram.sum)}')
+                lines.append(f'{metric}_count{_label_text(labels)} {histogram.count}')
+
+        elapsed = time.time() - self.started
+        lines.append(f'# HELP {METRICS_PREFIX}_run_seconds Duración de la ejecución')
+        lines.append(f'# TYPE {METRICS_PREFIX}_run_seconds gauge')
+        lines.append(f'{METRICS_PREFIX}_run_seconds {_number(elapsed)}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> Dict:
+        """Resumen con totales y percentiles, para JSON"""
+        elapsed = time.time() - self.started
+        result = {'run_seconds': round(elapsed, 3), 'counters': {}, 'histograms': {}}
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                key = name + _label_text(labels)
+                result['counters'][key] = value
+            for (name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                key = name + _label_text(labels)
+                result['histograms'][key] = {
+                    'count': histogram.count,
+                    'sum': round(histogram.sum, 6),
+                    'mean': round(histogram.sum / histogram.count, 6) if histogram.count else 0,
+                    'min': round(histogram.min, 6) if histogram.count else 0,
+                    'max': round(histogram.max, 6),
+                    **{f'p{p}': round(histogram.percentile(p), 6) for p in PERCENTILES},
+                }
+            uploaded = sum(value for (name, _), value in self._counters.items() if name == 'bytes_uploaded_total')
+        result['throughput_bytes_per_second'] = round(uploaded / elapsed, 1) if elapsed > 0 else 0
+        return result
+
+    def phase_totals(self) -> Dict[str, float]:
+        """Segundos acumulados por fase (sumados entre hilos)"""
+        with self._lock:
+            return {dict(labels)['phase']: histogram.sum
+                    for (name, labels), histogram in self._histograms.items() if name == 'phase_seconds'}
+
+    def write(self, prometheus_path: Optional[str] = None, json_path: Optional[str] = None):
+        """Escribir las exportaciones pedidas de forma atómica"""
+        for path, content in ((prometheus_path, self.to_prometheus),
+                              (json_path, lambda: json.dumps(self.summary(), indent=2, ensure_ascii=False))):
+            if not path:
+                continue
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(content())
+            os.replace(tmp_path, path)
+
+
+class NullMetrics:
+    """Métricas desactivadas: misma interfaz, sin coste"""
+
+    enabled = False
+    _null_timer = contextlib.nullcontext()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        pass
+
+    def observe(self, name: str, value: float, **labels):
+        pass
+
+    def timer(self, phase: str):
+        return self._null_timer
+
+    def timed_iter(self, iterable: Iterable, phase: str) -> Iterable:
+        return iterable
+
+    def transfer(self, size: int, seconds: float):
+        pass
+
+    def phase_totals(self) -> Dict[str, float]:
+        return {}
+
+    def write(self, prometheus_path: Optional[str] = None, json_path: Optional[str] = None):
+        pass
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+
+"""
+Subidas Multiparte
+==================
+
+Sube archivos grandes por partes con la API multiparte compatible con S3
+de Archive.org (s3.us.archive.org). Cada parte confirmada se guarda en el
+almacén de progreso, así una conexión caída al 95% de un video de 20 GB
+solo repite la parte que estaba en curso.
+"""
+
+import datetime
+import math
+import threading
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import quote
+
+from internetarchive.auth import S3Auth
+from internetarchive.iarequest import S3Request
+
+# Archivos a partir de este tamaño se suben por partes
+MULTIPART_THRESHOLD = 1024 ** 3  # 1 GB
+MULTIPART_PART_SIZE = 100 * 1024 ** 2  # 100 MB
+
+# Límites de la API S3: partes de al menos 5 MB y como máximo 10.000 partes
+MIN_PART_SIZE = 5 * 1024 ** 2
+MAX_PARTS = 10000
+
+# (conexión, lectura) en segundos; completar una subida grande puede tardar
+PART_TIMEOUT = (30, 300)
+COMPLETE_TIMEOUT = (30, 1800)
+
+# UploadIds iniciados por este proceso: siempre se continúan (p. ej. al reintentar una parte
+# fallida); resume solo decide sobre los puntos de control de ejecuciones anteriores
+_started_here = set()
+_started_lock = threading.Lock()
+
+
+class PartReader:
+    """Lee la porción [offset, offset + length) de un archivo sin cargarla en memoria"""
+
+    def __init__(self, f, offset: int, length: int, limiter=None):
+        self._file = f
+        self._limiter = limiter
+        self._file.seek(offset)
+        self.length = length
+        self._remaining = length
+
+    def read(self, size: int = -1) -> bytes:
+        if self._remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        if self._limiter is not None and data:
+            self._limiter.consume(len(data))
+        return data
+
+    def __len__(self) -> int:
+        # requests usa len() para fijar Content-Length (IA-S3 no admite chunked)
+        return self.length
+
+
+def _find_text(root: ET.Element, tag: str) -> Optional[str]:
+    """Buscar un elemento ignorando el espacio de nombres del XML de S3"""
+    for element in root.iter():
+        if element.tag == tag or element.tag.endswith('}' + tag):
+            return element.text
+    return None
+
+
+class MultipartUpload:
+    """Subida multiparte reanudable de un archivo a un item"""
+
+    def __init__(self, session, store, part_size: int = MULTIPART_PART_SIZE, logger=None,
+                 limiter=None):
+        self.session = session
+        self.store = store
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.logger = logger
+        self.limiter = limiter
+        self.auth = S3Auth(session.access_key, session.secret_key)
+
+    def _log(self, message: str):
+        if self.logger:
+            self.logger.info(message)
+
+    def _url(self, identifier: str, key: str) -> str:
+        return f"https://s3.us.archive.org/{identifier}/{quote(key)}"
+
+    def _initiate(self, url: str, size: int, metadata: Dict, queue_derive: bool) -> str:
+        """Crear la subida multiparte y devolver su UploadId"""
+        request = S3Request(
+            method='POST',
+            url=f"{url}?uploads",
+            headers={'x-archive-size-hint': str(size)},
+            metadata=metadata,
+            queue_derive=queue_derive,
+            access_key=self.session.access_key,
+            secret_key=self.session.secret_key,
+        )
+        response = self.session.send(request.prepare(), timeout=PART_TIMEOUT)
+        response.raise_for_status()
+        upload_id = _find_text(ET.fromstring(response.content), 'UploadId')
+        if not upload_id:
+            raise ValueError(f"Respuesta sin UploadId al iniciar subida multiparte: {url}")
+        return upload_id
+
+    def _list_parts(self, url: str, upload_id: str) -> Optional[Dict[int, str]]:
+        """Partes que el servidor ya tiene, o None si la subida ya no existe"""
+        response = self.session.get(url, params={'uploadId': upload_id}, auth=self.auth,
+                                    timeout=PART_TIMEOUT)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+
+        parts = {}
+        for element in ET.fromstring(response.content).iter():
+            if element.tag.endswith('Part'):
+                number = _find_text(element, 'PartNumber')
+                etag = _find_text(element, 'ETag')
+                if number and etag:
+                    parts[int(number)] = etag
+        return parts
+
+    def abort(self, url: str, upload_id: str):
+        """Cancelar una subida multiparte en el servidor (mejor esfuerzo)"""
+        try:
+            self.session.delete(url, params={'uploadId': upload_id}, auth=self.auth,
+                                timeout=PART_TIMEOUT)
+        except Exception:
+            pass
+
+    def _upload_part(self, url: str, upload_id: str, part_number: int,
+                     f, offset: int, length: int) -> str:
+        """Subir una parte y devolver su ETag"""
+        response = self.session.put(
+            url,
+            params={'partNumber': part_number, 'uploadId': upload_id},
+            data=PartReader(f, offset, length, self.limiter),
+            auth=self.auth,
+            timeout=PART_TIMEOUT,
+        )
+        response.raise_for_status()
+        etag = response.headers.get('ETag')
+        if not etag:
+            raise ValueError(f"Parte {part_number} sin ETag en la respuesta")
+        return etag
+
+    def _complete(self, url: str, upload_id: str, parts: Dict[int, str]):
+        """Unir las partes en el archivo final"""
+        body = ''.join(f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>"
+                       for number, etag in sorted(parts.items()))
+        response = self.session.post(
+            url,
+            params={'uploadId': upload_id},
+            data=f"<CompleteMultipartUpload>{body}</CompleteMultipartUpload>".encode('utf-8'),
+            headers={'Content-Type': 'application/xml'},
+            auth=self.auth,
+            timeout=COMPLETE_TIMEOUT,
+        )
+        response.raise_for_status()
+        return response
+
+    def upload(self, file_path: Path, identifier: str, metadata: Dict,
+               key: Optional[str] = None, resume: bool = True, queue_derive: bool = True):
+        """Subir un archivo por partes, continuando un punto de control válido
+
+        Los puntos de control de este proceso se continúan siempre; los de
+        ejecuciones anteriores, solo con resume=True.
+
+        Devuelve la respuesta de la petición que completa la subida.
+        """
+        file_id = str(file_path)
+        key = key or file_path.name
+        url = self._url(identifier, key)
+        stat = file_path.stat()
+        size = stat.st_size
+        part_size = max(self.part_size, math.ceil(size / MAX_PARTS))
+
+        checkpoint = self.store.get_multipart(file_id)
+        if checkpoint is not None:
+            same_upload = (checkpoint['identifier'] == identifier and checkpoint['key'] == key
+                           and checkpoint['size'] == size and checkpoint['mtime_ns'] == stat.st_mtime_ns)
+            with _started_lock:
+                own = checkpoint['upload_id'] in _started_here
+            if same_upload and (resume or own):
+                server_parts = self._list_parts(url, checkpoint['upload_id'])
+                if server_parts is None:
+                    self._log(f"⚠️ La subida multiparte de {file_path.name} expiró, se empieza de nuevo")
+                    checkpoint = None
+                else:
+                    # Solo valen las partes que el servidor confirma con el mismo ETag
+                    checkpoint['parts'] = {number: etag for number, etag in checkpoint['parts'].items()
+                                           if server_parts.get(number) == etag}
+                    part_size = checkpoint['part_size']
+            else:
+                self.abort(self._url(checkpoint['identifier'], checkpoint['key']), checkpoint['upload_id'])
+                checkpoint = None
+
+        if checkpoint is None:
+            upload_id = self._initiate(url, size, metadata, queue_derive)
+            with _started_lock:
+                _started_here.add(upload_id)
+            checkpoint = {
+                'identifier': identifier,
+                'key': key,
+                'upload_id': upload_id,
+                'size': size,
+                'mtime_ns': stat.st_mtime_ns,
+                'part_size': part_size,
+                'started': datetime.datetime.now().isoformat(),
+                'parts': {},
+            }
+            self.store.start_multipart(file_id, checkpoint)
+
+        upload_id = checkpoint['upload_id']
+        parts = checkpoint['parts']
+        total_parts = max(1, math.ceil(size / part_size))
+        if parts:
+            self._log(f"⏯️ Reanudando {file_path.name}: {len(parts)}/{total_parts} partes ya subidas")
+
+        with open(file_path, 'rb') as f:
+            for part_number in range(1, total_parts + 1):
+                if part_number in parts:
+                    continue
+                offset = (part_number - 1) * part_size
+                length = min(part_size, size - offset)
+                etag = self._upload_part(url, upload_id, part_number, f, offset, length)
+                parts[part_number] = etag
+                self.store.record_part(file_id, part_number, etag)
+                self._log(f"📦 {file_path.name}: parte {part_number}/{total_parts}")
+
+        response = self._complete(url, upload_id, parts)
+        self.store.finish_multipart(file_id)
+        return response
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+
+"""
+Control de Red
+==============
+
+Limitador de ancho de banda global (token bucket) compartido por todas
+las subidas de un ArchiveUploader, ya vengan de los workers de la CLI,
+del motor asíncrono o del ThreadPoolExecutor de la GUI.
+
+El límite se puede cambiar en caliente y admite horarios, por ejemplo
+sin límite de noche y con tope en horario de oficina:
+
+    09:00-18:00=2M,18:00-09:00=0
+
+También incluye un control de concurrencia adaptativo (AIMD): sube de a
+uno mientras el rendimiento crece y se reduce a la mitad cuando el
+servidor responde 503 SlowDown / 429 o la latencia se dispara.
+"""
+
+import contextlib
+import datetime
+import re
+import threading
+import time
+from typing import Callable, Iterator, List, Optional, Tuple
+
+# Ráfaga máxima acumulable, en segundos de tasa
+BURST_SECONDS = 1.0
+
+# Ráfaga mínima para no trocear en exceso con tasas muy bajas
+MIN_BURST_BYTES = 64 * 1024
+
+# Cada cuánto se vuelve a evaluar el horario
+SCHEDULE_CHECK_SECONDS = 1.0
+
+# Concurrencia adaptativa (AIMD)
+ADAPTIVE_MAX_CONCURRENCY = 16
+AIMD_DECREASE_FACTOR = 0.5
+# Crecimiento mínimo del rendimiento entre rondas para seguir subiendo
+AIMD_GROWTH_THRESHOLD = 0.1
+# Subidas por ronda de medición, en múltiplos del límite actual
+AIMD_ROUND_FACTOR = 2
+# Latencia (segundos por MB) por encima de este múltiplo de la mejor vista = congestión
+AIMD_LATENCY_FACTOR = 2.0
+AIMD_LATENCY_ALPHA = 0.2
+AIMD_LATENCY_MIN_SAMPLES = 5
+
+THROTTLE_STATUS_CODES = (429, 503)
+
+_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+_RATE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([KMG]?)(?:I?B)?(?:/S)?\s*$', re.IGNORECASE)
+_UNLIMITED = ('', '0', 'none', 'unlimited', 'sin limite', 'sin límite')
+
+# (inicio, fin, tasa): minutos desde medianoche y bytes/s (None = sin límite)
+ScheduleWindow = Tuple[int, int, Optional[float]]
+
+
+def parse_rate(text: Optional[str]) -> Optional[float]:
+    """Convertir '5M', '500K' o '1048576' a bytes por segundo. None = sin límite"""
+    if text is None or str(text).strip().lower() in _UNLIMITED:
+        return None
+    match = _RATE_RE.match(str(text))
+    if not match:
+        raise ValueError(f"Ancho de banda no válido: {text!r} (ej. 500K, 5M, 1G)")
+    rate = float(match.group(1)) * _UNITS[match.group(2).upper()]
+    return rate or None
+
+
+def _parse_time(text: str) -> int:
+    hours, _, minutes = text.strip().partition(':')
+    hours, minutes = int(hours), int(minutes or 0)
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or hours * 60 + minutes > 24 * 60:
+        raise ValueError(f"Hora no válida: {text!r}")
+    return hours * 60 + minutes
+
+
+def parse_schedule(text: Optional[str]) -> List[ScheduleWindow]:
+    """Leer un horario 'HH:MM-HH:MM=TASA,...'. Las franjas pueden cruzar la medianoche"""
+    windows = []
+    for part in (text or '').split(','):
+        if not part.strip():
+            continue
+        span, sep, rate = part.partition('=')
+        start, dash, end = span.partition('-')
+        if not sep or not dash:
+            raise ValueError(f"Franja horaria no válida: {part.strip()!r} (ej. 09:00-18:00=2M)")
+        windows.append((_parse_time(start), _parse_time(end), parse_rate(rate)))
+    return windows
+
+
+def format_rate(rate: Optional[float]) -> str:
+    """Tasa legible para el log"""
+    if rate is None:
+        return 'sin límite'
+    for unit in ('G', 'M', 'K'):
+        if rate >= _UNITS[unit]:
+            return f"{rate / _UNITS[unit]:.1f} {unit}B/s"
+    return f"{rate:.0f} B/s"
+
+
+class BandwidthLimiter:
+    """Token bucket seguro entre hilos para todo el tráfico de subida"""
+
+    def __init__(self, rate: Optional[float] = None, schedule: Optional[List[ScheduleWindow]] = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self._lock = threading.Lock()
+        self._rate = rate or None
+        self._schedule = list(schedule or [])
+        # Reloj y espera inyectables para medir el limitador sin dormir
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = 0.0
+        self._last = clock()
+        self._checked = 0.0
+        self._effective = self._rate
+
+    @property
+    def rate(self) -> Optional[float]:
+        """Límite base en bytes/s (fuera de las franjas del horario)"""
+        return self._rate
+
+    def set_rate(self, rate: Optional[float]):
+        """Cambiar el límite base; afecta de inmediato a las subidas en curso"""
+        with self._lock:
+            self._rate = rate or None
+            self._checked = 0.0
+
+    def set_schedule(self, schedule: Optional[List[ScheduleWindow]]):
+        with self._lock:
+            self._schedule = list(schedule or [])
+            self._checked = 0.0
+
+    def rate_at(self, when: datetime.datetime) -> Optional[float]:
+        """Límite vigente a una hora dada según el horario"""
+        minute = when.hour * 60 + when.minute
+        for start, end, rate in self._schedule:
+            if start <= end:
+                inside = start <= minute < end
+            else:
+                inside = minute >= start or minute < end
+            if inside:
+                return rate
+        return self._rate
+
+    def current_rate(self) -> Optional[float]:
+        """Límite vigente ahora (bytes/s, None = sin límite)"""
+        with self._lock:
+            return self._current_rate(self._clock())
+
+    def _current_rate(self, now: float) -> Optional[float]:
+        if not self._schedule:
+            return self._rate
+        if now - self._checked >= SCHEDULE_CHECK_SECONDS:
+            self._effective = self.rate_at(datetime.datetime.now())
+            self._checked = now
+        return self._effective
+
+    def consume(self, amount: int):
+        """Reservar `amount` bytes, esperando lo necesario para respetar el límite"""
+        if self._rate is None and not self._schedule:
+            return
+
+        while amount > 0:
+            with self._lock:
+                now = self._clock()
+                rate = self._current_rate(now)
+                if rate is None:
+                    self._tokens = 0.0
+                    self._last = now
+                    return
+                burst = max(rate * BURST_SECONDS, MIN_BURST_BYTES)
+                self._tokens = min(burst, self._tokens + (now - self._last) * rate)
+                self._last = now
+                # Reservar aunque quede en negativo: los hilos esperan en orden de llegada
+                take = min(amount, burst)
+                self._tokens -= take
+                wait = -self._tokens / rate if self._tokens < 0 else 0.0
+            amount -= take
+            if wait > 0:
+                self._sleep(wait)
+
+    def wrap(self, f) -> 'ThrottledFile':
+        """Envolver un archivo abierto para que sus lecturas pasen por el limitador"""
+        return ThrottledFile(f, self)
+
+
+class ThrottledFile:
+    """Archivo cuyas lecturas consumen del limitador (lo que lee requests es lo que se envía)"""
+
+    def __init__(self, f, limiter: BandwidthLimiter):
+        self._file = f
+        self._limiter = limiter
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._file.read(size)
+        if data:
+            self._limiter.consume(len(data))
+        return data
+
+    def __getattr__(self, name):
+        # seek, tell, name, fileno... se delegan al archivo real
+        return getattr(self._file, name)
+
+
+def is_throttled(error: BaseException) -> bool:
+    """Indicar si un error es una señal de sobrecarga del servidor (503 SlowDown, 429)"""
+    response = getattr(error, 'response', None)
+    if getattr(response, 'status_code', None) in THROTTLE_STATUS_CODES:
+        return True
+    return 'SlowDown' in str(error)
+
+
+class AdaptiveConcurrency:
+    """Límite de subidas simultáneas que se ajusta con la contrapresión del servidor
+
+    Los hilos piden un hueco con slot(); el límite sube en uno por cada
+    ronda completa en la que se llegó a usar entero y el rendimiento
+    creció, y se reduce a la mitad ante 503/429 o latencia creciente.
+    Las señales de subidas iniciadas antes del último ajuste se ignoran
+    para no recortar varias veces por la misma congestión.
+    """
+
+    def __init__(self, initial: int = 1, minimum: int = 1, maximum: int = ADAPTIVE_MAX_CONCURRENCY,
+                 on_change: Optional[Callable[[int, int, str], None]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self._limit = min(max(initial, self.minimum), self.maximum)
+        self.on_change = on_change
+        self._cond = threading.Condition()
+        self._clock = clock
+        self._in_flight = 0
+        self._changed_at = clock()
+        self._round_start = self._changed_at
+        self._round_done = 0
+        self._round_bytes = 0
+        self._round_saturated = False
+        self._last_throughput = None
+        self._latency = None
+        self._best_latency = None
+        self._samples = 0
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self) -> float:
+        """Esperar un hueco libre. Devuelve el instante de inicio"""
+        with self._cond:
+            while self._in_flight >= self._limit:
+                self._cond.wait()
+            self._in_flight += 1
+            if self._in_flight >= self._limit:
+                self._round_saturated = True
+        return self._clock()
+
+    def release(self, started: float, size: int = 0, ok: bool = True, throttled: bool = False):
+        """Liberar un hueco y registrar el resultado de la subida"""
+        change = None
+        with self._cond:
+            self._in_flight -= 1
+            now = self._clock()
+            fresh = started >= self._changed_at
+
+            if throttled:
+                if fresh:
+                    change = self._decrease(now, "el servidor pidió bajar el ritmo (503/429)")
+            elif ok:
+                change = self._observe(now, now - started, size, fresh)
+            self._cond.notify_all()
+
+        if change and self.on_change:
+            self.on_change(*change)
+
+    @contextlib.contextmanager
+    def slot(self, size: int = 0) -> Iterator[None]:
+        """Contexto que ocupa un hueco durante una subida"""
+        started = self.acquire()
+        ok = throttled = False
+        try:
+            yield
+            ok = True
+        except BaseException as e:
+            throttled = is_throttled(e)
+            raise
+        finally:
+            self.release(started, size, ok, throttled)
+
+    def _observe(self, now: float, latency: float, size: int, fresh: bool) -> Optional[Tuple[int, int, str]]:
+        # Latencia por MB (mínimo 1 MB para que los archivos pequeños no dominen)
+        per_mb = latency / max(size / 1024 ** 2, 1.0)
+        self._samples += 1
+        self._latency = per_mb if self._latency is None else (
+            AIMD_LATENCY_ALPHA * per_mb + (1 - AIMD_LATENCY_ALPHA) * self._latency)
+        if self._samples >= AIMD_LATENCY_MIN_SAMPLES:
+            if self._best_latency is None or self._latency < self._best_latency:
+                self._best_latency = self._latency
+            elif fresh and self._latency > AIMD_LATENCY_FACTOR * self._best_latency:
+                return self._decrease(now, f"latencia en aumento ({self._latency * 1000:.0f} ms/MB)")
+
+        if not fresh:
+            return None
+        self._round_done += 1
+        self._round_bytes += size
+        if self._round_done < self._limit * AIMD_ROUND_FACTOR:
+            return None
+
+        elapsed = max(now - self._round_start, 1e-6)
+        throughput = self._round_bytes / elapsed
+        previous = self._last_throughput
+        saturated = self._round_saturated
+        self._last_throughput = throughput
+        self._start_round(now, reset_changed=False)
+        # Sin demanda suficiente para llenar el límite, subirlo no aporta nada
+        if self._limit >= self.maximum or not saturated:
+            return None
+        if previous is None or throughput > previous * (1 + AIMD_GROWTH_THRESHOLD):
+            return self._set_limit(now, self._limit + 1,
+                                   f"rendimiento en aumento ({format_rate(throughput)})")
+        return None
+
+    def _decrease(self, now: float, reason: str) -> Optional[Tuple[int, int, str]]:
+        self._last_throughput = None
+        # La latencia de referencia se reinicia con el nuevo nivel
+        self._latency = self._best_latency
+        return self._set_limit(now, int(self._limit * AIMD_DECREASE_FACTOR), reason)
+
+    def _set_limit(self, now: float, limit: int, reason: str) -> Optional[Tuple[int, int, str]]:
+        limit = min(max(limit, self.minimum), self.maximum)
+        self._start_round(now)
+        if limit == self._limit:
+            return None
+        previous, self._limit = self._limit, limit
+        return previous, limit, reason
+
+    def _start_round(self, now: float, reset_changed: bool = True):
+        if reset_changed:
+            self._changed_at = now
+        self._round_start = now
+        self._round_done = 0
+        self._round_bytes = 0
+        self._round_saturated = self._in_flight >= self._limit
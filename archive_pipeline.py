@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+"""
+Pipeline de Subida por Etapas
+=============================
+
+Divide la subida en etapas (hash -> metadatos -> subida -> cierre), cada
+una con sus propios hilos y una cola de entrada acotada. Mientras la red
+sube un archivo, las etapas de disco y CPU ya preparan los siguientes;
+cuando una cola se llena, la etapa anterior se detiene (back-pressure),
+así que la memoria no crece con el tamaño del lote.
+
+Una etapa recibe un trabajo y devuelve True para pasarlo a la siguiente
+o False si el trabajo terminó ahí (p. ej. un duplicado). Si lanza una
+excepción, `on_error` decide: devuelve una espera en segundos para
+repetir la misma etapa más tarde, o None para darlo por terminado. Si
+se detiene con reintentos en espera, cada uno pasa por `on_abandon` y
+termina como cualquier otro trabajo (con `on_done`).
+"""
+
+import threading
+import queue
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from archive_retry import RetryQueue
+
+# Tamaño mínimo de la cola de entrada de cada etapa
+PIPELINE_QUEUE_SIZE = 16
+
+# Cada cuántos segundos se informa la profundidad de las colas
+PIPELINE_REPORT_SECONDS = 10.0
+
+_STOP = object()
+
+
+class Stage:
+    """Una etapa del pipeline: función, hilos propios y cola acotada"""
+
+    def __init__(self, name: str, func: Callable[[Any], bool], workers: int = 1,
+                 queue_size: Optional[int] = None):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.queue = queue.Queue(maxsize=queue_size or max(PIPELINE_QUEUE_SIZE, 2 * self.workers))
+        self.busy = 0
+        self.done = 0
+
+
+class Pipeline:
+    """Etapas encadenadas por colas acotadas, alimentadas desde el hilo que llama"""
+
+    def __init__(self, stages: List[Stage], on_done: Optional[Callable[[Any], None]] = None,
+                 on_error: Optional[Callable[[Any, Exception], Optional[float]]] = None,
+                 on_abandon: Optional[Callable[[Any], None]] = None,
+                 logger=None, report_interval: float = PIPELINE_REPORT_SECONDS):
+        self.stages = stages
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_abandon = on_abandon
+        self.logger = logger
+        self.report_interval = report_interval
+        self.fed = 0
+        self._lock = threading.Condition()
+        self._in_flight = 0
+        self._retries = RetryQueue()
+        self._closing = False
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Por etapa: trabajos en cola, en proceso y terminados"""
+        with self._lock:
+            stats = {stage.name: {'queued': stage.queue.qsize(), 'busy': stage.busy, 'done': stage.done}
+                     for stage in self.stages}
+            stats['retry'] = {'queued': len(self._retries), 'busy': 0, 'done': 0}
+        return stats
+
+    def describe(self) -> str:
+        parts = [f"{name} {values['queued']}+{values['busy']}"
+                 for name, values in self.stats().items()]
+        return ' | '.join(parts)
+
+    def _finish(self, item: Any):
+        if self.on_done:
+            try:
+                self.on_done(item)
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(f"❌ Error registrando resultado: {e}")
+        with self._lock:
+            self._in_flight -= 1
+            self._lock.notify_all()
+
+    def _abandon(self, item: Any):
+        if self.on_abandon:
+            try:
+                self.on_abandon(item)
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(f"❌ Error abandonando un reintento: {e}")
+        self._finish(item)
+
+    def _worker(self, index: int):
+        stage = self.stages[index]
+        following = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            item = stage.queue.get()
+            if item is _STOP:
+                return
+            with self._lock:
+                stage.busy += 1
+            delay = None
+            try:
+                forward = stage.func(item)
+            except Exception as e:
+                forward = False
+                delay = self.on_error(item, e) if self.on_error else None
+                if delay is None and self.on_error is None and self.logger:
+                    self.logger.error(f"❌ Error en la etapa {stage.name}: {e}")
+            with self._lock:
+                stage.busy -= 1
+                stage.done += 1
+                if delay is not None:
+                    self._retries.push((index, item), delay)
+                    self._lock.notify_all()
+            if delay is not None:
+                continue
+            if forward and following is not None:
+                # Se bloquea si la etapa siguiente va atrasada (back-pressure)
+                following.queue.put(item)
+            else:
+                self._finish(item)
+
+    def _retry_loop(self):
+        """Devolver los trabajos a su etapa cuando vence su espera"""
+        while True:
+            with self._lock:
+                while not self._closing and (not self._retries or self._retries.wait_time() > 0):
+                    self._lock.wait(timeout=self._retries.wait_time() if self._retries else None)
+                if self._closing:
+                    return
+                index, item = self._retries.pop_ready()
+            self.stages[index].queue.put(item)
+
+    def _report_loop(self, finished: threading.Event):
+        while not finished.wait(self.report_interval):
+            if self._in_flight:  # En reposo (p. ej. vigilando un directorio) no hay nada que contar
+                self.logger.info(f"📊 Colas: {self.describe()}")
+
+    def run(self, source: Iterable, should_stop: Optional[Callable[[], bool]] = None) -> int:
+        """Pasar todos los trabajos de `source` por las etapas. Devuelve cuántos entraron
+
+        `source` se consume en el hilo que llama, al ritmo que admite la
+        primera cola. Con should_stop() verdadero se deja de alimentar y
+        se terminan los trabajos que ya estaban dentro.
+        """
+        threads = [threading.Thread(target=self._worker, args=(index,), daemon=True,
+                                    name=f'{stage.name}-{number}')
+                   for index, stage in enumerate(self.stages) for number in range(stage.workers)]
+        threads.append(threading.Thread(target=self._retry_loop, daemon=True, name='retry'))
+        finished = threading.Event()
+        if self.logger and self.report_interval:
+            threading.Thread(target=self._report_loop, args=(finished,), daemon=True, name='report').start()
+        for thread in threads:
+            thread.start()
+
+        try:
+            for item in source:
+                if should_stop and should_stop():
+                    break
+                with self._lock:
+                    self._in_flight += 1
+                self.fed += 1
+                self.stages[0].queue.put(item)
+
+            while True:
+                dropped = []
+                with self._lock:
+                    while self._in_flight and not dropped:
+                        if should_stop and should_stop() and self._retries:
+                            dropped = self._retries.clear()
+                        else:
+                            self._lock.wait(timeout=1.0 if should_stop else None)
+                if not dropped:
+                    break
+                # Al detenerse, los reintentos pendientes se abandonan, pero se cierran como
+                # cualquier otro trabajo: se cuentan y sueltan lo que tengan tomado
+                for _, item in dropped:
+                    self._abandon(item)
+        finally:
+            finished.set()
+            with self._lock:
+                self._closing = True
+                self._lock.notify_all()
+                drained = not self._in_flight
+            # Tras una excepción quedan trabajos dentro: los hilos (daemon) se abandonan
+            if drained:
+                for stage in self.stages:
+                    for _ in range(stage.workers):
+                        stage.queue.put(_STOP)
+                for thread in threads:
+                    thread.join()
+        return self.fed
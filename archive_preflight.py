@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+"""
+Comprobación Previa de Items Remotos
+====================================
+
+Antes de subir, pregunta en bloque a Archive.org qué identificadores ya
+existen con la API de búsqueda (scrape), un puñado de identificadores
+por consulta en lugar de un GET de metadatos por item. Las respuestas,
+positivas y negativas, se guardan en el almacén de progreso con un TTL,
+así que repetir la ejecución no cuesta ninguna petición de red.
+"""
+
+from typing import Dict, Iterable, Set
+
+# Identificadores por consulta (la URL de búsqueda tiene un largo máximo)
+PREFLIGHT_BATCH_SIZE = 100
+
+# Validez de las respuestas guardadas, en segundos
+PREFLIGHT_TTL = 24 * 3600
+
+
+class RemoteIndex:
+    """Existencia de items en Archive.org con caché local por TTL"""
+
+    def __init__(self, store, ttl: float = PREFLIGHT_TTL,
+                 batch_size: int = PREFLIGHT_BATCH_SIZE, logger=None):
+        self.store = store
+        self.ttl = ttl
+        self.batch_size = max(1, batch_size)
+        self.logger = logger
+
+    def _search(self, session, identifiers: list) -> Set[str]:
+        """Una consulta de búsqueda para un lote de identificadores"""
+        terms = ' OR '.join(f'"{identifier}"' for identifier in identifiers)
+        results = session.search_items(f'identifier:({terms})', fields=['identifier'])
+        return {result['identifier'] for result in results if 'identifier' in result}
+
+    def existing(self, identifiers: Iterable[str], session) -> Set[str]:
+        """Subconjunto de `identifiers` que ya existe en Archive.org
+
+        Si una consulta falla, sus identificadores se dan por desconocidos
+        (no existentes) y no se guardan en la caché.
+        """
+        identifiers = list(dict.fromkeys(identifiers))
+        cached = self.store.get_remote_items(identifiers, self.ttl)
+        found = {identifier for identifier, exists in cached.items() if exists}
+        missing = [identifier for identifier in identifiers if identifier not in cached]
+
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            try:
+                remote = self._search(session, batch)
+            except Exception as e:
+                if self.logger:
+                    self.logger.warning(f"⚠️ No se pudo comprobar {len(batch)} items en Archive.org: {e}")
+                continue
+            found.update(remote)
+            self.store.cache_remote_items({identifier: identifier in remote for identifier in batch})
+
+        if self.logger and identifiers:
+            self.logger.info(f"🔎 Comprobación previa: {len(identifiers)} items, "
+                             f"{len(identifiers) - len(missing)} desde caché, {len(found)} ya existen")
+        return found
+
+    def mark(self, identifiers: Dict[str, bool]):
+        """Registrar existencia conocida sin consultar (p. ej. tras subir)"""
+        self.store.cache_remote_items(identifiers)
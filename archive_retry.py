@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+"""
+Reintentos
+==========
+
+Clasifica los fallos de subida en transitorios (timeouts, conexiones
+cortadas, 5xx, 503 SlowDown, 429) o permanentes (autenticación,
+identificador no válido, archivo inexistente) y calcula la espera antes
+de reintentar: backoff exponencial con jitter, respetando Retry-After.
+
+Los archivos con fallos transitorios vuelven a la cola con RetryLater en
+lugar de dormir en un hilo de subida.
+"""
+
+import email.utils
+import heapq
+import itertools
+import random
+import socket
+import time
+from typing import Any, List, Optional, Tuple
+
+import requests
+
+TRANSIENT = 'transient'
+PERMANENT = 'permanent'
+
+# Reintentos por archivo ante fallos transitorios
+DEFAULT_MAX_RETRIES = 4
+
+# Espera base y máxima entre reintentos, en segundos
+RETRY_BASE_DELAY = 2.0
+RETRY_MAX_DELAY = 300.0
+
+# Respuestas HTTP que merecen otro intento
+TRANSIENT_STATUS_CODES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+_TRANSIENT_ERRORS = (
+    requests.Timeout,
+    requests.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+    socket.timeout,
+    TimeoutError,
+    ConnectionError,
+)
+
+
+class RetryLater(Exception):
+    """Fallo transitorio: el trabajo debe volver a la cola tras `delay` segundos"""
+
+    def __init__(self, delay: float, error: Exception):
+        super().__init__(f"Reintento en {delay:.1f}s: {error}")
+        self.delay = delay
+        self.error = error
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    return getattr(getattr(error, 'response', None), 'status_code', None)
+
+
+def classify_error(error: BaseException) -> str:
+    """Devolver TRANSIENT o PERMANENT según el tipo de fallo"""
+    status = _status_code(error)
+    if status is not None:
+        return TRANSIENT if status in TRANSIENT_STATUS_CODES or status >= 500 else PERMANENT
+    if isinstance(error, _TRANSIENT_ERRORS):
+        return TRANSIENT
+    if 'SlowDown' in str(error):
+        return TRANSIENT
+    return PERMANENT
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Segundos indicados por la cabecera Retry-After de la respuesta, si la hay"""
+    response = getattr(error, 'response', None)
+    value = getattr(response, 'headers', {}).get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class RetryPolicy:
+    """Cuántas veces y cuánto esperar antes de reintentar un fallo transitorio"""
+
+    def __init__(self, max_retries: int = DEFAULT_MAX_RETRIES, base_delay: float = RETRY_BASE_DELAY,
+                 max_delay: float = RETRY_MAX_DELAY):
+        self.max_retries = max(0, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, failures: int, error: BaseException) -> Optional[float]:
+        """Espera antes del siguiente intento, o None si no hay que reintentar
+
+        `failures` es el número de fallos acumulados, contando este.
+        """
+        if failures > self.max_retries or classify_error(error) != TRANSIENT:
+            return None
+        requested = retry_after(error)
+        if requested is not None:
+            return min(requested, self.max_delay)
+        # Backoff exponencial con jitter: entre la mitad y el total del tope
+        cap = min(self.max_delay, self.base_delay * 2 ** (failures - 1))
+        return random.uniform(cap / 2, cap)
+
+
+class RetryQueue:
+    """Trabajos en espera ordenados por el instante en que pueden volver a ejecutarse"""
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, Any]] = []
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, item: Any, delay: float):
+        heapq.heappush(self._heap, (time.monotonic() + delay, next(self._counter), item))
+
+    def pop_ready(self) -> Optional[Any]:
+        """Sacar un trabajo cuya espera ya terminó, o None"""
+        if self._heap and self._heap[0][0] <= time.monotonic():
+            return heapq.heappop(self._heap)[2]
+        return None
+
+    def wait_time(self) -> float:
+        """Segundos hasta que el próximo trabajo esté listo"""
+        if not self._heap:
+            return 0.0
+        return max(0.0, self._heap[0][0] - time.monotonic())
+
+    def clear(self) -> List[Any]:
+        """Sacar todos los trabajos en espera (p. ej. al detenerse)"""
+        items = [item for _, _, item in sorted(self._heap)]
+        self._heap = []
+        return items
+
+    def pop_wait(self) -> Any:
+        """Esperar al próximo trabajo y sacarlo (solo cuando no queda otra cosa que hacer)"""
+        time.sleep(self.wait_time())
+        return heapq.heappop(self._heap)[2]
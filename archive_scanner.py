@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+
+"""
+Escáner de Directorios
+======================
+
+Recorre el árbol con os.scandir y entrega los archivos a medida que los
+encuentra, de modo que las subidas pueden empezar enseguida. Nunca entra
+en las carpetas excluidas ("Uploaded") ni en las rutas que descarta el
+archivo `.archiveignore` de la raíz.
+
+Formato de `.archiveignore` (subconjunto de .gitignore):
+    # comentario
+    *.tmp           nombre en cualquier nivel
+    borradores/     solo directorios
+    2019/crudo/*    ruta relativa a la raíz (contiene "/")
+    !final.tmp      volver a incluir (gana la última línea que coincide)
+"""
+
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+IGNORE_FILE = '.archiveignore'
+MANIFEST_FILE = '.archive_scan_manifest.json'
+
+# Directorios modificados hace menos de esto no se dan por estables: un
+# archivo creado en el mismo instante podría no cambiar su mtime
+MANIFEST_RACY_SECONDS = 2
+
+# Carpetas que nunca se recorren (".archive_jobs": cola compartida, ver archive_jobqueue)
+EXCLUDED_DIRS = frozenset({'Uploaded', '.archive_jobs'})
+
+
+class IgnoreRules:
+    """Patrones de `.archiveignore` compilados en unas pocas expresiones regulares
+
+    Las líneas consecutivas del mismo signo se agrupan en un bloque; el
+    último bloque que coincide decide, así un "!patrón" vuelve a incluir
+    lo que descartaron las líneas anteriores.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = tuple(patterns)
+        # Bloques (negado, [nombre, nombre de directorio, ruta, ruta de directorio])
+        groups: List[Tuple[bool, List[List[str]]]] = []
+
+        for line in self.patterns:
+            pattern = line.strip()
+            if not pattern or pattern.startswith('#'):
+                continue
+
+            negate = pattern.startswith('!')
+            if negate:
+                pattern = pattern[1:]
+            elif pattern.startswith('\\!'):
+                pattern = pattern[1:]
+
+            dir_only = pattern.endswith('/')
+            pattern = pattern.strip('/')
+            if not pattern:
+                continue
+
+            if not groups or groups[-1][0] != negate:
+                groups.append((negate, [[], [], [], []]))
+            regex = fnmatch.translate(pattern)
+            groups[-1][1][('/' in pattern) * 2 + dir_only].append(regex)
+
+        self._blocks = [(negate, *(self._compile(regexes) for regexes in kinds))
+                        for negate, kinds in reversed(groups)]
+
+    @staticmethod
+    def _compile(regexes: List[str]) -> Optional[re.Pattern]:
+        return re.compile('|'.join(f'(?:{r})' for r in regexes)) if regexes else None
+
+    @classmethod
+    def from_file(cls, path: Path) -> Optional['IgnoreRules']:
+        """Cargar reglas desde un archivo, o None si no existe"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return cls(f.read().splitlines())
+        except FileNotFoundError:
+            return None
+
+    def match(self, rel_path: str, name: str, is_dir: bool) -> bool:
+        """Indicar si una entrada (ruta relativa con "/") debe ignorarse"""
+        for negate, name_any, name_dirs, path_any, path_dirs in self._blocks:
+            if ((name_any and name_any.match(name)) or (path_any and path_any.match(rel_path)) or
+                    (is_dir and ((name_dirs and name_dirs.match(name)) or
+                                 (path_dirs and path_dirs.match(rel_path))))):
+                return not negate
+        return False
+
+
+class ScanManifest:
+    """Manifiesto persistente de directorios ya escaneados
+
+    Guarda el mtime de cada directorio y la firma (tamaño, mtime) de sus
+    archivos soportados. En un nuevo escaneo, los directorios cuyo mtime
+    no cambió se reproducen desde el manifiesto con un solo stat, sin
+    listar su contenido ni hacer stat de cada archivo.
+    """
+
+    def __init__(self, path: str = MANIFEST_FILE):
+        self.path = path
+        self._roots: Dict[str, Dict] = {}
+        self._current: Dict[str, Dict] = {}
+        self._previous: Dict[str, Dict] = {}
+        self.load()
+
+    def load(self):
+        """Cargar el manifiesto; si está dañado se empieza de cero"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._roots = json.load(f).get('roots', {})
+        except (OSError, ValueError):
+            self._roots = {}
+
+    def clear(self):
+        """Olvidar todo lo escaneado; el próximo escaneo lista todo de nuevo"""
+        self._roots = {}
+
+    def save(self):
+        """Guardar el manifiesto de forma atómica"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'roots': self._roots}, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def fingerprint(extensions: Iterable[str], excluded_dirs: Iterable[str],
+                    ignore: Optional[IgnoreRules]) -> str:
+        """Huella de las reglas de filtrado; si cambian, el manifiesto no sirve"""
+        rules = [sorted(extensions), sorted(excluded_dirs), list(ignore.patterns) if ignore else []]
+        return hashlib.sha1(json.dumps(rules).encode('utf-8')).hexdigest()
+
+    def begin(self, root: str, fingerprint: str):
+        """Empezar un escaneo de `root`"""
+        entry = self._roots.get(root)
+        self._previous = entry['dirs'] if entry and entry.get('rules') == fingerprint else {}
+        self._current = {}
+        self._fingerprint = fingerprint
+
+    def lookup(self, rel_dir: str, mtime_ns: int) -> Optional[Dict]:
+        """Entrada guardada de un directorio si no cambió desde el último escaneo"""
+        cached = self._previous.get(rel_dir)
+        if cached is not None and cached['mtime_ns'] == mtime_ns:
+            self._current[rel_dir] = cached
+            return cached
+        return None
+
+    def record(self, rel_dir: str, mtime_ns: int, files: Dict[str, List[int]], dirs: List[str]):
+        """Registrar el contenido recién listado de un directorio"""
+        if time.time() - mtime_ns / 1e9 < MANIFEST_RACY_SECONDS:
+            mtime_ns = -1  # Forzar un nuevo listado la próxima vez
+        self._current[rel_dir] = {'mtime_ns': mtime_ns, 'files': files, 'dirs': dirs}
+
+    def commit(self, root: str):
+        """Terminar un escaneo completo y guardarlo"""
+        self._roots[root] = {'rules': self._fingerprint, 'dirs': self._current}
+        self._previous = {}
+        self.save()
+
+    def signature(self, path: Path) -> Optional[Tuple[int, int]]:
+        """(tamaño, mtime_ns) de un archivo visto en el último escaneo"""
+        path = os.path.abspath(path)
+        for root, entry in self._roots.items():
+            if path.startswith(root.rstrip(os.sep) + os.sep):
+                rel_dir, name = os.path.split(path[len(root.rstrip(os.sep)) + 1:])
+                cached = entry['dirs'].get(rel_dir)
+                if cached and name in cached['files']:
+                    return tuple(cached['files'][name])
+        return None
+
+
+def iter_files(root: Path, extensions: Iterable[str],
+               excluded_dirs: Iterable[str] = EXCLUDED_DIRS,
+               ignore: Optional[IgnoreRules] = None,
+               manifest: Optional[ScanManifest] = None) -> Iterator[Path]:
+    """Generar los archivos soportados bajo `root` a medida que se encuentran
+
+    Los archivos de cada directorio salen ordenados y antes que sus
+    subdirectorios. No se siguen enlaces simbólicos a directorios.
+    Con un manifiesto, los directorios sin cambios no se vuelven a listar.
+    """
+    extensions = frozenset(extensions)
+    excluded_dirs = frozenset(excluded_dirs)
+    root = str(root)
+    if manifest is not None:
+        manifest.begin(os.path.abspath(root), ScanManifest.fingerprint(extensions, excluded_dirs, ignore))
+
+    stack = ['']
+    while stack:
+        rel_dir = stack.pop()
+        directory = os.path.join(root, rel_dir) if rel_dir else root
+
+        if manifest is not None:
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+            cached = manifest.lookup(rel_dir, mtime_ns)
+            if cached is not None:
+                for name in cached['files']:
+                    yield Path(directory, name)
+                stack.extend(os.path.join(rel_dir, name) for name in reversed(cached['dirs']))
+                continue
+
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+
+        subdirs = []
+        files = {}
+        for entry in entries:
+            name = entry.name
+            rel_path = os.path.join(rel_dir, name)
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+
+            if is_dir:
+                if name in excluded_dirs:
+                    continue
+                if ignore and ignore.match(rel_path.replace(os.sep, '/'), name, True):
+                    continue
+                subdirs.append(name)
+                continue
+
+            if os.path.splitext(name)[1].lower() not in extensions:
+                continue
+            if ignore and ignore.match(rel_path.replace(os.sep, '/'), name, False):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                if manifest is not None:
+                    stat = entry.stat()
+                    files[name] = [stat.st_size, stat.st_mtime_ns]
+            except OSError:
+                continue
+            yield Path(entry.path)
+
+        if manifest is not None:
+            manifest.record(rel_dir, mtime_ns, files, subdirs)
+
+        # Pila LIFO: apilar al revés para recorrer en orden alfabético
+        stack.extend(os.path.join(rel_dir, name) for name in reversed(subdirs))
+
+    if manifest is not None:
+        manifest.commit(os.path.abspath(root))
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+"""
+Reparto por Shards
+==================
+
+Divide un árbol entre N equipos sin estado compartido: cada archivo (o
+item agrupado) pertenece al shard que indica un hash estable de la base
+de su identificador (autor-nombre, antes de resolver colisiones). Así
+los archivos que chocarían por identificador (p. ej. "01.mp3" en varios
+álbumes) caen siempre en el mismo equipo, y su registro local resuelve
+la colisión. Todos los equipos calculan lo mismo sin comunicarse, y el
+reparto no depende del punto de montaje ni del orden del escaneo.
+
+Cada shard guarda su progreso en su propia base de datos
+(`.archive_progress.shard1of4.db`...), que luego se puede fusionar con
+`ProgressStore.merge`.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Tuple
+
+
+def parse_shard(text: str) -> Tuple[int, int]:
+    """Interpretar "K/N" (K de 1 a N); ValueError si no es válido"""
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise ValueError(f"Shard no válido: {text!r} (formato K/N, p. ej. 1/4)")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Shard no válido: {text!r} (K debe estar entre 1 y N)")
+    return index, count
+
+
+def shard_of(key: str, count: int) -> int:
+    """Shard (de 1 a count) de una clave; sha1 para que sea igual en todos los equipos"""
+    digest = hashlib.sha1(key.encode('utf-8', 'surrogateescape')).digest()
+    return int.from_bytes(digest[:8], 'big') % count + 1
+
+
+class Shard:
+    """El shard K de N que procesa este equipo"""
+
+    def __init__(self, index: int, count: int):
+        self.index = index
+        self.count = count
+
+    @classmethod
+    def parse(cls, text: str) -> 'Shard':
+        return cls(*parse_shard(text))
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+    @property
+    def suffix(self) -> str:
+        return f"shard{self.index}of{self.count}"
+
+    def path_key(self, file_path: Path, root: Path) -> str:
+        """Ruta relativa a la raíz con "/", igual en todos los sistemas"""
+        return os.path.relpath(os.path.abspath(file_path), os.path.abspath(root)).replace(os.sep, '/')
+
+    def owns(self, key: str) -> bool:
+        return self.count == 1 or shard_of(key, self.count) == self.index
+
+    def owns_path(self, file_path: Path, root: Path) -> bool:
+        return self.owns(self.path_key(file_path, root))
+
+    def progress_db(self, path: str) -> str:
+        """Base de datos de progreso propia del shard: .archive_progress.db -> .archive_progress.shard1of4.db"""
+        base, ext = os.path.splitext(path)
+        return f"{base}.{self.suffix}{ext}"
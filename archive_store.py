@@ -0,0 +1,537 @@
+#!/usr/bin/env python3
+
+"""
+Almacén de Progreso
+===================
+
+Guarda el progreso de subida en SQLite con journal WAL. Cada cambio de
+estado es una sola fila confirmada (O(1)), un corte a mitad de escritura
+no corrompe lo ya guardado y hay índices por ruta, estado e identificador.
+
+El antiguo `.archive_progress.json` se importa automáticamente la
+primera vez que se abre el almacén.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+PROGRESS_DB = '.archive_progress.db'
+
+# Estados con los que un archivo no se vuelve a subir
+DONE_STATUSES = ('success', 'duplicate', 'remote')
+
+# Cada migración amplía el esquema; PRAGMA user_version guarda cuántas se aplicaron
+MIGRATIONS = [
+    """
+    CREATE TABLE progress (
+        path TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        identifier TEXT,
+        date TEXT,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX progress_status ON progress(status);
+    CREATE INDEX progress_identifier ON progress(identifier);
+    CREATE TABLE meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    """,
+    """
+    ALTER TABLE progress ADD COLUMN md5 TEXT;
+    CREATE INDEX progress_md5 ON progress(md5);
+    CREATE TABLE hash_cache (
+        device INTEGER NOT NULL,
+        inode INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        md5 TEXT NOT NULL,
+        PRIMARY KEY (device, inode, size, mtime_ns)
+    );
+    """,
+    """
+    CREATE TABLE multipart_uploads (
+        path TEXT PRIMARY KEY,
+        identifier TEXT NOT NULL,
+        key TEXT NOT NULL,
+        upload_id TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        part_size INTEGER NOT NULL,
+        started TEXT
+    );
+    CREATE TABLE multipart_parts (
+        path TEXT NOT NULL,
+        part_number INTEGER NOT NULL,
+        etag TEXT NOT NULL,
+        PRIMARY KEY (path, part_number)
+    );
+    """,
+    """
+    CREATE TABLE remote_items (
+        identifier TEXT PRIMARY KEY,
+        item_exists INTEGER NOT NULL,
+        checked REAL NOT NULL
+    );
+    """,
+    """
+    CREATE TABLE identifiers (
+        source TEXT PRIMARY KEY,
+        identifier TEXT NOT NULL UNIQUE
+    );
+    """,
+    """
+    CREATE TABLE media_metadata (
+        device INTEGER NOT NULL,
+        inode INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        version INTEGER NOT NULL,
+        data TEXT NOT NULL,
+        PRIMARY KEY (device, inode, size, mtime_ns)
+    );
+    """,
+    """
+    CREATE TABLE verifications (
+        path TEXT PRIMARY KEY,
+        identifier TEXT NOT NULL,
+        key TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        md5 TEXT NOT NULL,
+        queued REAL NOT NULL,
+        next_check REAL NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        error TEXT
+    );
+    CREATE INDEX verifications_next_check ON verifications(next_check);
+    """,
+    """
+    CREATE TABLE dispositions (
+        path TEXT PRIMARY KEY,
+        destination TEXT NOT NULL,
+        started REAL NOT NULL
+    );
+    """,
+]
+
+# SQLite limita el número de parámetros por consulta
+SQL_BATCH_SIZE = 500
+
+# Con más valores que esto, recorrer la tabla entera es más rápido que muchas consultas IN
+SQL_SCAN_THRESHOLD = 50000
+
+
+class MergeConflictError(ValueError):
+    """Las dos bases asignan identificadores incompatibles; no se fusionó nada
+
+    `conflicts` lista (identificador, origen aquí, origen en la otra base)
+    para un identificador con dos orígenes, y (origen, identificador aquí,
+    identificador en la otra base) para un origen con dos identificadores.
+    """
+
+    def __init__(self, db_path: str, conflicts: List[Tuple[str, str, str]]):
+        super().__init__(f"{len(conflicts)} identificadores en conflicto con {db_path}")
+        self.conflicts = conflicts
+
+
+class ProgressStore:
+    """Progreso por archivo con interfaz de diccionario sobre SQLite"""
+
+    def __init__(self, path: str = PROGRESS_DB):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # En WAL, NORMAL es seguro ante caídas del proceso y evita un fsync por fila
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA busy_timeout=30000')
+        # Caché de páginas de 64 MB: las escrituras por lotes grandes tocan índices en desorden
+        self._conn.execute('PRAGMA cache_size=-65536')
+        self._migrate()
+
+    def _migrate(self):
+        """Aplicar las migraciones pendientes del esquema"""
+        with self._lock:
+            version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+            for number, script in enumerate(MIGRATIONS[version:], version + 1):
+                try:
+                    self._conn.executescript(
+                        f'BEGIN IMMEDIATE; {script}; PRAGMA user_version = {number}; COMMIT;')
+                except Exception:
+                    if self._conn.in_transaction:
+                        self._conn.execute('ROLLBACK')
+                    raise
+
+    def _execute(self, sql: str, params: Tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def _select_in(self, sql: str, values: List, extra: Tuple = ()) -> List[Tuple]:
+        """Ejecutar `sql` con un `IN ({})` por tandas de valores"""
+        rows = []
+        for start in range(0, len(values), SQL_BATCH_SIZE):
+            batch = values[start:start + SQL_BATCH_SIZE]
+            placeholders = ', '.join('?' * len(batch))
+            rows.extend(self._execute(sql.format(placeholders), tuple(batch) + extra).fetchall())
+        return rows
+
+    def _write_many(self, sql: str, rows: List[Tuple]):
+        """Escribir muchas filas en una sola transacción"""
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany(sql, rows)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    # Interfaz de diccionario: store[ruta] = entrada
+
+    def get(self, path: str, default: Optional[Dict] = None) -> Optional[Dict]:
+        row = self._execute('SELECT data FROM progress WHERE path = ?', (path,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def __getitem__(self, path: str) -> Dict:
+        entry = self.get(path)
+        if entry is None:
+            raise KeyError(path)
+        return entry
+
+    def __setitem__(self, path: str, entry: Dict):
+        self._execute(
+            'INSERT OR REPLACE INTO progress (path, status, identifier, date, md5, data) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (path, entry.get('status', ''), entry.get('identifier'), entry.get('date'),
+             entry.get('md5'), json.dumps(entry, ensure_ascii=False)))
+
+    def __delitem__(self, path: str):
+        self._execute('DELETE FROM progress WHERE path = ?', (path,))
+
+    def __contains__(self, path: str) -> bool:
+        return self._execute('SELECT 1 FROM progress WHERE path = ?', (path,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self._execute('SELECT COUNT(*) FROM progress').fetchone()[0]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([row[0] for row in self._execute('SELECT path FROM progress')])
+
+    def items(self) -> List[Tuple[str, Dict]]:
+        rows = self._execute('SELECT path, data FROM progress').fetchall()
+        return [(path, json.loads(data)) for path, data in rows]
+
+    def update(self, entries: Dict[str, Dict]):
+        """Guardar varias entradas en una sola transacción"""
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                for path, entry in entries.items():
+                    self[path] = entry
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    # Consultas indexadas
+
+    def by_status(self, status: str) -> List[Tuple[str, Dict]]:
+        """Entradas con un estado dado"""
+        rows = self._execute('SELECT path, data FROM progress WHERE status = ?', (status,)).fetchall()
+        return [(path, json.loads(data)) for path, data in rows]
+
+    def by_identifier(self, identifier: str) -> List[Tuple[str, Dict]]:
+        """Entradas subidas a un identificador dado"""
+        rows = self._execute('SELECT path, data FROM progress WHERE identifier = ?',
+                             (identifier,)).fetchall()
+        return [(path, json.loads(data)) for path, data in rows]
+
+    def find_by_md5(self, md5: str, statuses: Tuple[str, ...] = ('success',)) -> Optional[Tuple[str, Dict]]:
+        """Primera entrada con ese contenido en alguno de los estados dados"""
+        placeholders = ', '.join('?' * len(statuses))
+        row = self._execute(f'SELECT path, data FROM progress WHERE md5 = ? AND status IN ({placeholders}) '
+                            'LIMIT 1', (md5,) + tuple(statuses)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def count_by_status(self) -> Dict[str, int]:
+        """Número de entradas por estado"""
+        rows = self._execute('SELECT status, COUNT(*) FROM progress GROUP BY status').fetchall()
+        return dict(rows)
+
+    # Caché de hashes por firma de archivo (dispositivo, inodo, tamaño, mtime)
+
+    def get_cached_md5(self, stat: os.stat_result) -> Optional[str]:
+        row = self._execute(
+            'SELECT md5 FROM hash_cache WHERE device = ? AND inode = ? AND size = ? AND mtime_ns = ?',
+            (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)).fetchone()
+        return row[0] if row else None
+
+    def cache_md5(self, stat: os.stat_result, md5: str):
+        self._execute(
+            'INSERT OR REPLACE INTO hash_cache (device, inode, size, mtime_ns, md5) VALUES (?, ?, ?, ?, ?)',
+            (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns, md5))
+
+    # Puntos de control de subidas multiparte
+
+    def get_multipart(self, path: str) -> Optional[Dict]:
+        """Subida multiparte pendiente de un archivo, con sus partes terminadas"""
+        with self._lock:
+            row = self._execute(
+                'SELECT identifier, key, upload_id, size, mtime_ns, part_size, started '
+                'FROM multipart_uploads WHERE path = ?', (path,)).fetchone()
+            if row is None:
+                return None
+            parts = self._execute('SELECT part_number, etag FROM multipart_parts WHERE path = ?',
+                                  (path,)).fetchall()
+        keys = ('identifier', 'key', 'upload_id', 'size', 'mtime_ns', 'part_size', 'started')
+        checkpoint = dict(zip(keys, row))
+        checkpoint['parts'] = dict(parts)
+        return checkpoint
+
+    def start_multipart(self, path: str, checkpoint: Dict):
+        """Registrar una subida multiparte nueva (descarta la anterior)"""
+        with self._lock:
+            self.finish_multipart(path)
+            self._execute(
+                'INSERT INTO multipart_uploads (path, identifier, key, upload_id, size, mtime_ns, '
+                'part_size, started) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (path, checkpoint['identifier'], checkpoint['key'], checkpoint['upload_id'],
+                 checkpoint['size'], checkpoint['mtime_ns'], checkpoint['part_size'],
+                 checkpoint.get('started')))
+
+    def record_part(self, path: str, part_number: int, etag: str):
+        """Guardar una parte confirmada por el servidor"""
+        self._execute('INSERT OR REPLACE INTO multipart_parts (path, part_number, etag) VALUES (?, ?, ?)',
+                      (path, part_number, etag))
+
+    def finish_multipart(self, path: str):
+        """Borrar el punto de control de una subida multiparte"""
+        with self._lock:
+            self._execute('DELETE FROM multipart_parts WHERE path = ?', (path,))
+            self._execute('DELETE FROM multipart_uploads WHERE path = ?', (path,))
+
+    def pending_multipart(self) -> List[str]:
+        """Rutas con subidas multiparte sin terminar"""
+        return [row[0] for row in self._execute('SELECT path FROM multipart_uploads')]
+
+    # Caché de existencia de items remotos
+
+    def get_remote_items(self, identifiers: List[str], ttl: float) -> Dict[str, bool]:
+        """Respuestas guardadas no caducadas para los identificadores dados"""
+        rows = self._select_in('SELECT identifier, item_exists FROM remote_items '
+                               'WHERE identifier IN ({}) AND checked >= ?',
+                               identifiers, (time.time() - ttl,))
+        return {identifier: bool(exists) for identifier, exists in rows}
+
+    def cache_remote_items(self, items: Dict[str, bool]):
+        """Guardar la existencia comprobada de varios items"""
+        now = time.time()
+        self._write_many('INSERT OR REPLACE INTO remote_items (identifier, item_exists, checked) VALUES (?, ?, ?)',
+                         [(identifier, int(exists), now) for identifier, exists in items.items()])
+
+    # Registro de identificadores asignados
+
+    def get_identifiers(self, sources: List[str]) -> Dict[str, str]:
+        """Identificadores ya asignados a los orígenes dados"""
+        if len(sources) > SQL_SCAN_THRESHOLD:
+            wanted = set(sources)
+            rows = self._execute('SELECT source, identifier FROM identifiers').fetchall()
+            return {source: identifier for source, identifier in rows if source in wanted}
+        return dict(self._select_in('SELECT source, identifier FROM identifiers WHERE source IN ({})', sources))
+
+    def taken_identifiers(self, identifiers: List[str]) -> Dict[str, str]:
+        """Identificadores ya usados, con el origen que los tiene"""
+        if len(identifiers) > SQL_SCAN_THRESHOLD:
+            wanted = set(identifiers)
+            rows = self._execute('SELECT identifier, source FROM identifiers').fetchall()
+            return {identifier: source for identifier, source in rows if identifier in wanted}
+        return dict(self._select_in('SELECT identifier, source FROM identifiers WHERE identifier IN ({})',
+                                    identifiers))
+
+    def register_identifiers(self, assignments: Dict[str, str]) -> List[str]:
+        """Guardar nuevas asignaciones origen -> identificador
+
+        Se comprueban contra el registro en la misma transacción: las que
+        chocan (origen ya registrado o identificador de otro origen, p. ej.
+        por otro proceso sobre la misma base) no se guardan y se devuelven
+        sus orígenes.
+        """
+        rejected = []
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                for source, identifier in assignments.items():
+                    cursor = self._conn.execute(
+                        'INSERT OR IGNORE INTO identifiers (source, identifier) VALUES (?, ?)', (source, identifier))
+                    if not cursor.rowcount:
+                        rejected.append(source)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return rejected
+
+    # Caché de metadatos embebidos por firma de archivo
+
+    def get_media_metadata(self, signatures: List[Tuple], version: int) -> Dict[Tuple, Dict]:
+        """Metadatos guardados para las firmas (dispositivo, inodo, tamaño, mtime) dadas"""
+        found = {}
+        with self._lock:
+            for signature in signatures:
+                row = self._conn.execute(
+                    'SELECT data FROM media_metadata WHERE device = ? AND inode = ? AND size = ? '
+                    'AND mtime_ns = ? AND version = ?', tuple(signature) + (version,)).fetchone()
+                if row:
+                    found[signature] = json.loads(row[0])
+        return found
+
+    def cache_media_metadata(self, entries: Dict[Tuple, Dict], version: int):
+        """Guardar metadatos extraídos de varios archivos"""
+        self._write_many(
+            'INSERT OR REPLACE INTO media_metadata (device, inode, size, mtime_ns, version, data) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            [tuple(signature) + (version, json.dumps(data, ensure_ascii=False))
+             for signature, data in entries.items()])
+
+    # Atraso de verificación: subidas aceptadas que aún no se comprobaron en el item
+
+    def queue_verification(self, path: str, identifier: str, key: str, size: int, md5: str,
+                           next_check: float):
+        self._execute(
+            'INSERT OR REPLACE INTO verifications (path, identifier, key, size, md5, queued, next_check) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)', (path, identifier, key, size, md5, time.time(), next_check))
+
+    def due_verifications(self, limit: int, now: Optional[float] = None) -> List[Dict]:
+        """Filas pendientes ya vencidas (todas si now es None), las más antiguas primero"""
+        columns = ('path', 'identifier', 'key', 'size', 'md5', 'attempts', 'error')
+        where = 'WHERE next_check <= ? ' if now is not None else ''
+        params = (now, limit) if now is not None else (limit,)
+        rows = self._execute(f'SELECT {", ".join(columns)} FROM verifications {where}'
+                             'ORDER BY next_check LIMIT ?', params).fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def postpone_verifications(self, rows: List[Tuple[float, str, str]]):
+        """Volver a comprobar más tarde: filas (próxima comprobación, motivo, ruta)"""
+        self._write_many('UPDATE verifications SET next_check = ?, error = ?, attempts = attempts + 1 '
+                         'WHERE path = ?', rows)
+
+    def finish_verifications(self, paths: List[str]):
+        self._write_many('DELETE FROM verifications WHERE path = ?', [(path,) for path in paths])
+
+    def count_verifications(self) -> int:
+        return self._execute('SELECT COUNT(*) FROM verifications').fetchone()[0]
+
+    # Registro de intenciones de disposición: se confirma antes de mover y se borra después
+
+    def begin_disposition(self, path: str, destination: str):
+        self._execute('INSERT OR REPLACE INTO dispositions (path, destination, started) VALUES (?, ?, ?)',
+                      (path, destination, time.time()))
+
+    def end_disposition(self, path: str):
+        self._execute('DELETE FROM dispositions WHERE path = ?', (path,))
+
+    def pending_dispositions(self) -> List[Tuple[str, str]]:
+        return self._execute('SELECT path, destination FROM dispositions ORDER BY started').fetchall()
+
+    # Metadatos internos del almacén
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self._execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        self._execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    # Importación y mantenimiento
+
+    def import_json(self, json_path: str, overwrite: bool = False) -> int:
+        """Importar un archivo de progreso JSON antiguo. Devuelve las entradas importadas
+
+        Lanza una excepción si el archivo está dañado, para no perder el
+        progreso en silencio.
+        """
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        if not overwrite:
+            data = {path: entry for path, entry in data.items() if path not in self}
+        self.update(data)
+        return len(data)
+
+    def import_legacy(self, json_path: str) -> int:
+        """Importar el progreso JSON una sola vez, la primera vez que se abre el almacén"""
+        marker = f'imported:{os.path.abspath(json_path)}'
+        if not os.path.exists(json_path) or self.get_meta(marker):
+            return 0
+        imported = self.import_json(json_path)
+        self.set_meta(marker, str(os.path.getmtime(json_path)))
+        return imported
+
+    def merge(self, db_path: str) -> int:
+        """Fusionar otra base de progreso (p. ej. la de otro shard). Devuelve las filas de progreso tomadas
+
+        Un estado terminado (éxito, duplicado o ya remoto) nunca se
+        sobrescribe con uno sin terminar, ni un éxito con otro estado; a
+        igual rango gana la entrada de fecha más reciente. Identificadores, cachés de
+        hash y metadatos se añaden si faltan; si un identificador tiene otro
+        origen en cada base (o un origen otro identificador) no se fusiona
+        nada y se lanza MergeConflictError. La comprobación previa se
+        queda con la consulta más reciente. Las subidas multiparte a medias,
+        el atraso de verificación y las disposiciones pendientes no se
+        fusionan: solo puede continuarlos el equipo que tiene los archivos.
+        """
+        ProgressStore(db_path).close()  # Llevar la otra base al esquema actual
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute('ATTACH DATABASE ? AS other', (db_path,))
+            try:
+                self._conn.execute('BEGIN IMMEDIATE')
+                try:
+                    # Rango: éxito > duplicado o remoto > sin terminar; a igual rango gana lo más reciente
+                    done = ', '.join(f"'{status}'" for status in DONE_STATUSES)
+                    rank = ("CASE WHEN {0}.status = 'success' THEN 2 "
+                            f"WHEN {{0}}.status IN ({done}) THEN 1 ELSE 0 END")
+                    self._conn.execute(
+                        'INSERT INTO progress (path, status, identifier, date, md5, data) '
+                        'SELECT path, status, identifier, date, md5, data FROM other.progress WHERE true '
+                        'ON CONFLICT(path) DO UPDATE SET status = excluded.status, identifier = excluded.identifier, '
+                        'date = excluded.date, md5 = excluded.md5, data = excluded.data '
+                        f"WHERE {rank.format('excluded')} > {rank.format('progress')} "
+                        f"OR ({rank.format('excluded')} = {rank.format('progress')} AND progress.status != 'success' "
+                        "AND COALESCE(excluded.date, '') > COALESCE(progress.date, ''))")
+                    merged = self._conn.total_changes - before
+                    # INSERT OR IGNORE descartaría sin aviso una de las dos asignaciones
+                    conflicts = self._conn.execute(
+                        'SELECT o.identifier, m.source, o.source FROM other.identifiers o '
+                        'JOIN identifiers m ON m.identifier = o.identifier WHERE m.source != o.source '
+                        'UNION ALL '
+                        'SELECT o.source, m.identifier, o.identifier FROM other.identifiers o '
+                        'JOIN identifiers m ON m.source = o.source WHERE m.identifier != o.identifier').fetchall()
+                    if conflicts:
+                        raise MergeConflictError(db_path, conflicts)
+                    self._conn.execute('INSERT OR IGNORE INTO identifiers SELECT * FROM other.identifiers')
+                    self._conn.execute('INSERT OR IGNORE INTO hash_cache SELECT * FROM other.hash_cache')
+                    self._conn.execute('INSERT OR IGNORE INTO media_metadata SELECT * FROM other.media_metadata')
+                    self._conn.execute(
+                        'INSERT INTO remote_items SELECT * FROM other.remote_items WHERE true '
+                        'ON CONFLICT(identifier) DO UPDATE SET item_exists = excluded.item_exists, '
+                        'checked = excluded.checked WHERE excluded.checked > remote_items.checked')
+                    self._conn.execute('COMMIT')
+                except Exception:
+                    self._conn.execute('ROLLBACK')
+                    raise
+            finally:
+                self._conn.execute('DETACH DATABASE other')
+        return merged
+
+    def checkpoint(self):
+        """Volcar el WAL al archivo principal de la base de datos"""
+        self._execute('PRAGMA wal_checkpoint(PASSIVE)')
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -20,8 +20,14 @@ import json
 import argparse
 import logging
 import datetime
+import hashlib
+import re
+import threading
+import time
+import contextlib
+import concurrent.futures
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 try:
     import internetarchive as ia
@@ -32,13 +38,32 @@ except ImportError:
 
 try:
     import requests
+    from requests.adapters import HTTPAdapter
 except ImportError:
     print('Error: requests library not found')
     print('Instalar con: pip install requests')
     sys.exit(1)
 
+from archive_async import AsyncUploadEngine, DEFAULT_CONCURRENCY, DEFAULT_IO_THREADS
+from archive_store import MergeConflictError, ProgressStore, PROGRESS_DB
+from archive_scanner import IgnoreRules, ScanManifest, iter_files, IGNORE_FILE, MANIFEST_FILE
+from archive_multipart import MultipartUpload, MULTIPART_THRESHOLD, MULTIPART_PART_SIZE
+from archive_network import (AdaptiveConcurrency, BandwidthLimiter, ADAPTIVE_MAX_CONCURRENCY,
+                             format_rate, parse_rate, parse_schedule)
+from archive_retry import RetryLater, RetryPolicy, RetryQueue, classify_error, DEFAULT_MAX_RETRIES
+from archive_preflight import RemoteIndex, PREFLIGHT_BATCH_SIZE, PREFLIGHT_TTL
+from archive_identifiers import IdentifierRegistry, clean_identifier_part
+from archive_metadata import MetadataExtractor, format_runtime
+from archive_pipeline import Pipeline, Stage
+from archive_metrics import Metrics, NullMetrics
+from archive_watch import DirectoryWatcher, WATCH_SETTLE_SECONDS
+from archive_jobqueue import JobQueue, ACQUIRED, LEASE_TTL
+from archive_shard import Shard
+from archive_verify import Verifier, VERIFY_WAIT
+from archive_disposition import Disposer, DISPOSITION_MODES
+
 # Configuración
-PROGRESS_FILE = '.archive_progress.json'
+PROGRESS_FILE = '.archive_progress.json'  # Formato antiguo, se importa a PROGRESS_DB
 LOG_FILE = '.archive_upload.log'
 SUPPORTED_EXTENSIONS = {
     'books': ['.pdf', '.epub', '.mobi', '.txt', '.doc', '.docx'],
@@ -46,14 +71,92 @@ SUPPORTED_EXTENSIONS = {
     'video': ['.mp4', '.avi', '.mkv', '.mov', '.webm'],
     'images': ['.jpg', '.jpeg', '.png', '.gif', '.tiff']
 }
+ALL_EXTENSIONS = frozenset(ext for extensions in SUPPORTED_EXTENSIONS.values() for ext in extensions)
+
+# Modos de agrupación de archivos en items
+GROUP_MODES = ('file', 'directory', 'pattern')
+
+# Límites recomendados por Archive.org para un solo item
+ITEM_MAX_FILES = 10000
+ITEM_MAX_BYTES = 100 * 1024 ** 3  # 100 GB
+
+# Tamaño de bloque para calcular hashes MD5
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Conexiones keep-alive por host en la sesión HTTP compartida
+HTTP_POOL_SIZE = 100
+
+# Hilos de las etapas de disco y CPU del pipeline (la de subida usa --workers)
+PIPELINE_HASH_WORKERS = 2
+PIPELINE_METADATA_WORKERS = 2
+PIPELINE_DISPOSE_WORKERS = 1
 
 class ArchiveUploader:
-    def __init__(self, author_name: str, collection: str = 'opensource', list_name: str = None):
+    def __init__(self, author_name: str, collection: str = 'opensource', list_name: str = None,
+                 group_by: str = 'file', group_pattern: Optional[str] = None,
+                 item_max_files: int = ITEM_MAX_FILES, item_max_bytes: int = ITEM_MAX_BYTES,
+                 use_manifest: bool = True, multipart_threshold: int = MULTIPART_THRESHOLD,
+                 multipart_part_size: int = MULTIPART_PART_SIZE, resume: bool = True,
+                 bandwidth: Optional[BandwidthLimiter] = None,
+                 concurrency: Optional[AdaptiveConcurrency] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 preflight: bool = True, preflight_ttl: float = PREFLIGHT_TTL,
+                 extract_metadata: bool = True, metadata_workers: Optional[int] = None,
+                 metrics: Optional[Metrics] = None, progress_db: str = PROGRESS_DB,
+                 disposition: str = 'move'):
         self.author_name = author_name
         self.collection = collection
         self.list_name = list_name
+        if group_by not in GROUP_MODES:
+            raise ValueError(f"Modo de agrupación no válido: {group_by}")
+        if group_by == 'pattern' and not group_pattern:
+            raise ValueError("El modo 'pattern' requiere un patrón de agrupación")
+        self.group_by = group_by
+        self.group_pattern = re.compile(group_pattern) if group_pattern else None
+        self.item_max_files = item_max_files
+        self.item_max_bytes = item_max_bytes
+        # Archivos grandes: subida por partes con puntos de control
+        self.multipart_threshold = multipart_threshold
+        self.multipart_part_size = multipart_part_size
+        self.resume = resume
+        # Limitador de ancho de banda compartido por todas las subidas
+        self.bandwidth = bandwidth or BandwidthLimiter()
+        # Control adaptativo de subidas simultáneas (None = lo fija el pool de hilos)
+        self.concurrency = concurrency
+        # Reintentos de fallos transitorios (fallos acumulados por archivo en esta ejecución)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self._failures: Dict[str, int] = {}
+        self._failures_lock = threading.Lock()
+        # Tiempo por fase y contadores (NullMetrics no cuesta nada si no se exportan)
+        self.metrics = metrics or NullMetrics()
+        self._session = None
+        self._session_lock = threading.Lock()
+        self.progress_db = progress_db
         self.progress = self.load_progress()
+        # Registro de identificadores: el mismo archivo recibe siempre el mismo
+        self.identifiers = IdentifierRegistry(self.progress)
+        self._clean_author = clean_identifier_part(author_name)
+        # Manifiesto de escaneo: los directorios sin cambios no se vuelven a listar
+        self.manifest = ScanManifest(MANIFEST_FILE) if use_manifest else None
         self.setup_logging()
+        # Destino de los archivos subidos, con registro de intenciones para sobrevivir a un corte
+        self.disposer = Disposer(self.progress, disposition, logger=self.logger)
+        # Comprobación previa en bloque de items que ya existen en Archive.org
+        self.remote_index = RemoteIndex(self.progress, preflight_ttl, logger=self.logger) if preflight else None
+        # Metadatos embebidos (etiquetas, duración, páginas) leídos por delante de la subida
+        self.metadata_extractor = (MetadataExtractor(self.progress, metadata_workers, logger=self.logger)
+                                   if extract_metadata else None)
+        self._media_info: Dict[str, Dict] = {}
+        # Pipeline por etapas de la última subida (para consultar sus colas)
+        self.pipeline: Optional[Pipeline] = None
+        # Cola compartida con otros procesos (None = este proceso sube todo lo que encuentra)
+        self.job_queue: Optional[JobQueue] = None
+        # Raíz del último escaneo (de ella sale la clave de los sufijos de colisión)
+        self.root: Optional[Path] = None
+        # Parte del árbol que sube este equipo (None = todo el árbol)
+        self.shard: Optional[Shard] = None
+        # Verificación por tandas tras la subida (None = el archivo se mueve en cuanto se acepta)
+        self.verifier: Optional[Verifier] = None
         
     def setup_logging(self):
         """Configurar logging"""
@@ -67,24 +170,89 @@ class ArchiveUploader:
         )
         self.logger = logging.getLogger(__name__)
         
-    def load_progress(self) -> Dict:
-        """Cargar progreso guardado"""
-        if os.path.exists(PROGRESS_FILE):
-            try:
-                with open(PROGRESS_FILE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"Error cargando progreso: {e}")
-        return {}
+    def load_progress(self) -> ProgressStore:
+        """Cargar progreso guardado (importa el JSON antiguo si existe)"""
+        store = ProgressStore(self.progress_db)
+        try:
+            imported = store.import_legacy(PROGRESS_FILE)
+            if imported:
+                print(f"Importadas {imported} entradas de {PROGRESS_FILE}")
+        except Exception as e:
+            print(f"Error importando progreso de {PROGRESS_FILE}: {e}")
+        return store
         
     def save_progress(self):
-        """Guardar progreso"""
+        """Guardar progreso
+        
+        Cada entrada ya queda confirmada al registrarse; esto solo vuelca el WAL.
+        """
+        try:
+            self.progress.checkpoint()
+        except Exception as e:
+            self.logger.error(f"Error guardando progreso: {e}")
+                
+    def record_progress(self, file_id: str, entry: Dict):
+        """Registrar el estado de un archivo (seguro entre hilos)"""
+        try:
+            with self.metrics.timer('record'):
+                self.progress[file_id] = entry
+            self.metrics.inc('files_total', status=entry.get('status'))
+        except Exception as e:
+            self.logger.error(f"Error guardando progreso: {e}")
+            
+    def annotate_progress(self, file_id: str, **fields):
+        """Añadir datos a la entrada de un archivo sin cambiar su estado"""
         try:
-            with open(PROGRESS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.progress, f, indent=2, ensure_ascii=False)
+            with self.metrics.timer('record'):
+                entry = self.progress.get(file_id)
+                if entry is None:
+                    return
+                entry.update(fields)
+                self.progress[file_id] = entry
         except Exception as e:
             self.logger.error(f"Error guardando progreso: {e}")
             
+    @property
+    def session(self):
+        """Sesión de Archive.org compartida por todas las subidas"""
+        with self._session_lock:
+            if self._session is None:
+                self._session = ia.get_session(http_adapter_kwargs={
+                    'pool_connections': 4,
+                    'pool_maxsize': HTTP_POOL_SIZE,
+                })
+                # Las subidas van a s3.us.archive.org: mismo pool, sin reintentos automáticos
+                self._session.mount('https://s3.us.archive.org', HTTPAdapter(
+                    pool_connections=4, pool_maxsize=HTTP_POOL_SIZE))
+            return self._session
+            
+    def get_item(self, identifier: str):
+        """Obtener un item para subir sin pedir antes sus metadatos"""
+        return ia.Item(self.session, identifier)
+        
+    def network_slot(self, file_path: Path):
+        """Contexto que reserva un hueco de subida en el control adaptativo"""
+        if self.concurrency is None:
+            return contextlib.nullcontext()
+        return self.concurrency.slot(self.get_file_size(file_path))
+        
+    def log_concurrency_change(self, previous: int, limit: int, reason: str):
+        """Registrar un ajuste del control adaptativo"""
+        arrow = '⬆️' if limit > previous else '⬇️'
+        self.logger.info(f"{arrow} Concurrencia {previous} -> {limit}: {reason}")
+        
+    def use_multipart(self, file_path: Path) -> bool:
+        """Indicar si un archivo debe subirse por partes"""
+        return self.multipart_threshold > 0 and self.get_file_size(file_path) >= self.multipart_threshold
+        
+    def upload_multipart(self, file_path: Path, identifier: str, metadata: Dict,
+                         key: Optional[str] = None, queue_derive: bool = True) -> requests.Response:
+        """Subir un archivo grande por partes, reanudando desde la última parte terminada"""
+        upload = MultipartUpload(self.session, self.progress, self.multipart_part_size, self.logger,
+                                 limiter=self.bandwidth)
+        return upload.upload(file_path, identifier, metadata, key=key,
+                             resume=self.resume, queue_derive=queue_derive)
+        
     def get_mediatype(self, file_path: Path) -> str:
         """Determinar el tipo de medio basado en la extensión"""
         ext = file_path.suffix.lower()
@@ -94,54 +262,101 @@ class ArchiveUploader:
                 return mediatype
         return 'data'  # Por defecto
         
+    def identifier_base(self, file_path: Path) -> str:
+        """Identificador de un archivo antes de resolver colisiones (autor-nombre)"""
+        return f"{self._clean_author}-{clean_identifier_part(file_path.stem)}"
+        
+    def identifier_key(self, file_path: Path) -> str:
+        """Clave del sufijo de colisión: ruta relativa a la raíz escaneada, con "/"
+        
+        Así el sufijo no depende del directorio actual ni del punto de montaje.
+        Fuera de la raíz (o sin escaneo) se usa la ruta absoluta.
+        """
+        path = os.path.abspath(file_path)
+        if self.root is not None:
+            root = os.path.abspath(self.root).rstrip(os.sep)
+            if path == root:
+                return '.'
+            if path.startswith(root + os.sep):
+                return path[len(root) + 1:].replace(os.sep, '/')
+        return path
+        
+    def assign_identifiers(self, files: Iterable[Path]) -> Dict[Path, str]:
+        """Asignar identificadores a un lote de archivos, resolviendo colisiones de antemano"""
+        with self.metrics.timer('identifier'):
+            files = list(files)
+            sources = [os.path.abspath(f) for f in files]
+            assigned = self.identifiers.assign({source: f"{self._clean_author}-{clean_identifier_part(f.stem)}"
+                                                for source, f in zip(sources, files)},
+                                               keys={source: self.identifier_key(f)
+                                                     for source, f in zip(sources, files)})
+            return {f: assigned[source] for f, source in zip(files, sources)}
+        
     def generate_identifier(self, file_path: Path) -> str:
-        """Generar identificador único para Archive.org"""
-        # Limpiar nombre del archivo - solo caracteres válidos para Archive.org
-        clean_name = file_path.stem.lower()
-        
-        # Reemplazar caracteres especiales problemáticos
-        replacements = {
-            'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u', 'ñ': 'n',
-            'ü': 'u', 'ç': 'c', 'à': 'a', 'è': 'e', 'ì': 'i', 'ò': 'o', 'ù': 'u',
-            'ä': 'a', 'ë': 'e', 'ï': 'i', 'ö': 'o', 'ü': 'u', 'ÿ': 'y',
-            'â': 'a', 'ê': 'e', 'î': 'i', 'ô': 'o', 'û': 'u',
-            'ã': 'a', 'õ': 'o', 'ñ': 'n'
-        }
+        """Generar identificador único y estable para Archive.org"""
+        source = os.path.abspath(file_path)
+        return self.identifiers.get(source) or self.identifiers.assign_one(
+            source, self.identifier_base(file_path), key=self.identifier_key(file_path))
         
-        for old, new in replacements.items():
-            clean_name = clean_name.replace(old, new)
+    def generate_group_identifier(self, group_name: str, part: int = 1, source: Optional[str] = None) -> str:
+        """Generar identificador para un item con varios archivos
         
-        # Solo permitir letras, números, guiones y guiones bajos
-        clean_name = ''.join(c for c in clean_name if c.isalnum() or c in '-_')
+        `source` distingue grupos con el mismo nombre (p. ej. la carpeta).
+        """
+        base = f"{self._clean_author}-{clean_identifier_part(group_name)}"
+        # El sufijo de parte va al final para que no se pierda al truncar
+        suffix = '' if part == 1 else f"-part{part}"
+        return self.identifiers.assign_one(f"group:{source or group_name}#{part}", base, suffix,
+                                           key=f"group:{self.identifier_key(source) if source else group_name}#{part}")
         
-        # Reemplazar espacios y caracteres problemáticos con guiones
-        clean_name = clean_name.replace(' ', '-').replace('.', '-').replace(',', '-')
+    def media_info(self, file_path: Path) -> Dict:
+        """Metadatos embebidos de un archivo (de la etapa de extracción o leídos ahora)"""
+        info = self._media_info.pop(str(file_path), None)
+        if info is None and self.metadata_extractor is not None:
+            info = self.metadata_extractor.extract_one(file_path)
+        return info or {}
         
-        # Limpiar autor también
-        clean_author = self.author_name.lower()
-        for old, new in replacements.items():
-            clean_author = clean_author.replace(old, new)
-        clean_author = ''.join(c for c in clean_author if c.isalnum() or c in '-_')
-        clean_author = clean_author.replace(' ', '-')
+    def drop_media_info(self, file_path: Path):
+        """Olvidar los metadatos extraídos de un archivo que terminó sin llegar a usarlos
         
-        # Agregar autor y timestamp
-        timestamp = datetime.datetime.now().strftime('%Y%m%d')
-        identifier = f"{clean_author}-{clean_name}-{timestamp}"
+        (ya subido, duplicado o con error): si no, se acumularían toda la ejecución.
+        """
+        self._media_info.pop(str(file_path), None)
         
-        # Asegurar que el identificador cumple con las reglas de Archive.org
-        # Máximo 100 caracteres, empezar con alfanumérico
-        if len(identifier) > 100:
-            identifier = identifier[:100]
+    def extract_media_metadata(self, files: Iterable[Path]) -> int:
+        """Leer en el pool de procesos los metadatos embebidos de un lote de archivos"""
+        return sum(1 for file_path in self.extract_files(files) if str(file_path) in self._media_info)
         
-        # Asegurar que empiece con alfanumérico
-        if not identifier[0].isalnum():
-            identifier = 'a' + identifier[1:]
+    def extract_files(self, files: Iterable[Path]) -> Iterator[Path]:
+        """Etapa de extracción sobre un flujo de archivos, por delante de la cola de subida"""
+        if self.metadata_extractor is None:
+            yield from files
+            return
         
-        return identifier
+        def pending():
+            for file_path in files:
+                if self.is_uploaded(str(file_path)):
+                    skipped.append(file_path)
+                else:
+                    yield file_path
         
-    def generate_metadata(self, file_path: Path, mediatype: str) -> Dict:
-        """Generar metadatos para el archivo"""
-        title = file_path.stem.replace('_', ' ').title()
+        # Los archivos ya subidos no se leen, pero se entregan en su turno
+        skipped: List[Path] = []
+        for file_path, info in self.metadata_extractor.iter_extract(pending()):
+            yield from skipped
+            skipped.clear()
+            self._media_info[str(file_path)] = info
+            yield file_path
+        yield from skipped
+        
+    def generate_metadata(self, file_path: Path, mediatype: str, embedded: bool = True) -> Dict:
+        """Generar metadatos para el archivo
+        
+        Con embedded=True, las etiquetas del propio archivo (título, fecha,
+        duración, páginas) sustituyen a los valores derivados del nombre.
+        """
+        info = self.media_info(file_path) if embedded else {}
+        title = info.get('title') or file_path.stem.replace('_', ' ').title()
         
         metadata = {
             'title': title,
@@ -150,10 +365,16 @@ class ArchiveUploader:
             'mediatype': mediatype,
             'language': 'es',  # Cambiar según necesidad
             'licenseurl': 'https://creativecommons.org/licenses/by-sa/4.0/',
-            'date': datetime.datetime.now().strftime('%Y-%m-%d'),
+            'date': info.get('date') or datetime.datetime.now().strftime('%Y-%m-%d'),
             'description': f"Material de {self.author_name}: {title}",
             'subject': [self.author_name, mediatype, 'opensource']
         }
+        if info.get('album'):
+            metadata['subject'].append(info['album'])
+        if info.get('duration'):
+            metadata['runtime'] = format_runtime(info['duration'])
+        if info.get('pages'):
+            metadata['pages'] = info['pages']
         
         # Metadatos específicos por tipo
         if mediatype == 'books':
@@ -167,63 +388,575 @@ class ArchiveUploader:
             
         return metadata
         
-    def upload_file(self, file_path: Path) -> bool:
-        """Subir un archivo a Archive.org"""
-        file_id = str(file_path)
+    def generate_group_metadata(self, group_name: str, files: List[Path]) -> Dict:
+        """Generar metadatos para un item con varios archivos"""
+        # El tipo de medio del item es el más frecuente entre sus archivos
+        mediatypes = [self.get_mediatype(f) for f in files]
+        mediatype = max(set(mediatypes), key=mediatypes.count)
         
-        # Verificar si ya se subió
-        if file_id in self.progress and self.progress[file_id].get('status') == 'success':
-            self.logger.info(f"Archivo ya subido: {file_path.name}")
-            return True
-            
-        try:
-            # Generar identificador y metadatos
-            identifier = self.generate_identifier(file_path)
-            mediatype = self.get_mediatype(file_path)
-            metadata = self.generate_metadata(file_path, mediatype)
-            
-            self.logger.info(f"Subiendo: {file_path.name} -> {identifier}")
-            self.logger.info(f"Colección: {self.collection}")
+        metadata = self.generate_metadata(Path(group_name), mediatype, embedded=False)
+        metadata['description'] = (f"Material de {self.author_name}: {metadata['title']} "
+                                   f"({len(files)} archivos)")
+        return metadata
+        
+    def get_group_name(self, file_path: Path) -> Optional[str]:
+        """Obtener el nombre del grupo al que pertenece un archivo"""
+        if self.group_by == 'directory':
+            return file_path.parent.name or str(file_path.parent)
+        
+        if self.group_by == 'pattern':
+            match = self.group_pattern.search(file_path.stem)
+            if not match:
+                return None
+            return match.group(1) if match.groups() else match.group(0)
+        
+        return None
+        
+    def group_files(self, files: List[Path]) -> List[Tuple[str, str, List[Path]]]:
+        """Agrupar archivos en items respetando los límites de Archive.org
+        
+        Devuelve una lista de (identificador, nombre del grupo, archivos).
+        Los archivos sin grupo se suben como items individuales.
+        """
+        groups: Dict[Tuple[Path, str], List[Path]] = {}
+        singles = []
+        
+        for file_path in files:
+            group_name = self.get_group_name(file_path)
+            if group_name is None:
+                singles.append(file_path)
+                continue
+            # En modo directorio el grupo es la carpeta, no solo su nombre
+            parent = file_path.parent if self.group_by == 'directory' else Path()
+            groups.setdefault((parent, group_name), []).append(file_path)
+        
+        items = []
+        for (parent, group_name), group in groups.items():
+            source = os.path.abspath(parent) if self.group_by == 'directory' else group_name
+            part = 1
+            current = []
+            current_bytes = 0
             
-            # Subir archivo
-            item = ia.upload(identifier, files=str(file_path), metadata=metadata)
+            for file_path in group:
+                size = self.get_file_size(file_path)
+                # Dividir el item antes de superar los límites
+                if current and (len(current) >= self.item_max_files or
+                                current_bytes + size > self.item_max_bytes):
+                    items.append((self.generate_group_identifier(group_name, part, source), group_name, current))
+                    part += 1
+                    current = []
+                    current_bytes = 0
+                current.append(file_path)
+                current_bytes += size
             
-            # Verificar respuesta
-            if item and len(item) > 0:
-                response = item[0]
+            if current:
+                items.append((self.generate_group_identifier(group_name, part, source), group_name, current))
+        
+        identifiers = self.assign_identifiers(singles)
+        for file_path in singles:
+            items.append((identifiers[file_path], file_path.stem, [file_path]))
+        
+        return items
+        
+    def group_keys(self, identifier: str, files: List[Path]) -> Dict[Path, str]:
+        """Nombres remotos únicos dentro de un item, estables entre ejecuciones
+        
+        Los archivos ya subidos conservan la clave guardada en su progreso;
+        el resto se reparte sobre todo el grupo en orden de ruta sin pisar
+        ninguna de ellas, así que una subida interrumpida no sobrescribe lo
+        que ya está en el item.
+        """
+        keys = {}
+        for file_path in files:
+            entry = self.progress.get(str(file_path), {})
+            if entry.get('key') and entry.get('identifier') == identifier:
+                keys[file_path] = entry['key']
+        used = set(keys.values())
+        for file_path in sorted(f for f in files if f not in keys):
+            key = file_path.name
+            attempt = 0
+            while key in used:
+                attempt += 1
+                key = (f"{file_path.parent.name}_{file_path.name}" if attempt == 1 else
+                       f"{file_path.parent.name}_{file_path.stem}_{attempt}{file_path.suffix}")
+            used.add(key)
+            keys[file_path] = key
+        return keys
+        
+    def upload_group(self, identifier: str, group_name: str, files: List[Path]) -> Tuple[int, int]:
+        """Subir varios archivos a un mismo item de Archive.org
+        
+        Devuelve (exitosos, errores).
+        """
+        pending = [f for f in files if not self.is_uploaded(str(f))]
+        success_count = len(files) - len(pending)
+        error_count = 0
+        
+        # Descartar contenido ya subido antes de enviar nada
+        hashes = {}
+        for file_path in list(pending):
+            try:
+                md5, duplicate = self.check_duplicate(file_path)
+            except Exception as e:
+                self.record_error(file_path, e)
+                pending.remove(file_path)
+                error_count += 1
+                continue
+            if duplicate:
+                pending.remove(file_path)
+                success_count += 1
+            else:
+                hashes[file_path] = md5
+        
+        if success_count:
+            self.logger.info(f"{success_count} archivos ya subidos en {identifier}")
+        if not pending:
+            return success_count, error_count
+        
+        metadata = self.generate_group_metadata(group_name, files)
+        self.logger.info(f"Subiendo {len(pending)} archivos -> {identifier}")
+        self.logger.info(f"Colección: {self.collection}")
+        
+        keys = self.group_keys(identifier, files)
+        
+        try:
+            item = self.get_item(identifier)
+        except Exception as e:
+            self.logger.error(f"❌ Error obteniendo item {identifier}: {e}")
+            for file_path in pending:
+                self.record_progress(str(file_path), {
+                    'status': 'error',
+                    'error': str(e),
+                    'date': datetime.datetime.now().isoformat()
+                })
+            return success_count, len(pending)
+        
+        # Los fallos transitorios vuelven al final de la cola del item
+        queue = list(reversed(pending))
+        retries = RetryQueue()
+        index = 0
+        while queue or retries:
+            file_path = retries.pop_ready() or (queue.pop() if queue else retries.pop_wait())
+            file_id = str(file_path)
+            try:
+                # Solo el último archivo dispara el derive del item
+                queue_derive = not queue and not retries
+                with self.network_slot(file_path), self.metrics.timer('transfer'):
+                    start = time.perf_counter()
+                    if self.use_multipart(file_path):
+                        response = self.upload_multipart(file_path, identifier, metadata,
+                                                         key=keys[file_path], queue_derive=queue_derive)
+                    else:
+                        with open(file_path, 'rb') as body:
+                            response = item.upload_file(self.bandwidth.wrap(body), key=keys[file_path],
+                                                        metadata=metadata, queue_derive=queue_derive)
+                self.record_transfer(file_path, response, time.perf_counter() - start)
                 if isinstance(response, requests.Response) and response.ok:
-                    self.progress[file_id] = {
+                    self.record_progress(file_id, {
                         'status': 'success',
                         'identifier': identifier,
+                        'key': keys[file_path],
+                        'md5': hashes[file_path],
                         'date': datetime.datetime.now().isoformat()
-                    }
-                    self.save_progress()
-                    
-                    # Agregar a lista si se especificó
-                    if self.list_name:
-                        self.add_to_list(identifier, file_path.name)
-                    
-                    # Mover archivo a carpeta "Uploaded" después de subida exitosa
-                    self.move_to_uploaded_folder(file_path)
-                    self.logger.info(f"✅ Subido exitosamente: {file_path.name}")
-                    return True
+                    })
+                    self.after_upload(file_path, identifier, keys[file_path], hashes[file_path])
+                    index += 1
+                    self.logger.info(f"✅ Subido exitosamente: {file_path.name} ({index}/{len(pending)})")
+                    success_count += 1
                 else:
                     self.logger.error(f"❌ Error en respuesta: {response.status_code}")
-                    return False
+                    error_count += 1
+            except Exception as e:
+                delay = self.retry_delay(file_path, e)
+                if delay is not None:
+                    retries.push(file_path, delay)
+                    continue
+                self.logger.error(f"❌ Error subiendo {file_path.name}: {e}")
+                self.record_progress(file_id, {
+                    'status': 'error',
+                    'error': str(e),
+                    'date': datetime.datetime.now().isoformat()
+                })
+                error_count += 1
+        
+        if self.remote_index is not None and index:
+            self.remote_index.mark({identifier: True})
+        if self.list_name and success_count:
+            self.add_to_list(identifier, group_name)
+        
+        return success_count, error_count
+        
+    def is_uploaded(self, file_id: str) -> bool:
+        """Verificar si un archivo ya se subió con éxito (o su contenido)"""
+        return self.progress.get(file_id, {}).get('status') in ('success', 'duplicate', 'remote')
+        
+    def preflight(self, files: List[Path]) -> int:
+        """Marcar como subidos los archivos cuyo item ya existe en Archive.org
+        
+        Consulta todos los identificadores en bloque (con caché por TTL).
+        Devuelve cuántos archivos se encontraron.
+        """
+        if self.remote_index is None:
+            return 0
+        
+        candidates: Dict[str, List[Path]] = {}
+        # Tras una verificación fallida el item existe, pero el archivo hay que subirlo otra vez
+        pending = [file_path for file_path in files if not self.is_uploaded(str(file_path))
+                   and not self.progress.get(str(file_path), {}).get('verify_failed')]
+        for file_path, identifier in self.assign_identifiers(pending).items():
+            candidates.setdefault(identifier, []).append(file_path)
+        if not candidates:
+            return 0
+        
+        found = 0
+        with self.metrics.timer('preflight'):
+            existing = self.remote_index.existing(candidates, self.session)
+        for identifier in existing:
+            for file_path in candidates[identifier]:
+                self.logger.info(f"🌐 Ya existe en Archive.org: {file_path.name} -> {identifier}")
+                self.record_progress(str(file_path), {
+                    'status': 'remote',
+                    'identifier': identifier,
+                    'date': datetime.datetime.now().isoformat()
+                })
+                found += 1
+        return found
+        
+    def preflight_files(self, files: Iterable[Path]) -> Iterator[Path]:
+        """Aplicar la comprobación previa por lotes a un flujo de archivos
+
+        Los lotes crecen desde un solo archivo hasta PREFLIGHT_BATCH_SIZE:
+        la primera subida no espera a que el escaneo llene un lote entero.
+        """
+        batch = []
+        limit = 1
+        for file_path in files:
+            batch.append(file_path)
+            if len(batch) >= limit:
+                self.preflight(batch)
+                yield from batch
+                batch = []
+                limit = min(limit * 2, PREFLIGHT_BATCH_SIZE)
+        if batch:
+            self.preflight(batch)
+            yield from batch
+        
+    def file_md5(self, file_path: Path) -> str:
+        """Calcular el MD5 de un archivo, usando la caché por firma si existe"""
+        stat = file_path.stat()
+        md5 = self.progress.get_cached_md5(stat)
+        if md5:
+            return md5
+        
+        digest = hashlib.md5()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        md5 = digest.hexdigest()
+        self.progress.cache_md5(stat, md5)
+        return md5
+        
+    def check_duplicate(self, file_path: Path) -> Tuple[str, bool]:
+        """Buscar contenido idéntico ya subido. Devuelve (md5, es_duplicado)
+        
+        Los duplicados se registran en el progreso y no se vuelven a subir.
+        """
+        with self.metrics.timer('hash'):
+            md5 = self.file_md5(file_path)
+            match = self.progress.find_by_md5(md5)
+        if match is None or match[0] == str(file_path):
+            return md5, False
+        
+        original_path, original = match
+        self.logger.info(f"♻️ Contenido ya subido como {original.get('identifier')} "
+                         f"({Path(original_path).name}): {file_path.name}")
+        self.record_progress(str(file_path), {
+            'status': 'duplicate',
+            'identifier': original.get('identifier'),
+            'md5': md5,
+            'duplicate_of': original_path,
+            'date': datetime.datetime.now().isoformat()
+        })
+        return md5, True
+        
+    def prepare_upload(self, file_path: Path) -> Tuple[str, Dict]:
+        """Generar identificador y metadatos de un archivo"""
+        with self.metrics.timer('identifier'):
+            identifier = self.generate_identifier(file_path)
+        with self.metrics.timer('metadata'):
+            mediatype = self.get_mediatype(file_path)
+            metadata = self.generate_metadata(file_path, mediatype)
+        return identifier, metadata
+        
+    def transfer_file(self, file_path: Path, identifier: str, metadata: Dict) -> List:
+        """Enviar un archivo a Archive.org (llamada de red bloqueante)"""
+        self.logger.info(f"Subiendo: {file_path.name} -> {identifier}")
+        self.logger.info(f"Colección: {self.collection}")
+        with self.network_slot(file_path), self.metrics.timer('transfer'):
+            start = time.perf_counter()
+            if self.use_multipart(file_path):
+                responses = [self.upload_multipart(file_path, identifier, metadata)]
             else:
-                self.logger.error(f"❌ No se recibió respuesta válida")
-                return False
+                with open(file_path, 'rb') as body:
+                    item = self.get_item(identifier)
+                    responses = [item.upload_file(self.bandwidth.wrap(body), key=file_path.name,
+                                                  metadata=metadata, queue_derive=True)]
+        self.record_transfer(file_path, responses[0], time.perf_counter() - start)
+        return responses
+        
+    def record_transfer(self, file_path: Path, response, seconds: float):
+        """Contar bytes y rendimiento de una transferencia exitosa"""
+        if self.metrics.enabled and isinstance(response, requests.Response) and response.ok:
+            self.metrics.transfer(self.get_file_size(file_path), seconds)
+        
+    def finish_upload(self, file_path: Path, identifier: str, item: List, md5: Optional[str] = None) -> bool:
+        """Registrar el resultado de una subida y verificar o mover el archivo"""
+        file_id = str(file_path)
+        
+        # Verificar respuesta
+        if item and len(item) > 0:
+            response = item[0]
+            if isinstance(response, requests.Response) and response.ok:
+                self.record_progress(file_id, {
+                    'status': 'success',
+                    'identifier': identifier,
+                    'md5': md5,
+                    'date': datetime.datetime.now().isoformat()
+                })
+                if self.remote_index is not None:
+                    self.remote_index.mark({identifier: True})
+                
+                # Agregar a lista si se especificó
+                if self.list_name:
+                    self.add_to_list(identifier, file_path.name)
                 
+                self.after_upload(file_path, identifier, file_path.name, md5)
+                self.logger.info(f"✅ Subido exitosamente: {file_path.name}")
+                return True
+            else:
+                self.logger.error(f"❌ Error en respuesta: {response.status_code}")
+                return False
+        else:
+            self.logger.error(f"❌ No se recibió respuesta válida")
+            return False
+            
+    def after_upload(self, file_path: Path, identifier: str, key: str, md5: Optional[str]):
+        """Subida aceptada: con verificador queda pendiente de verificar, si no se mueve ya"""
+        if self.verifier is None:
+            self.dispose_file(file_path)
+            return
+        try:
+            self.verifier.queue(str(file_path), identifier, key, file_path.stat().st_size,
+                                md5 or self.file_md5(file_path))
         except Exception as e:
-            self.logger.error(f"❌ Error subiendo {file_path.name}: {e}")
-            self.progress[file_id] = {
-                'status': 'error',
-                'error': str(e),
-                'date': datetime.datetime.now().isoformat()
-            }
-            self.save_progress()
+            # Sin fila de verificación el archivo no se liberaría nunca: se mueve como antes
+            self.logger.error(f"❌ Error anotando la verificación de {file_path.name}: {e}")
+            self.dispose_file(file_path)
+        
+    def dispose_file(self, file_path: Path, **fields):
+        """Liberar un archivo subido (y verificado, si hay verificador) y anotar dónde quedó"""
+        with self.metrics.timer('move'):
+            location = self.move_to_uploaded_folder(file_path)
+        if location != file_path:
+            fields['location'] = str(location)
+        if fields:
+            self.annotate_progress(str(file_path), **fields)
+        
+    def item_files(self, identifier: str) -> List[Dict]:
+        """Lista de archivos de un item (nombre, tamaño, md5...) según la API de metadatos"""
+        return self.session.get_metadata(identifier).get('files', [])
+        
+    def file_verified(self, file_id: str, row: Dict):
+        """El archivo está en el item con su tamaño y MD5: marcarlo y liberarlo"""
+        if self.progress.get(file_id, {}).get('verified'):
+            return  # Ya se liberó en una ejecución que se cortó antes de borrar su fila
+        self.logger.info(f"🔒 Verificado en {row['identifier']}: {Path(file_id).name}")
+        self.dispose_file(Path(file_id), verified=datetime.datetime.now().isoformat())
+        
+    def verification_failed(self, file_id: str, row: Dict, reason: str):
+        """El archivo remoto no coincide: queda en su sitio y se volverá a subir"""
+        self.logger.error(f"❌ Verificación fallida de {Path(file_id).name} en {row['identifier']}: {reason}")
+        self.record_progress(file_id, {
+            'status': 'error',
+            'identifier': row['identifier'],
+            'error': f"Verificación fallida: {reason}",
+            'verify_failed': True,
+            'date': datetime.datetime.now().isoformat()
+        })
+        if self.job_queue is not None:
+            self.job_queue.reopen(Path(file_id))
+        
+    def record_error(self, file_path: Path, error: Exception):
+        """Registrar un error de subida"""
+        self.logger.error(f"❌ Error subiendo {file_path.name}: {error}")
+        self.record_progress(str(file_path), {
+            'status': 'error',
+            'error': str(error),
+            'date': datetime.datetime.now().isoformat()
+        })
+        
+    def retry_delay(self, file_path: Path, error: Exception) -> Optional[float]:
+        """Registrar un fallo y devolver la espera antes de reintentar, o None si es definitivo"""
+        file_id = str(file_path)
+        with self._failures_lock:
+            failures = self._failures.get(file_id, 0) + 1
+            self._failures[file_id] = failures
+        delay = self.retry_policy.delay(failures, error)
+        if delay is None:
+            if classify_error(error) == 'transient':
+                self.logger.warning(f"⚠️ {file_path.name}: sin más reintentos tras {failures} fallos")
+            return None
+        
+        self.logger.warning(f"🔁 Fallo transitorio en {file_path.name} "
+                            f"({failures}/{self.retry_policy.max_retries}): {error} - "
+                            f"reintento en {delay:.1f}s")
+        now = datetime.datetime.now()
+        self.record_progress(file_id, {
+            'status': 'retry',
+            'error': str(error),
+            'attempts': failures,
+            'retry_at': (now + datetime.timedelta(seconds=delay)).isoformat(),
+            'date': now.isoformat()
+        })
+        return delay
+        
+    def upload_file(self, file_path: Path, requeue: bool = False) -> bool:
+        """Subir un archivo a Archive.org
+        
+        Ante un fallo transitorio, con requeue=True se lanza RetryLater para
+        que quien llama vuelva a encolar el archivo; si no, se espera aquí.
+        """
+        # Verificar si ya se subió
+        if self.is_uploaded(str(file_path)):
+            self.logger.info(f"Archivo ya subido: {file_path.name}")
+            self.drop_media_info(file_path)
+            return True
+        
+        while True:
+            try:
+                md5, duplicate = self.check_duplicate(file_path)
+                if duplicate:
+                    self.drop_media_info(file_path)
+                    return True
+                
+                identifier, metadata = self.prepare_upload(file_path)
+                item = self.transfer_file(file_path, identifier, metadata)
+                return self.finish_upload(file_path, identifier, item, md5)
+            except Exception as e:
+                delay = self.retry_delay(file_path, e)
+                if delay is None:
+                    self.record_error(file_path, e)
+                    self.drop_media_info(file_path)
+                    return False
+                if requeue:
+                    raise RetryLater(delay, e) from e
+                time.sleep(delay)
+    
+    # Etapas del pipeline: cada trabajo es un dict que se completa etapa a etapa
+    
+    def stage_hash(self, job: Dict) -> bool:
+        """Etapa de hash: descartar lo ya subido y los duplicados"""
+        file_path = job['file_path']
+        if self.is_uploaded(str(file_path)):
+            self.logger.info(f"Archivo ya subido: {file_path.name}")
+            job['result'] = True
+            self.drop_media_info(file_path)
             return False
+        job['md5'], duplicate = self.check_duplicate(file_path)
+        if duplicate:
+            job['result'] = True
+            self.drop_media_info(file_path)
+            return False
+        return True
+        
+    def stage_metadata(self, job: Dict) -> bool:
+        """Etapa de metadatos: identificador y metadatos del item"""
+        job['identifier'], job['metadata'] = self.prepare_upload(job['file_path'])
+        return True
+        
+    def stage_upload(self, job: Dict) -> bool:
+        """Etapa de red: la única que debería tener trabajos esperando"""
+        job['response'] = self.transfer_file(job['file_path'], job['identifier'], job['metadata'])
+        return True
+        
+    def stage_dispose(self, job: Dict) -> bool:
+        """Etapa de cierre: registrar el resultado y verificar o mover el archivo"""
+        job['result'] = self.finish_upload(job['file_path'], job['identifier'], job['response'], job.get('md5'))
+        return True
+        
+    def stage_error(self, job: Dict, error: Exception) -> Optional[float]:
+        """Fallo en una etapa: espera antes de repetirla, o None si es definitivo"""
+        delay = self.retry_delay(job['file_path'], error)
+        if delay is None:
+            self.record_error(job['file_path'], error)
+            job['result'] = False
+        return delay
+        
+    def stage_abandon(self, job: Dict):
+        """Reintento en espera abandonado al detenerse: queda como error, no como 'retry'"""
+        file_path = job['file_path']
+        previous = self.progress.get(str(file_path), {})
+        self.record_progress(str(file_path), {
+            'status': 'error',
+            'error': f"Detenido antes de reintentar: {previous.get('error', '')}",
+            'attempts': previous.get('attempts'),
+            'date': datetime.datetime.now().isoformat()
+        })
+        job['result'] = False
+        
+    def upload_pipeline(self, files: Iterable[Path], workers: int = 1,
+                        should_stop: Optional[Callable[[], bool]] = None,
+                        on_result: Optional[Callable[[Path, bool], None]] = None) -> Tuple[int, int]:
+        """Subir archivos con el pipeline hash -> metadatos -> subida -> cierre
+        
+        Cada etapa tiene sus propios hilos y una cola acotada, así que el
+        disco y la CPU preparan los siguientes archivos mientras la red sube.
+        """
+        counts = [0, 0]
+        counts_lock = threading.Lock()
+        
+        def on_done(job):
+            # Errores y reintentos abandonados antes de la etapa de metadatos
+            self.drop_media_info(job['file_path'])
+            with counts_lock:
+                counts[0 if job.get('result') else 1] += 1
+            self.release_job(job['file_path'], bool(job.get('result')))
+            if on_result is not None:
+                on_result(job['file_path'], bool(job.get('result')))
+        
+        self.pipeline = Pipeline([
+            Stage('hash', self.stage_hash, PIPELINE_HASH_WORKERS),
+            Stage('metadata', self.stage_metadata, PIPELINE_METADATA_WORKERS),
+            Stage('upload', self.stage_upload, workers),
+            Stage('dispose', self.stage_dispose, PIPELINE_DISPOSE_WORKERS),
+        ], on_done=on_done, on_error=self.stage_error, on_abandon=self.stage_abandon, logger=self.logger)
+        self.pipeline.run(({'file_path': file_path} for file_path in files), should_stop)
+        return counts[0], counts[1]
     
+    def shard_files(self, files: Iterable[Path]) -> Iterator[Path]:
+        """Con --shard, dejar pasar solo los archivos de este shard (por la base del identificador)"""
+        if self.shard is None:
+            yield from files
+            return
+        owned = total = 0
+        for file_path in files:
+            total += 1
+            if self.shard.owns(self.identifier_base(file_path)):
+                owned += 1
+                yield file_path
+        self.logger.info(f"🧩 Shard {self.shard}: {owned} de {total} archivos")
+        
+    def claim_files(self, files: Iterable[Path]) -> Iterable[Path]:
+        """Con cola compartida, dejar pasar solo los archivos cuyo lease se consiguió"""
+        if self.job_queue is None:
+            return files
+        return self.job_queue.claim(files)
+        
+    def release_job(self, file_path: Path, ok: bool):
+        """Soltar el lease de un archivo terminado (tras un error, otro puede reintentarlo)"""
+        if self.job_queue is not None:
+            self.job_queue.release(file_path, done=ok)
+        
     def add_to_list(self, identifier: str, filename: str):
         """Agregar item a una lista de Archive.org"""
         try:
@@ -232,104 +965,301 @@ class ArchiveUploader:
                 
             self.logger.info(f"📋 Agregando {filename} a lista: {self.list_name}")
             
-            # Usar la API de Archive.org para agregar a lista
-            import internetarchive as ia
-            
-            # Obtener el item
-            item = ia.get_item(identifier)
-            
             # Crear o actualizar la lista
             list_url = f"https://archive.org/details/{self.list_name}"
             
             # Nota: La API de listas requiere autenticación específica
-            # Por ahora, solo logueamos la información
+            # Por ahora, solo logueamos la información (sin pedir el item otra vez)
             self.logger.info(f"📋 Item {identifier} listo para agregar a lista: {list_url}")
             self.logger.info(f"📋 Para agregar manualmente, visita: {list_url}")
             
         except Exception as e:
             self.logger.error(f"❌ Error agregando a lista: {e}")
             
+    def iter_directory(self, directory: Path) -> Iterator[Path]:
+        """Generar archivos soportados a medida que se encuentran
+        
+        No entra en carpetas "Uploaded", respeta el `.archiveignore` de la raíz
+        y reutiliza el manifiesto para los directorios que no cambiaron.
+        """
+        self.root = directory
+        ignore = IgnoreRules.from_file(directory / IGNORE_FILE)
+        return iter_files(directory, ALL_EXTENSIONS, ignore=ignore, manifest=self.manifest)
+        
+    def get_file_size(self, file_path: Path) -> int:
+        """Tamaño actual de un archivo (el del manifiesto puede haber cambiado desde el escaneo)"""
+        return file_path.stat().st_size
+        
+    def scanned_size(self, file_path: Path) -> int:
+        """Tamaño visto en el último escaneo, solo para mostrar listas sin otro stat()"""
+        signature = self.manifest.signature(file_path) if self.manifest else None
+        return signature[0] if signature else file_path.stat().st_size
+        
     def scan_directory(self, directory: Path) -> List[Path]:
         """Escanear directorio en busca de archivos soportados"""
-        files = []
-        all_extensions = []
-        for ext_list in SUPPORTED_EXTENSIONS.values():
-            all_extensions.extend(ext_list)
-            
-        for file_path in directory.rglob('*'):
-            # Excluir archivos en carpetas "Uploaded"
-            if "Uploaded" in file_path.parts:
-                continue
-                
-            if file_path.is_file() and file_path.suffix.lower() in all_extensions:
-                files.append(file_path)
-                
-        return sorted(files)
+        return sorted(self.iter_directory(directory))
+        
+    def recover_dispositions(self):
+        """Terminar los movimientos que una subida anterior dejó a medias
         
-    def move_to_uploaded_folder(self, file_path: Path):
-        """Mover archivo a carpeta 'Uploaded' después de subida exitosa"""
+        Solo se llama al empezar a subir: escanear o probar la conexión no mueve archivos.
+        """
+        for file_id, location in self.disposer.recover().items():
+            self.annotate_progress(file_id, location=location)
+        
+    def move_to_uploaded_folder(self, file_path: Path) -> Path:
+        """Aplicar la disposición (mover a "Uploaded" o dejar en su sitio); devuelve dónde quedó"""
         try:
-            self.logger.info(f"🔄 Intentando mover archivo: {file_path}")
-            
-            # Crear carpeta "Uploaded" en el directorio padre del archivo
-            uploaded_dir = file_path.parent / "Uploaded"
-            self.logger.info(f"📁 Creando carpeta: {uploaded_dir}")
-            uploaded_dir.mkdir(exist_ok=True)
-            
-            # Definir ruta de destino
-            destination = uploaded_dir / file_path.name
-            self.logger.info(f"🎯 Destino: {destination}")
-            
-            # Si ya existe un archivo con el mismo nombre, agregar timestamp
-            if destination.exists():
-                timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                name_parts = file_path.stem, timestamp, file_path.suffix
-                destination = uploaded_dir / f"{name_parts[0]}_{name_parts[1]}{name_parts[2]}"
-                self.logger.info(f"🕐 Archivo existe, nuevo destino: {destination}")
-            
-            # Mover archivo
-            import shutil
-            self.logger.info(f"📦 Moviendo de {file_path} a {destination}")
-            shutil.move(str(file_path), str(destination))
-            self.logger.info(f"✅ Movido exitosamente a: {destination}")
-            
+            return self.disposer.dispose(file_path)
         except Exception as e:
-            self.logger.error(f"❌ Error moviendo archivo a carpeta Uploaded: {e}")
-            import traceback
-            self.logger.error(f"📋 Traceback: {traceback.format_exc()}")
+            # La intención queda registrada: la próxima ejecución termina el movimiento
+            self.logger.error(f"❌ Error moviendo {file_path.name} a la carpeta Uploaded: {e}")
+            return file_path
+        
+    def run_jobs(self, jobs: Iterable[Callable[[], Tuple[int, int]]], workers: int = 1,
+                 should_stop: Optional[Callable[[], bool]] = None) -> Tuple[int, int]:
+        """Ejecutar trabajos de subida, en paralelo si workers > 1
+        
+        Cada trabajo devuelve (exitosos, errores). Un trabajo que lanza
+        RetryLater vuelve a la cola tras su espera sin ocupar ningún hilo.
+        Los contadores solo se actualizan en el hilo que llama, así que no
+        necesitan bloqueo.
+        """
+        success_count = 0
+        error_count = 0
+        jobs = iter(jobs)
+        retries = RetryQueue()
+        
+        def collect(job, run):
+            nonlocal success_count, error_count
+            try:
+                job_success, job_errors = run()
+            except RetryLater as e:
+                retries.push(job, e.delay)
+                return
+            except Exception as e:
+                self.logger.error(f"❌ Error en hilo de subida: {e}")
+                job_success, job_errors = 0, 1
+            success_count += job_success
+            error_count += job_errors
+        
+        def next_job(block: bool):
+            """Siguiente trabajo: primero los reintentos vencidos, luego los nuevos"""
+            job = retries.pop_ready()
+            if job is None:
+                job = next(jobs, None)
+            if job is None and block and retries:
+                job = retries.pop_wait()
+            return job
+        
+        if workers <= 1:
+            while not (should_stop and should_stop()):
+                job = next_job(block=True)
+                if job is None:
+                    break
+                collect(job, job)
+            return success_count, error_count
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers,
+                                                   thread_name_prefix='upload') as executor:
+            pending = {}
+            while not (should_stop and should_stop()):
+                # Mantener acotado el número de trabajos en vuelo
+                job = next_job(block=not pending) if len(pending) < workers * 2 else None
+                if job is not None:
+                    pending[executor.submit(job)] = job
+                    continue
+                if not pending:
+                    break
+                timeout = retries.wait_time() if retries and len(pending) < workers * 2 else None
+                done, _ = concurrent.futures.wait(
+                    pending, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    collect(pending.pop(future), future.result)
+            
+            for future in concurrent.futures.as_completed(pending):
+                collect(pending.pop(future), future.result)
+        
+        return success_count, error_count
+        
+    def process_directory(self, directory: str, workers: int = 1, engine=None):
+        """Procesar directorio completo
         
-    def process_directory(self, directory: str):
-        """Procesar directorio completo"""
+        Si se pasa un AsyncUploadEngine, las subidas se ejecutan con asyncio
+        sobre la sesión compartida en lugar del pool de hilos.
+        """
         directory_path = Path(directory)
         
         if not directory_path.exists():
             self.logger.error(f"Directorio no existe: {directory}")
             return
             
-        self.logger.info(f"Escaneando directorio: {directory}")
-        files = self.scan_directory(directory_path)
-        
-        if not files:
-            self.logger.warning("No se encontraron archivos soportados")
-            return
+        self.recover_dispositions()
+        try:
+            self.logger.info(f"Escaneando directorio: {directory}")
             
-        self.logger.info(f"Encontrados {len(files)} archivos para procesar")
-        
-        success_count = 0
-        error_count = 0
-        
-        for i, file_path in enumerate(files, 1):
-            self.logger.info(f"Procesando {i}/{len(files)}: {file_path.name}")
+            if engine is not None:
+                self.logger.info(f"⚡ Motor asíncrono: {engine.concurrency} subidas en vuelo, "
+                                 f"{engine.io_threads} hilos de E/S")
+            elif workers > 1:
+                self.logger.info(f"🔄 Usando {workers} hilos para subida paralela")
             
-            if self.upload_file(file_path):
-                success_count += 1
+            if self.group_by != 'file':
+                # Agrupar necesita ver todos los archivos antes de empezar
+                with self.metrics.timer('scan'):
+                    files = self.scan_directory(directory_path)
+                if not files:
+                    self.logger.warning("No se encontraron archivos soportados")
+                    return
+                self.logger.info(f"Encontrados {len(files)} archivos para procesar")
+                total_files = len(files)
+                
+                items = self.group_files(files)
+                self.logger.info(f"Agrupados en {len(items)} items (modo: {self.group_by})")
+                if self.shard is not None:
+                    # Los items se reparten por la base de su identificador: un item nunca se divide
+                    # entre equipos y los que chocarían quedan en el mismo
+                    owned = [item for item in items
+                             if self.shard.owns(f"{self._clean_author}-{clean_identifier_part(item[1])}")]
+                    self.logger.info(f"🧩 Shard {self.shard}: {len(owned)} de {len(items)} items")
+                    items = owned
+                    total_files = sum(len(group) for _, _, group in items)
+                # Solo los archivos sueltos usan el identificador por archivo
+                singles = [group[0] for _, _, group in items
+                           if len(group) == 1 and self.get_group_name(group[0]) is None]
+                self.preflight(singles)
+                with self.metrics.timer('extract_metadata'):
+                    self.extract_media_metadata(singles)
+                
+                def item_job(i, identifier, group_name, group):
+                    self.logger.info(f"Procesando item {i}/{len(items)}: {identifier} ({len(group)} archivos)")
+                    
+                    if len(group) == 1 and self.get_group_name(group[0]) is None:
+                        return (1, 0) if self.upload_file(group[0], requeue=True) else (0, 1)
+                    
+                    return self.upload_group(identifier, group_name, group)
+                
+                jobs = (lambda i=i, item=item: item_job(i, *item)
+                        for i, item in enumerate(items, 1))
+                
+                if engine is not None:
+                    success_count, error_count = engine.execute_jobs(jobs)
+                else:
+                    success_count, error_count = self.run_jobs(jobs, workers)
             else:
-                error_count += 1
+                # Las subidas empiezan mientras el escaneo sigue avanzando
+                total_files = 0
+                
+                def announce():
+                    nonlocal total_files
+                    scanned = self.metrics.timed_iter(self.iter_directory(directory_path), 'scan')
+                    scanned = self.claim_files(self.shard_files(scanned))
+                    extracted = self.metrics.timed_iter(self.extract_files(self.preflight_files(scanned)),
+                                                        'extract_metadata')
+                    for file_path in extracted:
+                        total_files += 1
+                        self.logger.info(f"Procesando {total_files}: {file_path.name}")
+                        yield file_path
+                
+                if engine is not None:
+                    success_count, error_count = engine.upload_files(announce(), on_result=self.release_job)
+                else:
+                    success_count, error_count = self.upload_pipeline(announce(), workers)
                 
-        self.logger.info(f"Proceso completado:")
-        self.logger.info(f"  ✅ Exitosos: {success_count}")
-        self.logger.info(f"  ❌ Errores: {error_count}")
-        self.logger.info(f"  📁 Total: {len(files)}")
+                if not total_files:
+                    self.logger.warning("No se encontraron archivos soportados")
+                    return
+                    
+            self.save_progress()
+            self.logger.info(f"Proceso completado:")
+            self.logger.info(f"  ✅ Exitosos: {success_count}")
+            self.logger.info(f"  ❌ Errores: {error_count}")
+            self.logger.info(f"  📁 Total: {total_files}")
+            self.log_phase_times()
+        finally:
+            # También tras un error: el pool de extracción no debe quedar vivo
+            if self.metadata_extractor is not None:
+                self.metadata_extractor.close()
+        
+    def watch_directory(self, directory: str, workers: int = 1, engine=None,
+                        settle: float = WATCH_SETTLE_SECONDS, poll_interval: Optional[float] = None,
+                        should_stop: Optional[Callable[[], bool]] = None):
+        """Modo vigilancia: subir lo que ya hay y después cada archivo nuevo
+        
+        La vigilancia empieza antes del escaneo inicial, así que nada de lo
+        que llegue mientras tanto se pierde. Los archivos nuevos pasan por
+        la comprobación previa y la extracción de metadatos en pequeños
+        lotes y entran en el pipeline de subida en cuanto dejan de crecer.
+        Con Ctrl+C se deja de vigilar y se terminan las subidas en curso.
+        """
+        directory_path = Path(directory)
+        if not directory_path.exists():
+            self.logger.error(f"Directorio no existe: {directory}")
+            return
+        
+        watcher = DirectoryWatcher(directory_path, ALL_EXTENSIONS,
+                                   ignore=IgnoreRules.from_file(directory_path / IGNORE_FILE),
+                                   settle=settle, poll_interval=poll_interval, logger=self.logger)
+        watcher.start()
+        stop = threading.Event()
+        
+        def stopped():
+            return stop.is_set() or bool(should_stop and should_stop())
+        
+        def arrivals():
+            try:
+                for batch in watcher.watch(stopped):
+                    delivered = batch
+                    if self.shard is not None:
+                        batch = [file_path for file_path in batch
+                                 if self.shard.owns(self.identifier_base(file_path))]
+                    if self.job_queue is not None:
+                        # Lo que ya tomó otro trabajador vigilante no se espera
+                        batch = [file_path for file_path in batch
+                                 if self.job_queue.acquire(file_path) == ACQUIRED]
+                    # Lo que no sube este proceso no pasa por el pipeline: olvidarlo ya
+                    for file_path in set(delivered).difference(batch):
+                        watcher.forget(file_path)
+                    if not batch:
+                        continue
+                    self.logger.info(f"🆕 {len(batch)} archivos nuevos listos para subir")
+                    self.preflight(batch)
+                    with self.metrics.timer('extract_metadata'):
+                        self.extract_media_metadata(batch)
+                    for file_path in batch:
+                        self.logger.info(f"Procesando: {file_path.name}")
+                        yield file_path
+            except KeyboardInterrupt:
+                stop.set()
+                self.logger.info("⏹️ Vigilancia detenida; terminando las subidas en curso...")
+        
+        try:
+            self.process_directory(directory, workers=workers, engine=engine)
+            if stopped():
+                return
+            self.logger.info(f"👀 Vigilando {directory} ({watcher.backend}); "
+                             f"cada archivo se sube tras {settle:g}s sin cambios. Ctrl+C para terminar")
+            # El motor asyncio consumiría el flujo dentro de su bucle: la vigilancia usa el pipeline
+            success_count, error_count = self.upload_pipeline(
+                arrivals(), workers, stopped, on_result=lambda file_path, ok: watcher.forget(file_path))
+            self.logger.info(f"Vigilancia terminada: ✅ {success_count} exitosos, ❌ {error_count} errores")
+        except KeyboardInterrupt:
+            self.logger.info("⏹️ Vigilancia detenida")
+        finally:
+            watcher.close()
+            if self.metadata_extractor is not None:
+                self.metadata_extractor.close()
+            self.save_progress()
+        
+    def log_phase_times(self):
+        """Resumen del tiempo por fase (solo con métricas activadas)"""
+        totals = self.metrics.phase_totals()
+        overall = sum(totals.values())
+        if not overall:
+            return
+        breakdown = ', '.join(f"{phase} {seconds:.1f}s ({seconds / overall:.0%})"
+                              for phase, seconds in sorted(totals.items(), key=lambda item: -item[1]))
+        self.logger.info(f"⏱️ Tiempo por fase (sumado entre hilos): {breakdown}")
 
 def main():
     parser = argparse.ArgumentParser(
@@ -351,14 +1281,281 @@ def main():
     parser.add_argument(
         '--resume',
         action='store_true',
-        help='Reanudar desde el último archivo procesado'
+        help='Reanudar desde el último archivo procesado y continuar las subidas multiparte interrumpidas'
+    )
+    parser.add_argument(
+        '--multipart-threshold',
+        type=int,
+        default=MULTIPART_THRESHOLD // 1024 ** 2,
+        metavar='MB',
+        help=f'Subir por partes los archivos desde este tamaño en MB, 0 lo desactiva '
+             f'(default: {MULTIPART_THRESHOLD // 1024 ** 2})'
+    )
+    parser.add_argument(
+        '--import-progress',
+        metavar='JSON',
+        help='Importar un archivo de progreso JSON antiguo antes de empezar'
+    )
+    parser.add_argument(
+        '--full-scan',
+        action='store_true',
+        help='Listar todos los directorios y reconstruir el manifiesto de escaneo'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Número de subidas simultáneas (default: 1)'
+    )
+    parser.add_argument(
+        '--async',
+        dest='use_async',
+        action='store_true',
+        help='Usar el motor asyncio con una sesión HTTP compartida'
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f'Subidas en vuelo con --async (default: {DEFAULT_CONCURRENCY})'
+    )
+    parser.add_argument(
+        '--adaptive',
+        action='store_true',
+        help='Ajustar las subidas simultáneas según el rendimiento y las respuestas 503/429 del servidor; '
+             f'--workers pasa a ser el máximo (default: {ADAPTIVE_MAX_CONCURRENCY})'
+    )
+    parser.add_argument(
+        '--retries',
+        type=int,
+        default=DEFAULT_MAX_RETRIES,
+        help='Reintentos por archivo ante fallos transitorios (timeouts, 5xx, 503 SlowDown), '
+             f'con espera exponencial y Retry-After (default: {DEFAULT_MAX_RETRIES})'
+    )
+    parser.add_argument(
+        '--no-preflight',
+        action='store_true',
+        help='No comprobar en Archive.org qué items ya existen antes de subir'
+    )
+    parser.add_argument(
+        '--preflight-ttl',
+        type=float,
+        default=PREFLIGHT_TTL / 3600,
+        metavar='HOURS',
+        help=f'Horas que vale la respuesta guardada de la comprobación previa (default: {PREFLIGHT_TTL // 3600})'
+    )
+    parser.add_argument(
+        '--no-metadata',
+        action='store_true',
+        help='No leer los metadatos embebidos (etiquetas ID3/FLAC/M4A, Info de PDF, duración de video)'
+    )
+    parser.add_argument(
+        '--metadata-workers',
+        type=int,
+        metavar='N',
+        help='Procesos para leer metadatos embebidos (default: número de CPUs)'
+    )
+    parser.add_argument(
+        '--max-bandwidth',
+        metavar='RATE',
+        help='Ancho de banda máximo compartido por todas las subidas, en bytes/s con sufijo K, M o G '
+             '(ej. 5M; default: sin límite)'
+    )
+    parser.add_argument(
+        '--bandwidth-schedule',
+        metavar='SPEC',
+        help='Límites por franja horaria que sustituyen a --max-bandwidth, '
+             'ej. "09:00-18:00=2M,18:00-09:00=0" (0 = sin límite)'
+    )
+    parser.add_argument(
+        '--metrics-file',
+        metavar='PATH',
+        help='Al terminar, escribir métricas (tiempo por fase, bytes, rendimiento) en formato Prometheus'
+    )
+    parser.add_argument(
+        '--metrics-json',
+        metavar='PATH',
+        help='Al terminar, escribir un resumen JSON de las métricas con percentiles'
+    )
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='Tras subir lo que ya hay, seguir vigilando el directorio y subir cada archivo nuevo '
+             'cuando deje de crecer (inotify en Linux; si no, sondeo)'
+    )
+    parser.add_argument(
+        '--watch-settle',
+        type=float,
+        default=WATCH_SETTLE_SECONDS,
+        metavar='SECONDS',
+        help=f'Segundos sin cambios de tamaño ni mtime antes de subir un archivo nuevo (default: {WATCH_SETTLE_SECONDS:g})'
+    )
+    parser.add_argument(
+        '--watch-poll',
+        type=float,
+        metavar='SECONDS',
+        help='Vigilar por sondeo cada SECONDS en lugar de inotify (p. ej. en NFS/SMB)'
+    )
+    parser.add_argument(
+        '--shared-queue',
+        action='store_true',
+        help='Repartir el directorio con otros procesos (en este u otros equipos vía NFS) mediante '
+             'leases por archivo en <directorio>/.archive_jobs; los archivos de un trabajador caído vuelven a la cola'
+    )
+    parser.add_argument(
+        '--lease-ttl',
+        type=float,
+        default=LEASE_TTL,
+        metavar='SECONDS',
+        help=f'Segundos sin latido tras los que otro trabajador retoma un archivo (default: {LEASE_TTL:g})'
+    )
+    parser.add_argument(
+        '--shard',
+        metavar='K/N',
+        help='Subir solo la parte K de N del árbol (p. ej. 1/4), repartida por un hash estable de la base '
+             'del identificador (autor-nombre); el progreso va a .archive_progress.shardKofN.db'
+    )
+    parser.add_argument(
+        '--merge-progress',
+        nargs='+',
+        metavar='DB',
+        help='Fusionar bases de progreso de otros shards o equipos en la actual antes de empezar'
+    )
+    parser.add_argument(
+        '--no-verify',
+        action='store_true',
+        help='No verificar tamaño y MD5 en Archive.org tras subir; mover cada archivo en cuanto se acepta'
+    )
+    parser.add_argument(
+        '--verify-wait',
+        type=float,
+        default=VERIFY_WAIT,
+        metavar='SECONDS',
+        help='Al terminar, segundos de espera para verificar lo pendiente; el resto se verifica '
+             f'en la próxima ejecución (default: {VERIFY_WAIT:g})'
+    )
+    parser.add_argument(
+        '--disposition',
+        choices=DISPOSITION_MODES,
+        default='move',
+        help='Qué hacer con cada archivo subido: moverlo a la carpeta Uploaded de su directorio '
+             '(sin copiar nunca) o dejarlo en su sitio y solo anotarlo en el progreso (default: move)'
+    )
+    parser.add_argument(
+        '--group',
+        choices=GROUP_MODES,
+        default='file',
+        help='Agrupar archivos en items: uno por archivo, por directorio o por patrón (default: file)'
+    )
+    parser.add_argument(
+        '--group-pattern',
+        help='Expresión regular sobre el nombre del archivo; el primer grupo define el item'
     )
     
     args = parser.parse_args()
     
+    if args.group == 'pattern' and not args.group_pattern:
+        parser.error("--group pattern requiere --group-pattern")
+    if args.workers < 1:
+        parser.error("--workers debe ser al menos 1")
+    if args.metadata_workers is not None and args.metadata_workers < 1:
+        parser.error("--metadata-workers debe ser al menos 1")
+    if args.watch and args.group != 'file':
+        parser.error("--watch solo admite --group file")
+    if args.shared_queue and args.group != 'file':
+        parser.error("--shared-queue solo admite --group file")
+    if args.verify_wait < 0:
+        parser.error("--verify-wait no puede ser negativo")
+    if args.lease_ttl <= 0:
+        parser.error("--lease-ttl debe ser positivo")
+    if args.watch_settle < 0 or (args.watch_poll is not None and args.watch_poll <= 0):
+        parser.error("--watch-settle y --watch-poll deben ser positivos")
+    try:
+        shard = Shard.parse(args.shard) if args.shard else None
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        bandwidth = BandwidthLimiter(parse_rate(args.max_bandwidth),
+                                     parse_schedule(args.bandwidth_schedule))
+    except ValueError as e:
+        parser.error(str(e))
+    
     # Crear uploader y procesar
-    uploader = ArchiveUploader(args.author, args.collection)
-    uploader.process_directory(args.directory)
+    uploader = ArchiveUploader(args.author, args.collection,
+                               group_by=args.group, group_pattern=args.group_pattern,
+                               multipart_threshold=args.multipart_threshold * 1024 ** 2,
+                               resume=args.resume, bandwidth=bandwidth,
+                               retry_policy=RetryPolicy(max_retries=args.retries),
+                               preflight=not args.no_preflight, preflight_ttl=args.preflight_ttl * 3600,
+                               extract_metadata=not args.no_metadata, metadata_workers=args.metadata_workers,
+                               metrics=Metrics() if args.metrics_file or args.metrics_json else None,
+                               progress_db=shard.progress_db(PROGRESS_DB) if shard else PROGRESS_DB,
+                               disposition=args.disposition)
+    uploader.shard = shard
+    if shard:
+        uploader.logger.info(f"🧩 Shard {shard}: progreso en {uploader.progress_db}")
+    
+    workers = args.workers
+    if args.adaptive:
+        workers = args.workers if args.workers > 1 else ADAPTIVE_MAX_CONCURRENCY
+        maximum = min(workers, args.concurrency) if args.use_async else workers
+        uploader.concurrency = AdaptiveConcurrency(initial=1, maximum=maximum,
+                                                   on_change=uploader.log_concurrency_change)
+        uploader.logger.info(f"🎚️ Concurrencia adaptativa: empieza en 1, máximo {maximum}")
+    if args.max_bandwidth or args.bandwidth_schedule:
+        uploader.logger.info(f"📶 Ancho de banda máximo: {format_rate(bandwidth.current_rate())}")
+    if args.full_scan:
+        uploader.manifest.clear()
+    
+    pending = uploader.progress.pending_multipart()
+    if pending and not args.resume:
+        uploader.logger.warning(f"⚠️ {len(pending)} subidas multiparte interrumpidas se reiniciarán; "
+                                f"use --resume para continuarlas")
+    
+    if args.import_progress:
+        imported = uploader.progress.import_json(args.import_progress)
+        uploader.logger.info(f"📥 Importadas {imported} entradas de {args.import_progress}")
+    for db_path in args.merge_progress or []:
+        if not os.path.exists(db_path):
+            uploader.logger.error(f"❌ No existe la base de progreso: {db_path}")
+            continue
+        try:
+            merged = uploader.progress.merge(db_path)
+        except MergeConflictError as e:
+            uploader.logger.error(f"❌ No se fusionó {db_path}: {e}")
+            for conflict in e.conflicts:
+                uploader.logger.error(f"   {conflict[0]}: {conflict[1]} aquí, {conflict[2]} en {db_path}")
+            continue
+        uploader.logger.info(f"🔀 Fusionadas {merged} entradas de {db_path}")
+    
+    engine = None
+    if args.use_async:
+        # Con --async, --workers fija los hilos para las llamadas de red bloqueantes
+        io_threads = workers if workers > 1 else DEFAULT_IO_THREADS
+        engine = AsyncUploadEngine(uploader, concurrency=args.concurrency, io_threads=io_threads)
+    if args.shared_queue and os.path.isdir(args.directory):
+        uploader.job_queue = JobQueue(Path(args.directory), ttl=args.lease_ttl, logger=uploader.logger)
+        uploader.logger.info(f"🤝 Cola compartida: trabajador {uploader.job_queue.worker}")
+    if not args.no_verify:
+        uploader.verifier = Verifier(uploader.progress, uploader.item_files,
+                                     uploader.file_verified, uploader.verification_failed,
+                                     logger=uploader.logger)
+        uploader.verifier.start()
+    try:
+        if args.watch:
+            uploader.watch_directory(args.directory, workers=workers, engine=engine,
+                                     settle=args.watch_settle, poll_interval=args.watch_poll)
+        else:
+            uploader.process_directory(args.directory, workers=workers, engine=engine)
+    finally:
+        if uploader.verifier is not None:
+            uploader.verifier.close(args.verify_wait)
+        if uploader.job_queue is not None:
+            uploader.job_queue.close()
+    try:
+        uploader.metrics.write(args.metrics_file, args.metrics_json)
+    except OSError as e:
+        uploader.logger.error(f"❌ Error escribiendo métricas: {e}")
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file
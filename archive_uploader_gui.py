@@ -14,18 +14,86 @@ import threading
 import queue
 import os
 import sys
+import logging
+from collections import deque
 from pathlib import Path
 from datetime import datetime
 import json
+from typing import NamedTuple, Optional
 
 # Importar nuestro uploader
 try:
     from archive_uploader import ArchiveUploader
+    from archive_async import AsyncUploadEngine
+    from archive_network import (AdaptiveConcurrency, BandwidthLimiter, ADAPTIVE_MAX_CONCURRENCY,
+                                 format_rate, parse_rate)
+    from archive_retry import RetryLater
+    from archive_filelist import ALL_TYPES, SIZE_FILTERS, FileListModel, VirtualFileList
+    from archive_verify import Verifier, VERIFY_WAIT
 except ImportError:
     print("Error: No se pudo importar archive_uploader.py")
     print("Asegúrate de que esté en el mismo directorio")
     sys.exit(1)
 
+# Registro de actividad: líneas en pantalla (anillo), frecuencia de vaciado e historial completo
+LOG_PANE_LINES = 2000
+LOG_POLL_MS = 200
+GUI_LOG_FILE = '.archive_gui.log'
+
+# Filtro de nivel del registro: etiqueta -> nivel mínimo mostrado
+LOG_LEVEL_FILTERS = {
+    'Todo': logging.INFO,
+    'Advertencias': logging.WARNING,
+    'Errores': logging.ERROR,
+}
+
+# Nivel deducido del emoji inicial cuando log() no lo recibe
+LOG_LEVEL_PREFIXES = (('❌', logging.ERROR), ('⚠️', logging.WARNING))
+
+# Frecuencia con la que la GUI lee el estado de la subida (10 cuadros por segundo)
+PROGRESS_FRAME_MS = 100
+
+# Filas que el escaneo entrega a la lista en cada llamada al hilo principal
+SCAN_BATCH_SIZE = 5000
+
+class ProgressState(NamedTuple):
+    """Estado inmutable de la subida en un instante"""
+    total: int = 0
+    completed: int = 0
+    success: int = 0
+    error: int = 0
+    status: Optional[str] = None  # None: "Completados: x/total"
+    concurrency: Optional[int] = None
+
+
+class ProgressSnapshot:
+    """Estado de la subida publicado por los hilos de trabajo
+
+    Cada cambio crea un ProgressState nuevo y sustituye la referencia; la
+    GUI lee `state` sin bloquear (una asignación de atributo es atómica)
+    y siempre ve un estado completo y coherente. El lock solo ordena a
+    los hilos que escriben entre sí.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = ProgressState()
+
+    def reset(self, total):
+        with self._lock:
+            self.state = ProgressState(total=total, concurrency=self.state.concurrency)
+
+    def publish(self, **changes):
+        with self._lock:
+            self.state = self.state._replace(**changes)
+
+    def add(self, **deltas):
+        """Sumar a los contadores, p. ej. add(completed=1, success=1)"""
+        with self._lock:
+            state = self.state
+            self.state = state._replace(**{name: getattr(state, name) + value
+                                           for name, value in deltas.items()})
+
 class ArchiveUploaderGUI:
     def __init__(self, root):
         self.root = root
@@ -43,13 +111,28 @@ class ArchiveUploaderGUI:
         self.list_name_var = tk.StringVar()
         self.add_to_list_var = tk.BooleanVar(value=False)
         self.threads_var = tk.StringVar(value="1")
+        self.async_engine_var = tk.BooleanVar(value=False)
+        self.bandwidth_var = tk.StringVar()
+        self.adaptive_var = tk.BooleanVar(value=False)
         self.progress_var = tk.StringVar(value="Listo para subir")
         self.auto_scan_var = tk.BooleanVar(value=True)
         self.dark_mode_var = tk.BooleanVar(value=False)
-        self.upload_stats = {"success": 0, "error": 0, "total": 0}
+        self.type_filter_var = tk.StringVar(value=ALL_TYPES)
+        self.size_filter_var = tk.StringVar(value=next(iter(SIZE_FILTERS)))
+        # Estado de la subida: los hilos publican, la GUI lo pinta a ritmo fijo
+        self.progress_snapshot = ProgressSnapshot()
+        self.shown_progress = self.progress_snapshot.state
+        
+        # Limitador compartido: los cambios se aplican a las subidas en curso
+        self.bandwidth_limiter = BandwidthLimiter()
+        self.bandwidth_var.trace_add('write', self.update_bandwidth_limit)
         
         # Cola para comunicación entre hilos
         self.log_queue = queue.Queue()
+        # Últimas líneas del registro (nivel, texto); el historial completo va a GUI_LOG_FILE
+        self.log_lines = deque(maxlen=LOG_PANE_LINES)
+        self.log_level_var = tk.StringVar(value=next(iter(LOG_LEVEL_FILTERS)))
+        self.log_file = None
         
         # Crear interfaz
         self.create_widgets()
@@ -138,30 +221,46 @@ class ArchiveUploaderGUI:
         threads_combo.grid(row=5, column=1, sticky=tk.W, padx=(5, 5), pady=5)
         ttk.Label(config_frame, text="(Menos = más responsivo)").grid(row=5, column=2, sticky=tk.W, pady=5)
         
+        # Motor de subida
+        ttk.Checkbutton(config_frame, text="⚡ Motor asíncrono (sesión HTTP compartida)",
+                       variable=self.async_engine_var).grid(row=6, column=0, columnspan=3, sticky=tk.W, pady=5)
+        
+        # Ancho de banda máximo
+        ttk.Label(config_frame, text="📶 Ancho de banda:").grid(row=7, column=0, sticky=tk.W, pady=5)
+        ttk.Entry(config_frame, textvariable=self.bandwidth_var, width=12).grid(row=7, column=1, sticky=tk.W, padx=(5, 5), pady=5)
+        ttk.Label(config_frame, text="(ej. 500K, 5M; vacío = sin límite, se aplica al instante)").grid(row=7, column=2, sticky=tk.W, pady=5)
+        
+        # Concurrencia adaptativa
+        ttk.Checkbutton(config_frame, text=f"🎚️ Concurrencia adaptativa (hasta {ADAPTIVE_MAX_CONCURRENCY} hilos, baja ante 503/429)",
+                       variable=self.adaptive_var).grid(row=8, column=0, columnspan=3, sticky=tk.W, pady=5)
+        
         # Sección de archivos
         files_frame = ttk.LabelFrame(main_frame, text="📋 Archivos Encontrados", padding="10")
         files_frame.grid(row=2, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
         files_frame.columnconfigure(0, weight=1)
-        files_frame.rowconfigure(0, weight=1)
-        
-        # Lista de archivos con scroll virtual para mejor rendimiento
-        self.files_tree = ttk.Treeview(files_frame, columns=("Tipo", "Tamaño"), show="tree headings", height=6)
-        self.files_tree.heading("#0", text="Archivo")
-        self.files_tree.heading("Tipo", text="Tipo")
-        self.files_tree.heading("Tamaño", text="Tamaño")
-        self.files_tree.column("#0", width=300)
-        self.files_tree.column("Tipo", width=100)
-        self.files_tree.column("Tamaño", width=100)
-        self.files_tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        
-        # Scrollbar para archivos
-        files_scrollbar = ttk.Scrollbar(files_frame, orient=tk.VERTICAL, command=self.files_tree.yview)
-        files_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        self.files_tree.configure(yscrollcommand=files_scrollbar.set)
+        files_frame.rowconfigure(1, weight=1)
+        
+        # Filtros por tipo y tamaño
+        filter_frame = ttk.Frame(files_frame)
+        filter_frame.grid(row=0, column=0, columnspan=2, sticky=tk.W, pady=(0, 5))
+        ttk.Label(filter_frame, text="Tipo:").pack(side=tk.LEFT)
+        self.type_filter_combo = ttk.Combobox(filter_frame, textvariable=self.type_filter_var,
+                                              values=[ALL_TYPES], state="readonly", width=10)
+        self.type_filter_combo.pack(side=tk.LEFT, padx=(5, 15))
+        ttk.Label(filter_frame, text="Tamaño:").pack(side=tk.LEFT)
+        ttk.Combobox(filter_frame, textvariable=self.size_filter_var, values=list(SIZE_FILTERS),
+                     state="readonly", width=15).pack(side=tk.LEFT, padx=(5, 0))
+        self.type_filter_var.trace_add('write', self.apply_files_filter)
+        self.size_filter_var.trace_add('write', self.apply_files_filter)
+        
+        # Lista de archivos virtual: solo existen como items las filas visibles
+        self.files_list = VirtualFileList(files_frame, FileListModel(), self.format_file_size)
+        self.files_list.tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.files_list.scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
         
         # Botones de archivos
         files_buttons_frame = ttk.Frame(files_frame)
-        files_buttons_frame.grid(row=1, column=0, columnspan=2, pady=(10, 0))
+        files_buttons_frame.grid(row=2, column=0, columnspan=2, pady=(10, 0))
         
         ttk.Button(files_buttons_frame, text="🔄 Escanear Directorio", 
                   command=self.scan_directory).pack(side=tk.LEFT, padx=(0, 5))
@@ -211,11 +310,21 @@ class ArchiveUploaderGUI:
         log_frame = ttk.LabelFrame(main_frame, text="📝 Registro de Actividad", padding="10")
         log_frame.grid(row=7, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(10, 0))
         log_frame.columnconfigure(0, weight=1)
-        log_frame.rowconfigure(0, weight=1)
-        
-        # Área de texto para log con altura reducida para mejor rendimiento
+        log_frame.rowconfigure(1, weight=1)
+        
+        # Filtro de nivel (solo afecta a la pantalla; el archivo guarda todo)
+        log_filter_frame = ttk.Frame(log_frame)
+        log_filter_frame.grid(row=0, column=0, sticky=tk.W, pady=(0, 5))
+        ttk.Label(log_filter_frame, text="Nivel:").pack(side=tk.LEFT)
+        ttk.Combobox(log_filter_frame, textvariable=self.log_level_var, values=list(LOG_LEVEL_FILTERS),
+                     state="readonly", width=12).pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Label(log_filter_frame, text=f"Últimas {LOG_PANE_LINES} líneas; historial completo en {GUI_LOG_FILE}",
+                  foreground="gray").pack(side=tk.LEFT, padx=(15, 0))
+        self.log_level_var.trace_add('write', self.refilter_log)
+        
+        # Área de texto para log: anillo de LOG_PANE_LINES líneas
         self.log_text = scrolledtext.ScrolledText(log_frame, height=6, wrap=tk.WORD)
-        self.log_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.log_text.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         
         # Configurar grid weights
         main_frame.rowconfigure(2, weight=1)
@@ -228,8 +337,9 @@ class ArchiveUploaderGUI:
         self.uploading = False
         self.upload_thread = None
         
-        # Iniciar procesamiento de log
+        # Iniciar procesamiento de log y lectura del progreso
         self.process_log_queue()
+        self.poll_progress()
     
     def create_status_bar(self, parent):
         """Crear barra de estado moderna"""
@@ -257,6 +367,10 @@ class ArchiveUploaderGUI:
         # Separador
         ttk.Separator(status_frame, orient=tk.VERTICAL).pack(side=tk.LEFT, padx=10, fill=tk.Y)
         
+        # Concurrencia actual
+        self.concurrency_label = ttk.Label(status_frame, text="🎚️ Concurrencia: -")
+        self.concurrency_label.pack(side=tk.LEFT)
+        
         # Versión
         version_label = ttk.Label(status_frame, text="v2.0 - Prabhupada Archive")
         version_label.pack(side=tk.RIGHT)
@@ -276,10 +390,40 @@ class ArchiveUploaderGUI:
             # Configurar colores claros
             self.root.configure(bg='#f0f0f0')
     
-    def update_stats(self):
-        """Actualizar estadísticas en la barra de estado"""
-        stats = self.upload_stats
-        self.stats_label.config(text=f"📊 ✅ {stats['success']} | ❌ {stats['error']} | 📁 {stats['total']}")
+    def update_bandwidth_limit(self, *args):
+        """Aplicar el ancho de banda escrito en el campo"""
+        try:
+            rate = parse_rate(self.bandwidth_var.get())
+        except ValueError:
+            return  # Valor a medio escribir; se aplica cuando sea válido
+        if rate != self.bandwidth_limiter.rate:
+            self.bandwidth_limiter.set_rate(rate)
+            self.log(f"📶 Ancho de banda máximo: {format_rate(rate)}")
+        
+    def on_concurrency_change(self, previous, limit, reason):
+        """Mostrar un ajuste del control adaptativo (llamado desde hilos de subida)"""
+        arrow = '⬆️' if limit > previous else '⬇️'
+        self.log(f"{arrow} Concurrencia {previous} -> {limit}: {reason}")
+        self.progress_snapshot.publish(concurrency=limit)
+        
+    def poll_progress(self):
+        """Pintar el último estado publicado (una vez por cuadro, solo si cambió)"""
+        state = self.progress_snapshot.state
+        if state is not self.shown_progress:
+            try:
+                self.render_progress(state, self.shown_progress)
+            except Exception:
+                pass
+            self.shown_progress = state
+        self.root.after(PROGRESS_FRAME_MS, self.poll_progress)
+        
+    def render_progress(self, state, previous):
+        """Actualizar barra, estado y estadísticas con un ProgressState"""
+        self.progress_bar.config(maximum=max(state.total, 1), value=state.completed)
+        self.progress_var.set(state.status or f"Completados: {state.completed}/{state.total}")
+        self.stats_label.config(text=f"📊 ✅ {state.success} | ❌ {state.error} | 📁 {state.total}")
+        if state.concurrency != previous.concurrency:
+            self.concurrency_label.config(text=f"🎚️ Concurrencia: {state.concurrency or '-'}")
         
     def update_files_count(self, count):
         """Actualizar contador de archivos"""
@@ -294,40 +438,68 @@ class ArchiveUploaderGUI:
         self.log("🎉 Interfaz iniciada correctamente")
         self.log("📋 Selecciona un directorio y autor para comenzar")
         
-    def log(self, message):
-        """Agregar mensaje al log"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        log_message = f"[{timestamp}] {message}\n"
-        
-        # Agregar a la cola para procesamiento seguro
-        self.log_queue.put(log_message)
-        
-        # Procesar mensajes pendientes
-        self.process_log_queue()
+    def log(self, message, level=None):
+        """Agregar mensaje al log (seguro desde cualquier hilo: solo encola)"""
+        if level is None:
+            level = next((value for prefix, value in LOG_LEVEL_PREFIXES if message.startswith(prefix)),
+                         logging.INFO)
+        self.log_queue.put((datetime.now(), level, message))
         
     def process_log_queue(self):
-        """Procesar mensajes de la cola de log"""
+        """Vaciar la cola de log: todo lo pendiente en una escritura a disco y una inserción"""
         try:
-            # Procesar máximo 5 mensajes por vez para mejor rendimiento
-            processed = 0
-            while processed < 5:
+            pending = []
+            while True:
                 try:
-                    message = self.log_queue.get_nowait()
-                    self.log_text.insert(tk.END, message)
-                    self.log_queue.task_done()
-                    processed += 1
+                    pending.append(self.log_queue.get_nowait())
                 except queue.Empty:
                     break
             
-            # Solo hacer scroll si se procesaron mensajes
-            if processed > 0:
-                self.log_text.see(tk.END)
+            if pending:
+                self.write_log_history(pending)
+                minimum = LOG_LEVEL_FILTERS.get(self.log_level_var.get(), logging.INFO)
+                shown = []
+                for timestamp, level, message in pending:
+                    line = f"[{timestamp:%H:%M:%S}] {message}\n"
+                    self.log_lines.append((level, line))
+                    if level >= minimum:
+                        shown.append(line)
+                if shown:
+                    self.append_log_text(shown[-LOG_PANE_LINES:])
                 
         except Exception as e:
             pass
         
-        # Programar siguiente verificación con frecuencia muy reducida
-        self.root.after(200, self.process_log_queue)
+        self.root.after(LOG_POLL_MS, self.process_log_queue)
+        
+    def write_log_history(self, entries):
+        """Guardar en GUI_LOG_FILE todas las líneas, sin límite ni filtro"""
+        try:
+            if self.log_file is None:
+                self.log_file = open(GUI_LOG_FILE, 'a', encoding='utf-8')
+            self.log_file.write(''.join(
+                f"{timestamp:%Y-%m-%d %H:%M:%S} - {logging.getLevelName(level)} - {message}\n"
+                for timestamp, level, message in entries))
+            self.log_file.flush()
+        except OSError:
+            pass  # Sin historial en disco; la pantalla sigue funcionando
+        
+    def append_log_text(self, lines):
+        """Insertar líneas de una vez y recortar el widget a LOG_PANE_LINES"""
+        follow = self.log_text.yview()[1] >= 1.0  # Solo seguir el final si ya se estaba viendo
+        self.log_text.insert(tk.END, ''.join(lines))
+        excess = int(self.log_text.index('end-1c').split('.')[0]) - 1 - LOG_PANE_LINES
+        if excess > 0:
+            self.log_text.delete('1.0', f'{excess + 1}.0')
+        if follow:
+            self.log_text.see(tk.END)
+        
+    def refilter_log(self, *args):
+        """Repintar el registro con el nivel elegido a partir del anillo en memoria"""
+        minimum = LOG_LEVEL_FILTERS.get(self.log_level_var.get(), logging.INFO)
+        self.log_text.delete('1.0', tk.END)
+        self.append_log_text([line for level, line in self.log_lines if level >= minimum])
+        self.log_text.see(tk.END)
         
     def check_configuration(self):
         """Verificar configuración de Archive.org"""
@@ -384,27 +556,13 @@ class ArchiveUploaderGUI:
                 uploader = ArchiveUploader(self.author_var.get() or "Autor", collection_to_use, list_name)
                 files = uploader.scan_directory(Path(directory))
                 
-                files_found = 0
-                # Procesar archivos en lotes más pequeños para mejor rendimiento
-                batch_size = 5
-                for i in range(0, len(files), batch_size):
-                    batch = files[i:i+batch_size]
-                    
-                    for file_path in batch:
-                        # Obtener información del archivo
-                        file_size = os.path.getsize(file_path)
-                        file_size_str = self.format_file_size(file_size)
-                        file_type = uploader.get_mediatype(file_path)
-                        
-                        # Insertar en la lista en el hilo principal
-                        self.root.after(0, lambda fp=file_path, ft=file_type, fs=file_size_str: 
-                            self.files_tree.insert("", tk.END, text=fp.name, values=(ft, fs)))
-                        files_found += 1
-                    
-                    # Permitir que la GUI procese eventos entre lotes
-                    self.root.after(0, lambda: self.root.update_idletasks())
-                    import time
-                    time.sleep(0.05)  # Pausa más larga para mejor responsividad
+                files_found = len(files)
+                # Entregar las filas en bloques: una llamada al hilo principal por bloque
+                for i in range(0, files_found, SCAN_BATCH_SIZE):
+                    rows = [(file_path, uploader.get_mediatype(file_path), uploader.scanned_size(file_path))
+                            for file_path in files[i:i + SCAN_BATCH_SIZE]]
+                    self.root.after(0, lambda rows=rows: self.files_list.extend(rows))
+                self.root.after(0, self.update_type_filter)
                     
                 # Actualizar log en el hilo principal
                 self.root.after(0, lambda: self.log(f"✅ Encontrados {files_found} archivos"))
@@ -422,8 +580,23 @@ class ArchiveUploaderGUI:
             
     def clear_files_list(self):
         """Limpiar lista de archivos"""
-        for item in self.files_tree.get_children():
-            self.files_tree.delete(item)
+        self.files_list.clear()
+        self.update_files_count(0)
+        
+    def update_type_filter(self):
+        """Ofrecer en el filtro los tipos presentes en la lista"""
+        self.type_filter_combo.configure(values=[ALL_TYPES] + self.files_list.model.types_seen())
+        
+    def apply_files_filter(self, *args):
+        """Aplicar los filtros de tipo y tamaño a la lista"""
+        mediatype = self.type_filter_var.get()
+        size_range = SIZE_FILTERS.get(self.size_filter_var.get(), (None, None))
+        self.files_list.set_filter(None if mediatype == ALL_TYPES else mediatype, size_range)
+        model = self.files_list.model
+        if len(model) != model.total:
+            self.files_label.config(text=f"📁 {len(model)} de {model.total} archivos")
+        else:
+            self.update_files_count(model.total)
             
     def format_file_size(self, size_bytes):
         """Formatear tamaño de archivo"""
@@ -465,7 +638,7 @@ class ArchiveUploaderGUI:
                 return
                 
             # Verificar que hay archivos en la lista
-            files_count = len(self.files_tree.get_children())
+            files_count = self.files_list.model.total
             self.log(f"📋 Archivos en lista: {files_count}")
             
             if files_count == 0:
@@ -522,7 +695,9 @@ class ArchiveUploaderGUI:
                 self.log(f"📋 Agregando items a lista: {list_name}")
             
             # Crear uploader
-            uploader = ArchiveUploader(author, collection_to_use, list_name)
+            uploader = ArchiveUploader(author, collection_to_use, list_name,
+                                       bandwidth=self.bandwidth_limiter)
+            uploader.recover_dispositions()
             
             # Escanear archivos
             files = uploader.scan_directory(Path(directory))
@@ -534,100 +709,123 @@ class ArchiveUploaderGUI:
                 
             self.log(f"📋 Procesando {total_files} archivos")
             
-            # Configurar barra de progreso
-            self.root.after(0, lambda: self.progress_bar.config(maximum=total_files))
-            
-            # Variables compartidas para conteo
-            from threading import Lock
-            success_count = 0
-            error_count = 0
-            completed_count = 0
-            lock = Lock()
+            # Comprobar en bloque qué items ya existen en Archive.org
+            found = uploader.preflight(files)
+            if found:
+                self.log(f"🌐 {found} archivos ya existen en Archive.org y se omitirán")
             
-            # Resetear estadísticas
-            self.upload_stats = {"success": 0, "error": 0, "total": total_files}
-            self.root.after(0, self.update_stats)
+            # Leer etiquetas, duración y páginas en paralelo antes de subir
+            self.log("🏷️ Leyendo metadatos embebidos...")
+            try:
+                extracted = uploader.extract_media_metadata(files)
+            finally:
+                uploader.metadata_extractor.close()
+            self.log(f"🏷️ Metadatos leídos de {extracted} archivos")
+            
+            # Cada subida se verifica (tamaño y MD5) en Archive.org antes de mover el archivo
+            uploader.verifier = Verifier(uploader.progress, uploader.item_files,
+                                         uploader.file_verified, uploader.verification_failed,
+                                         logger=uploader.logger)
+            uploader.verifier.start()
+            
+            # Barra, estado y estadísticas parten de cero; la GUI los lee de la instantánea
+            progress = self.progress_snapshot
+            progress.reset(total_files)
+            
+            def record_result(file_path, ok):
+                if ok:
+                    progress.add(completed=1, success=1)
+                    self.log(f"✅ Subido exitosamente: {file_path.name}")
+                else:
+                    progress.add(completed=1, error=1)
+                    self.log(f"❌ Error subiendo: {file_path.name}")
             
             def upload_single_file(file_path, file_index):
-                nonlocal success_count, error_count, completed_count
+                if not self.uploading:  # Verificar si se canceló
+                    return 0, 0
+                    
+                self.log(f"📤 Subiendo {file_index+1}/{total_files}: {file_path.name}")
                 
                 try:
-                    if not self.uploading:  # Verificar si se canceló
-                        return
-                        
-                    self.log(f"📤 Subiendo {file_index+1}/{total_files}: {file_path.name}")
-                    
-                    # Subir archivo
-                    if uploader.upload_file(file_path):
-                        with lock:
-                            success_count += 1
-                            self.upload_stats["success"] += 1
-                        self.log(f"✅ Subido exitosamente: {file_path.name}")
-                        # Actualizar stats solo ocasionalmente para mejor rendimiento
-                        if success_count % 5 == 0:
-                            self.root.after(0, self.update_stats)
-                    else:
-                        with lock:
-                            error_count += 1
-                            self.upload_stats["error"] += 1
-                        self.log(f"❌ Error subiendo: {file_path.name}")
-                        # Actualizar stats solo ocasionalmente para mejor rendimiento
-                        if error_count % 5 == 0:
-                            self.root.after(0, self.update_stats)
-                        
+                    ok = uploader.upload_file(file_path, requeue=True)
+                except RetryLater as e:
+                    # Vuelve a la cola sin bloquear este hilo
+                    self.log(f"🔁 {file_path.name}: {e}")
+                    raise
                 except Exception as e:
-                    with lock:
-                        error_count += 1
                     self.log(f"❌ Error subiendo {file_path.name}: {e}")
-                finally:
-                    with lock:
-                        completed_count += 1
-                    
-                    # Actualizar progreso en el hilo principal (muy poco frecuente)
-                    if completed_count % 10 == 0 or completed_count == total_files:
-                        self.root.after(0, lambda: self.progress_bar.config(value=completed_count))
-                        self.root.after(0, lambda: self.progress_var.set(f"Completados: {completed_count}/{total_files}"))
+                    ok = False
+                record_result(file_path, ok)
+                return (1, 0) if ok else (0, 1)
             
             # Determinar número de hilos desde la configuración
             try:
                 max_threads = min(int(self.threads_var.get()), 5, total_files)
             except ValueError:
                 max_threads = min(3, total_files)  # Default a 3 si hay error
-            self.log(f"🔄 Usando {max_threads} hilos para subida paralela")
-            
-            # Crear pool de hilos
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor(max_workers=max_threads) as executor:
-                # Enviar todos los archivos al pool
-                futures = []
-                for i, file_path in enumerate(files):
-                    if not self.uploading:
-                        break
-                    future = executor.submit(upload_single_file, file_path, i)
-                    futures.append(future)
+            
+            if self.adaptive_var.get():
+                # El control adaptativo parte de los hilos elegidos y decide cuántos suben a la vez
+                initial = max_threads
+                max_threads = min(ADAPTIVE_MAX_CONCURRENCY, total_files)
+                uploader.concurrency = AdaptiveConcurrency(initial=initial, maximum=max_threads,
+                                                           on_change=self.on_concurrency_change)
+                self.log(f"🎚️ Concurrencia adaptativa: empieza en {initial}, máximo {max_threads}")
+            progress.publish(concurrency=uploader.concurrency.limit if uploader.concurrency else max_threads)
+            
+            if self.async_engine_var.get():
+                # Motor asyncio: los hilos elegidos solo atienden las llamadas de red
+                engine = AsyncUploadEngine(uploader, io_threads=max_threads)
+                self.log(f"⚡ Motor asíncrono con {max_threads} hilos de E/S")
+                engine.upload_files(files, on_result=record_result,
+                                    should_stop=lambda: not self.uploading)
+            else:
+                self.log(f"🔄 Usando {max_threads} hilos para subida paralela")
                 
-                # Esperar a que todos terminen con timeout para evitar bloqueos
-                for future in concurrent.futures.as_completed(futures, timeout=1):
-                    if not self.uploading:
-                        break
-                    try:
-                        future.result(timeout=30)  # Timeout de 30 segundos por archivo
-                    except concurrent.futures.TimeoutError:
-                        self.log(f"⏰ Timeout en subida de archivo")
-                    except Exception as e:
-                        self.log(f"❌ Error en hilo de subida: {e}")
+                # Pool de hilos del uploader: los reintentos vuelven a la cola
+                jobs = (lambda file_path=file_path, i=i: upload_single_file(file_path, i)
+                        for i, file_path in enumerate(files))
+                uploader.run_jobs(jobs, max_threads,
+                                  should_stop=lambda: not self.uploading)
+            
+            # Leído una vez: el estado final no debe cambiar si se detiene durante la verificación
+            stopped = not self.uploading
+            
+            # Esperar a las verificaciones pendientes (no si el usuario detuvo la subida)
+            pending = uploader.verifier.backlog()
+            wait = 0 if stopped else VERIFY_WAIT
+            if pending and wait:
+                self.log(f"🔎 Verificando {pending} archivos en Archive.org (hasta {wait:g}s)...")
+                progress.publish(status=f"Verificando {pending} archivos...")
+            uploader.verifier.close(wait)
+            pending = uploader.verifier.backlog()
+            if pending:
+                self.log(f"⏳ {pending} archivos siguen pendientes de verificar; "
+                         f"se comprobarán en la próxima subida")
             
             # Finalizar
-            self.root.after(0, lambda: self.progress_bar.config(value=total_files))
-            self.root.after(0, lambda: self.progress_var.set(f"Completado: {success_count} exitosos, {error_count} errores"))
-            
-            self.log(f"🎉 Proceso completado:")
+            state = progress.state
+            success_count, error_count = state.success, state.error
+            if stopped:
+                # Tras una cancelación se conserva el estado detenido con lo que llegó a subirse
+                progress.publish(status=f"Detenido por usuario: {success_count} exitosos, "
+                                        f"{error_count} errores de {total_files}")
+                self.log(f"⏹️ Subida detenida:")
+            else:
+                progress.publish(completed=total_files,
+                                 status=f"Completado: {success_count} exitosos, {error_count} errores")
+                self.log(f"🎉 Proceso completado:")
             self.log(f"  ✅ Exitosos: {success_count}")
             self.log(f"  ❌ Errores: {error_count}")
             self.log(f"  📁 Total: {total_files}")
             
             # Mostrar mensaje final
-            if error_count == 0:
+            if stopped:
+                self.root.after(0, lambda: messagebox.showinfo("Detenido", 
+                    f"Subida detenida por el usuario.\n"
+                    f"Exitosos: {success_count}\n"
+                    f"Errores: {error_count}"))
+            elif error_count == 0:
                 self.root.after(0, lambda: messagebox.showinfo("Completado", 
                     f"Subida completada exitosamente!\n"
                     f"Archivos subidos: {success_count}"))
@@ -660,7 +858,7 @@ class ArchiveUploaderGUI:
         if self.uploading:
             self.uploading = False
             self.log("⏹️ Deteniendo subida...")
-            self.progress_var.set("Detenido por usuario")
+            self.progress_snapshot.publish(status="Detenido por usuario")
             self.enable_heavy_operations()
         else:
             messagebox.showinfo("Info", "No hay subida en progreso")
@@ -710,7 +908,7 @@ class ArchiveUploaderGUI:
             self.log(f"👤 Autor en GUI: {author}")
             
             # Probar lista de archivos
-            files_count = len(self.files_tree.get_children())
+            files_count = self.files_list.model.total
             self.log(f"📋 Archivos en lista: {files_count}")
             
             # Probar estado de botones
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+"""
+Verificación Posterior a la Subida
+==================================
+
+Una respuesta 200 solo dice que Archive.org aceptó el cuerpo de la
+subida; la verificación confirma que el archivo quedó en el item con el
+tamaño y el MD5 locales. Cada subida aceptada deja una fila en la tabla
+`verifications` del almacén de progreso (el atraso de verificación) y el
+archivo local se queda donde está. Un hilo aparte toma por tandas las
+filas que tocan, pide la lista de archivos de cada item una sola vez
+aunque tenga muchos pendientes, y compara:
+
+    coincide        -> verificado: el archivo se libera para moverlo
+    aún no aparece  -> se vuelve a mirar más tarde, con espera creciente
+    no coincide     -> error: el archivo sigue en su sitio y se vuelve a subir
+
+Archive.org tarda de segundos a horas en procesar una subida, así que lo
+que quede pendiente al terminar sigue en el almacén y se verifica en la
+siguiente ejecución.
+"""
+
+import concurrent.futures
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Archivos por tanda de verificación
+VERIFY_BATCH_SIZE = 200
+
+# Segundos entre tandas del hilo de verificación
+VERIFY_INTERVAL = 30.0
+
+# Espera antes de la primera comprobación y tope de la espera creciente
+VERIFY_FIRST_DELAY = 15.0
+VERIFY_MAX_DELAY = 3600.0
+
+# Consultas de metadatos simultáneas
+VERIFY_WORKERS = 4
+
+# Segundos que se espera al terminar a que se vacíe el atraso
+VERIFY_WAIT = 120.0
+
+
+def compare_listing(row: Dict, listing: Dict[str, Dict]) -> Tuple[Optional[bool], str]:
+    """Comparar una fila pendiente con la lista de archivos del item
+
+    Devuelve (True, '') si coincide, (None, motivo) si aún no se puede
+    saber y (False, motivo) si el archivo remoto es distinto.
+    """
+    remote = listing.get(row['key'])
+    if remote is None:
+        return None, 'aún no aparece en el item'
+    if not remote.get('md5') or remote.get('size') is None:
+        return None, 'el item aún no tiene su tamaño y MD5'
+    if int(remote['size']) != row['size']:
+        return False, f"tamaño remoto {remote['size']} != local {row['size']}"
+    if remote['md5'] != row['md5']:
+        return False, f"MD5 remoto {remote['md5']} != local {row['md5']}"
+    return True, ''
+
+
+class Verifier:
+    """Atraso de verificación en el almacén, vaciado por tandas en un hilo aparte"""
+
+    def __init__(self, store, fetch_files: Callable[[str], List[Dict]],
+                 on_verified: Callable[[str, Dict], None],
+                 on_failed: Callable[[str, Dict, str], None],
+                 batch_size: int = VERIFY_BATCH_SIZE, interval: float = VERIFY_INTERVAL,
+                 workers: int = VERIFY_WORKERS, logger=None):
+        self.store = store
+        self.fetch_files = fetch_files
+        self.on_verified = on_verified
+        self.on_failed = on_failed
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self.workers = max(1, workers)
+        self.logger = logger
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Una sola tanda a la vez (el hilo y close() no deben comprobar lo mismo dos veces)
+        self._batch_lock = threading.Lock()
+
+    def _log(self, level: str, message: str):
+        if self.logger:
+            getattr(self.logger, level)(message)
+
+    def start(self):
+        pending = self.backlog()
+        if pending:
+            self._log('info', f"🔎 {pending} archivos pendientes de verificar de ejecuciones anteriores")
+        self._thread = threading.Thread(target=self._loop, daemon=True, name='verifier')
+        self._thread.start()
+
+    def backlog(self) -> int:
+        return self.store.count_verifications()
+
+    def queue(self, path: str, identifier: str, key: str, size: int, md5: str):
+        """Anotar una subida aceptada; el archivo no se libera hasta verificarla"""
+        self.store.queue_verification(path, identifier, key, size, md5, time.time() + VERIFY_FIRST_DELAY)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            # Mientras salgan tandas llenas hay más atraso vencido
+            while not self._stop.is_set() and self.verify_batch() >= self.batch_size:
+                pass
+
+    def _listing(self, identifier: str) -> Dict[str, Dict]:
+        return {entry['name']: entry for entry in self.fetch_files(identifier) if 'name' in entry}
+
+    def verify_batch(self, due_only: bool = True) -> int:
+        """Comprobar una tanda del atraso; devuelve cuántas filas se miraron"""
+        with self._batch_lock:
+            try:
+                rows = self.store.due_verifications(self.batch_size, time.time() if due_only else None)
+            except Exception as e:
+                self._log('error', f"❌ Error leyendo el atraso de verificación: {e}")
+                return 0
+            if not rows:
+                return 0
+
+            by_item: Dict[str, List[Dict]] = {}
+            for row in rows:
+                by_item.setdefault(row['identifier'], []).append(row)
+
+            verified, failed, postponed = [], [], []
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.workers, len(by_item)),
+                                                       thread_name_prefix='verify') as executor:
+                listings = {executor.submit(self._listing, identifier): identifier for identifier in by_item}
+                for future in concurrent.futures.as_completed(listings):
+                    identifier = listings[future]
+                    try:
+                        listing = future.result()
+                    except Exception as e:
+                        self._log('warning', f"⚠️ No se pudo leer la lista de archivos de {identifier}: {e}")
+                        postponed.extend((row, str(e)) for row in by_item[identifier])
+                        continue
+                    for row in by_item[identifier]:
+                        match, reason = compare_listing(row, listing)
+                        if match:
+                            verified.append(row)
+                        elif match is None:
+                            postponed.append((row, reason))
+                        else:
+                            failed.append((row, reason))
+
+            # La fila se borra solo después de anotar el resultado: si el proceso muere
+            # entre medias, la próxima ejecución vuelve a verificar el archivo
+            finished = []
+            for row in verified:
+                if self._notify(self.on_verified, row['path'], row):
+                    finished.append(row['path'])
+                else:
+                    postponed.append((row, 'error al liberar el archivo'))
+            for row, reason in failed:
+                if self._notify(self.on_failed, row['path'], row, reason):
+                    finished.append(row['path'])
+                else:
+                    postponed.append((row, reason))
+
+            now = time.time()
+            self.store.postpone_verifications([
+                (now + min(VERIFY_FIRST_DELAY * 2 ** (row['attempts'] + 1), VERIFY_MAX_DELAY), reason, row['path'])
+                for row, reason in postponed])
+            self.store.finish_verifications(finished)
+        if verified or failed:
+            self._log('info', f"🔎 Verificación: {len(verified)} correctos, {len(failed)} fallidos, "
+                              f"{len(postponed)} aún pendientes")
+        return len(rows)
+
+    def _notify(self, callback: Callable, *args) -> bool:
+        try:
+            callback(*args)
+            return True
+        except Exception as e:
+            self._log('error', f"❌ Error tras verificar {args[0]}: {e}")
+            return False
+
+    def close(self, wait: float = VERIFY_WAIT):
+        """Parar el hilo y seguir comprobando hasta `wait` segundos lo que quede
+
+        Al terminar se mira todo el atraso, no solo lo vencido, con una
+        pasada cada VERIFY_FIRST_DELAY segundos; lo que siga pendiente se
+        queda en el almacén para la próxima ejecución.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        deadline = time.monotonic() + wait
+        pending = self.backlog()
+        if pending and wait > 0:
+            self._log('info', f"🔎 Esperando hasta {wait:g}s para verificar {pending} archivos...")
+        while pending and time.monotonic() < deadline:
+            checked = 0
+            while checked < pending:
+                looked = self.verify_batch(due_only=False)
+                if not looked:
+                    break
+                checked += looked
+            pending = self.backlog()
+            if pending:
+                time.sleep(max(0.0, min(VERIFY_FIRST_DELAY, deadline - time.monotonic())))
+        if pending:
+            self._log('warning', f"⏳ {pending} archivos siguen pendientes de verificar; "
+                                 f"se comprobarán en la próxima ejecución")
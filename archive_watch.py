@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+
+"""
+Vigilancia de Directorios
+=========================
+
+Detecta los archivos nuevos que aparecen bajo el directorio de origen y
+los entrega cuando dejan de crecer, sin volver a escanear todo el árbol.
+
+En Linux se usa inotify (vía ctypes, sin dependencias): un watch por
+directorio y eventos de creación, escritura y renombrado. Donde no hay
+inotify (macOS, Windows) o se pide sondeo (NFS/SMB, donde los cambios
+remotos no generan eventos), cada intervalo se hace stat de los
+directorios y solo se listan los que cambiaron de mtime.
+
+Un archivo se entrega cuando su tamaño y mtime no cambian durante
+`settle` segundos, así que las copias en curso no se suben a medias.
+Los archivos que ya existían al empezar no se entregan: de ellos se
+encarga el escaneo normal. Lo entregado se recuerda solo hasta que el
+archivo termina (forget) o desaparece, así que la memoria no crece con
+el tiempo que lleve vigilando.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from archive_scanner import EXCLUDED_DIRS, MANIFEST_RACY_SECONDS, IgnoreRules
+
+# Segundos que un archivo debe quedar sin cambios antes de entregarse
+WATCH_SETTLE_SECONDS = 5.0
+
+# Intervalo del sondeo cuando no hay inotify
+WATCH_POLL_SECONDS = 2.0
+
+# Cada cuánto se revisan los archivos pendientes y la señal de parada
+WATCH_TICK_SECONDS = 0.5
+
+# Constantes de <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+INOTIFY_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+                IN_DELETE | IN_DELETE_SELF)
+
+_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len
+_READ_SIZE = 64 * 1024
+
+
+class Inotify:
+    """Envoltorio mínimo de inotify con ctypes (solo Linux)"""
+
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify solo existe en Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self.directories: Dict[int, str] = {}
+
+    def add(self, directory: str):
+        """Vigilar un directorio; OSError si no se puede (p. ej. ENOSPC: sin watches libres)"""
+        wd = self._add_watch(self.fd, os.fsencode(directory), INOTIFY_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), directory)
+        self.directories[wd] = directory
+
+    def read(self, timeout: float) -> List[Tuple[Optional[str], Optional[str], int]]:
+        """Eventos pendientes como (directorio, nombre, máscara); espera hasta `timeout`"""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            data = os.read(self.fd, _READ_SIZE)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0')) if length else None
+            offset += length
+            if mask & IN_IGNORED:
+                # El watch desapareció (directorio borrado o movido fuera)
+                self.directories.pop(wd, None)
+                continue
+            events.append((self.directories.get(wd), name, mask))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class DirectoryWatcher:
+    """Entrega por lotes los archivos nuevos y estables bajo `root`"""
+
+    def __init__(self, root: Path, extensions: Iterable[str],
+                 excluded_dirs: Iterable[str] = EXCLUDED_DIRS,
+                 ignore: Optional[IgnoreRules] = None,
+                 settle: float = WATCH_SETTLE_SECONDS,
+                 poll_interval: Optional[float] = None,
+                 logger=None):
+        self.root = str(root)
+        self.extensions = frozenset(extensions)
+        self.excluded_dirs = frozenset(excluded_dirs)
+        self.ignore = ignore
+        self.settle = settle
+        self.poll_interval = poll_interval or WATCH_POLL_SECONDS
+        self.logger = logger
+        self.backend = 'polling'
+        self._inotify: Optional[Inotify] = None
+        # Sondeo: directorio relativo -> (mtime_ns, archivos, subdirectorios)
+        self._dirs: Dict[str, Tuple[int, Set[str], List[str]]] = {}
+        self._last_poll = 0.0
+        # Archivos vistos cambiar: ruta -> (firma, desde cuándo no cambia)
+        self._pending: Dict[str, Tuple[Tuple[int, int], float]] = {}
+        # Firma con la que se entregó cada archivo aún en curso (forget() o su desaparición lo quitan)
+        self._delivered: Dict[str, Tuple[int, int]] = {}
+
+        if poll_interval is None:
+            try:
+                self._inotify = Inotify()
+                self.backend = 'inotify'
+            except (OSError, AttributeError) as e:
+                self._log('info', f"👀 inotify no disponible ({e}); se usará sondeo")
+
+    def _log(self, level: str, message: str):
+        if self.logger:
+            getattr(self.logger, level)(message)
+
+    # Filtros (los mismos que el escáner)
+
+    def _relative(self, path: str) -> str:
+        rel = os.path.relpath(path, self.root)
+        return '' if rel == '.' else rel
+
+    def _wanted_dir(self, rel_path: str, name: str) -> bool:
+        if name in self.excluded_dirs:
+            return False
+        return not (self.ignore and self.ignore.match(rel_path.replace(os.sep, '/'), name, True))
+
+    def _wanted_file(self, rel_path: str, name: str) -> bool:
+        if os.path.splitext(name)[1].lower() not in self.extensions:
+            return False
+        return not (self.ignore and self.ignore.match(rel_path.replace(os.sep, '/'), name, False))
+
+    def _list(self, rel_dir: str) -> Optional[Tuple[int, Set[str], List[str]]]:
+        """(mtime_ns, archivos, subdirectorios) de un directorio, o None si ya no existe"""
+        directory = os.path.join(self.root, rel_dir) if rel_dir else self.root
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+            with os.scandir(directory) as it:
+                entries = list(it)
+        except OSError:
+            return None
+        if time.time() - mtime_ns / 1e9 < MANIFEST_RACY_SECONDS:
+            mtime_ns = -1  # Demasiado reciente: volver a listarlo en el próximo sondeo
+        files, subdirs = set(), []
+        for entry in entries:
+            rel_path = os.path.join(rel_dir, entry.name)
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if self._wanted_dir(rel_path, entry.name):
+                        subdirs.append(entry.name)
+                elif self._wanted_file(rel_path, entry.name) and entry.is_file():
+                    files.add(entry.name)
+            except OSError:
+                continue
+        return mtime_ns, files, sorted(subdirs)
+
+    # Arranque
+
+    def start(self):
+        """Registrar el estado actual; solo lo que aparezca después se entregará"""
+        if self._inotify is not None:
+            try:
+                self._add_tree('', announce=False)
+                return
+            except OSError as e:
+                self._log('warning', f"⚠️ No se pudo vigilar con inotify ({e}); se usará sondeo")
+                self._inotify.close()
+                self._inotify = None
+                self.backend = 'polling'
+        self._snapshot_tree('', announce=False)
+        self._last_poll = time.monotonic()
+
+    def _add_tree(self, rel_dir: str, announce: bool):
+        """Poner watches en un árbol; con announce, sus archivos cuentan como nuevos"""
+        stack = [rel_dir]
+        while stack:
+            rel = stack.pop()
+            directory = os.path.join(self.root, rel) if rel else self.root
+            # El watch va antes del listado: lo creado entre ambos genera evento
+            try:
+                self._inotify.add(directory)
+            except FileNotFoundError:
+                continue
+            listing = self._list(rel)
+            if listing is None:
+                continue
+            _, files, subdirs = listing
+            if announce:
+                for name in files:
+                    self._touch(os.path.join(directory, name))
+            stack.extend(os.path.join(rel, name) for name in subdirs)
+
+    def _snapshot_tree(self, rel_dir: str, announce: bool):
+        stack = [rel_dir]
+        while stack:
+            rel = stack.pop()
+            listing = self._list(rel)
+            if listing is None:
+                continue
+            self._dirs[rel] = listing
+            if announce:
+                directory = os.path.join(self.root, rel) if rel else self.root
+                for name in listing[1]:
+                    self._touch(os.path.join(directory, name))
+            stack.extend(os.path.join(rel, name) for name in listing[2])
+
+    # Detección
+
+    def _touch(self, path: str):
+        """Un archivo cambió: reiniciar su espera si su firma es nueva"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._gone(path)
+            return
+        signature = (stat.st_size, stat.st_mtime_ns)
+        current = self._pending.get(path)
+        if current is None or current[0] != signature:
+            self._pending[path] = (signature, time.monotonic())
+
+    def _handle_events(self, events: List[Tuple[Optional[str], Optional[str], int]]):
+        for directory, name, mask in events:
+            if mask & IN_Q_OVERFLOW:
+                # Se perdieron eventos: revisar todo el árbol una vez
+                self._log('warning', "⚠️ Cola de inotify desbordada; revisando el árbol completo")
+                self._watch_new('')
+                continue
+            if directory is None or name is None:
+                continue
+            path = os.path.join(directory, name)
+            rel_path = self._relative(path)
+            if mask & IN_ISDIR:
+                # Solo hay watches en directorios aceptados, así que basta mirar este nombre
+                if mask & (IN_CREATE | IN_MOVED_TO) and self._wanted_dir(rel_path, name):
+                    self._watch_new(rel_path)
+                continue
+            if mask & (IN_MOVED_FROM | IN_DELETE):
+                self._gone(path)
+            elif self._wanted_file(rel_path, name):
+                self._touch(path)
+
+    def _watch_new(self, rel_dir: str):
+        try:
+            self._add_tree(rel_dir, announce=True)
+        except OSError as e:
+            self._log('warning', f"⚠️ No se pudo vigilar {rel_dir or self.root}: {e}")
+
+    def _poll(self):
+        """Sondeo: stat de cada directorio y listado solo de los que cambiaron"""
+        for rel_dir in list(self._dirs):
+            entry = self._dirs.get(rel_dir)
+            if entry is None:
+                continue
+            directory = os.path.join(self.root, rel_dir) if rel_dir else self.root
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                del self._dirs[rel_dir]
+                continue
+            if mtime_ns == entry[0]:
+                continue
+            listing = self._list(rel_dir)
+            if listing is None:
+                del self._dirs[rel_dir]
+                continue
+            self._dirs[rel_dir] = listing
+            for name in listing[1] - entry[1]:
+                self._touch(os.path.join(directory, name))
+            for name in entry[1] - listing[1]:
+                self._gone(os.path.join(directory, name))
+            for name in set(listing[2]) - set(entry[2]):
+                self._snapshot_tree(os.path.join(rel_dir, name), announce=True)
+
+    def _settled(self) -> List[Path]:
+        """Archivos pendientes cuya firma no cambió durante `settle` segundos"""
+        now = time.monotonic()
+        ready = []
+        for path, (signature, since) in list(self._pending.items()):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                self._gone(path)  # Borrado o movido antes de estabilizarse
+                continue
+            current = (stat.st_size, stat.st_mtime_ns)
+            if current != signature:
+                self._pending[path] = (current, now)
+            elif now - since >= self.settle:
+                del self._pending[path]
+                if self._delivered.get(path) != signature:
+                    self._delivered[path] = signature
+                    ready.append(Path(path))
+        return sorted(ready)
+
+    def _gone(self, path: str):
+        """El archivo ya no está (borrado o movido, p. ej. a Uploaded): olvidarlo"""
+        self._pending.pop(path, None)
+        self._delivered.pop(path, None)
+
+    def forget(self, path: Path):
+        """Un archivo entregado terminó (subido o con error); si vuelve a cambiar se entregará de nuevo
+
+        Se puede llamar desde otro hilo: solo quita una clave del diccionario.
+        """
+        self._delivered.pop(str(path), None)
+
+    def watch(self, should_stop: Optional[Callable[[], bool]] = None) -> Iterator[List[Path]]:
+        """Generar lotes de archivos nuevos y estables hasta que should_stop() sea verdadero"""
+        while not (should_stop and should_stop()):
+            if self._inotify is not None:
+                self._handle_events(self._inotify.read(WATCH_TICK_SECONDS))
+            else:
+                wait = self._last_poll + self.poll_interval - time.monotonic()
+                if wait > 0:
+                    time.sleep(min(wait, WATCH_TICK_SECONDS))
+                else:
+                    self._poll()
+                    self._last_poll = time.monotonic()
+            ready = self._settled()
+            if ready:
+                yield ready
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
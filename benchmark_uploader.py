@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark de las Rutas Locales del Uploader
+===========================================
+
+Mide, sin red, las partes del uploader que dependen solo del disco y la
+CPU: escaneo, identificadores, metadatos, almacén de progreso y mover a
+"Uploaded". Genera un árbol sintético (archivos vacíos con nombres
+acentuados) en disposición ancha (pocos directorios con muchos archivos)
+o profunda (muchos niveles con pocos archivos) y escribe los resultados
+en JSON para comparar versiones en CI.
+
+Abrir el almacén de progreso y consultarlo se mide dos veces: en frío,
+en un proceso nuevo tras pedir al sistema que descarte de su caché las
+páginas de la base (posix_fadvise, donde existe), y en caliente, en el
+mismo proceso que acaba de escribirla (sufijos _cold y _warm).
+
+Uso:
+    python benchmark_uploader.py --files 10000 --layout both --output bench.json
+    python benchmark_uploader.py --files 1000000 --layout wide
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from archive_store import PROGRESS_DB
+from archive_uploader import ArchiveUploader, SUPPORTED_EXTENSIONS
+
+LAYOUTS = ('wide', 'deep')
+
+# Archivos por directorio en la disposición ancha
+WIDE_FILES_PER_DIR = 1000
+
+# Ramas por nivel y archivos por hoja en la disposición profunda
+DEEP_BRANCHING = 4
+DEEP_FILES_PER_LEAF = 50
+
+# Las operaciones por archivo que escriben en disco se miden sobre una muestra
+SAMPLE_SIZE = 10000
+
+AUTHOR = 'Śrīla Prabhupāda'
+NAMES = ['Bhagavad Gītā', 'Śrīmad Bhāgavatam', 'Kṛṣṇa Kathā', 'Canción del Niño',
+         'Conferencia_Mañana', 'Über die Seele', 'Caitanya-caritāmṛta', 'Diálogo']
+EXTENSIONS = [ext for extensions in SUPPORTED_EXTENSIONS.values() for ext in extensions]
+
+
+def tree_paths(count: int, layout: str) -> List[Path]:
+    """Rutas relativas del árbol sintético"""
+    paths = []
+    if layout == 'wide':
+        for i in range(count):
+            paths.append(Path(f'dir{i // WIDE_FILES_PER_DIR:05d}') / file_name(i))
+        return paths
+
+    leaves = max(1, -(-count // DEEP_FILES_PER_LEAF))
+    depth = 1
+    while DEEP_BRANCHING ** depth < leaves:
+        depth += 1
+    for i in range(count):
+        leaf = i // DEEP_FILES_PER_LEAF
+        parts = []
+        for _ in range(depth):
+            leaf, branch = divmod(leaf, DEEP_BRANCHING)
+            parts.append(f'nivel {branch}')
+        paths.append(Path(*parts) / file_name(i))
+    return paths
+
+
+def file_name(i: int) -> str:
+    return f"{NAMES[i % len(NAMES)]} {i:07d}{EXTENSIONS[i % len(EXTENSIONS)]}"
+
+
+def generate_tree(root: Path, count: int, layout: str) -> List[Path]:
+    """Crear los archivos (vacíos) del árbol sintético"""
+    paths = [root / path for path in tree_paths(count, layout)]
+    created = set()
+    for path in paths:
+        if path.parent not in created:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            created.add(path.parent)
+        os.close(os.open(path, os.O_CREAT | os.O_WRONLY, 0o644))
+
+    # Fechar los directorios en el pasado, como un archivo real: el manifiesto
+    # no reutiliza directorios modificados hace menos de unos segundos
+    past = time.time() - 3600
+    for directory, _, _ in os.walk(root):
+        os.utime(directory, (past, past))
+    return paths
+
+
+def measure(results: Dict, name: str, items: int, func: Callable):
+    """Ejecutar func una vez y guardar el tiempo y el ritmo por elemento"""
+    start = time.perf_counter()
+    value = func()
+    seconds = time.perf_counter() - start
+    results[name] = {
+        'seconds': round(seconds, 6),
+        'items': items,
+        'per_second': round(items / seconds, 1) if seconds > 0 else None,
+    }
+    show(results, name)
+    return value
+
+
+def show(results: Dict, name: str):
+    result = results[name]
+    print(f"  {name:<28} {result['seconds']:9.3f}s  {result['items']:>9} items  "
+          f"{result['per_second'] or 0:>12,.0f}/s", flush=True)
+
+
+def drop_file_cache(path: str) -> bool:
+    """Pedir al sistema que descarte las páginas en caché de un archivo; False si no se puede"""
+    if not hasattr(os, 'posix_fadvise') or not os.path.exists(path):
+        return False
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)  # Las páginas sucias no se descartan
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        return True
+    except OSError:
+        return False
+    finally:
+        os.close(fd)
+
+
+def measure_cold_store(paths_file: str) -> Dict:
+    """En un proceso nuevo: abrir el almacén de progreso y consultar cada archivo"""
+    with open(paths_file, encoding='utf-8', errors='surrogateescape') as f:
+        paths = f.read().splitlines()
+    uploader = ArchiveUploader(AUTHOR, extract_metadata=False, preflight=False)
+    uploader.progress.close()
+    dropped = all([drop_file_cache(PROGRESS_DB + suffix) for suffix in ('', '-wal')
+                   if os.path.exists(PROGRESS_DB + suffix)])
+    results: Dict = {}
+    uploader.progress = measure(results, 'load_progress', len(paths), uploader.load_progress)
+    measure(results, 'is_uploaded', len(paths), lambda: [uploader.is_uploaded(path) for path in paths])
+    uploader.progress.close()
+    for result in results.values():
+        result['os_cache_dropped'] = dropped
+    return results
+
+
+def run_cold_store(workdir: Path, files: List[Path], results: Dict):
+    """Medir el almacén en frío en un proceso hijo, sin el estado de este"""
+    paths_file = workdir / 'cold_paths.txt'
+    with open(paths_file, 'w', encoding='utf-8', errors='surrogateescape') as f:
+        f.writelines(f"{file_path}\n" for file_path in files)
+    child = subprocess.run([sys.executable, os.path.abspath(__file__), '--cold-store', str(paths_file)],
+                           cwd=workdir, capture_output=True, text=True, check=True)
+    for name, result in json.loads(child.stdout.splitlines()[-1]).items():
+        results[f'{name}_cold'] = result
+        show(results, f'{name}_cold')
+
+
+def run_layout(workdir: Path, count: int, layout: str) -> Dict:
+    """Medir todas las rutas locales sobre un árbol nuevo"""
+    root = workdir / 'material'
+    results: Dict = {}
+    print(f"\n📂 {layout}: {count} archivos en {root}")
+    measure(results, 'generate_tree', count, lambda: generate_tree(root, count, layout))
+
+    # El uploader guarda progreso, log y manifiesto en el directorio actual
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        uploader = ArchiveUploader(AUTHOR, extract_metadata=False, preflight=False)
+        logging.getLogger().setLevel(logging.WARNING)
+
+        files = measure(results, 'scan_directory_cold', count, lambda: uploader.scan_directory(root))
+        measure(results, 'scan_directory_warm', count, lambda: uploader.scan_directory(root))
+
+        sample = files[:SAMPLE_SIZE]
+        measure(results, 'generate_identifier', len(sample),
+                lambda: [uploader.generate_identifier(file_path) for file_path in sample])
+        measure(results, 'assign_identifiers', len(files), lambda: uploader.assign_identifiers(files))
+        registered = ArchiveUploader(AUTHOR, extract_metadata=False, preflight=False)
+        measure(results, 'assign_identifiers_registered', len(files),
+                lambda: registered.assign_identifiers(files))
+
+        measure(results, 'generate_metadata', len(files),
+                lambda: [uploader.generate_metadata(file_path, uploader.get_mediatype(file_path))
+                         for file_path in files])
+
+        entries = {str(file_path): {'status': 'success', 'identifier': f'bench-{i}',
+                                    'date': '2025-01-15T00:00:00'}
+                   for i, file_path in enumerate(files)}
+        measure(results, 'progress_update', len(entries), lambda: uploader.progress.update(entries))
+        measure(results, 'record_progress', len(sample),
+                lambda: [uploader.record_progress(str(file_path), entries[str(file_path)])
+                         for file_path in sample])
+        measure(results, 'save_progress', len(entries), uploader.save_progress)
+        uploader.progress.close()
+        run_cold_store(workdir, files, results)
+        # En caliente: el mismo proceso, con la base recién escrita en la caché del sistema
+        uploader.progress = measure(results, 'load_progress_warm', len(entries), uploader.load_progress)
+        uploader.disposer.store = uploader.progress
+        measure(results, 'is_uploaded_warm', len(files),
+                lambda: [uploader.is_uploaded(str(file_path)) for file_path in files])
+
+        measure(results, 'move_to_uploaded_folder', len(sample),
+                lambda: [uploader.move_to_uploaded_folder(file_path) for file_path in sample])
+        uploader.progress.close()
+        registered.progress.close()
+    finally:
+        os.chdir(previous_cwd)
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except Exception:
+        return 'unknown'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline de las rutas locales del uploader")
+    parser.add_argument('--files', type=int, default=10000,
+                        help='Archivos del árbol sintético, p. ej. 10000 a 1000000 (default: 10000)')
+    parser.add_argument('--layout', choices=LAYOUTS + ('both',), default='both',
+                        help='Disposición del árbol: ancha, profunda o ambas (default: both)')
+    parser.add_argument('--output', default='benchmark_results.json',
+                        help='Archivo JSON de resultados (default: benchmark_results.json)')
+    parser.add_argument('--workdir',
+                        help='Directorio donde crear el árbol (default: uno temporal)')
+    parser.add_argument('--keep', action='store_true',
+                        help='No borrar el árbol sintético al terminar')
+    # Uso interno: la medición en frío del almacén en un proceso nuevo
+    parser.add_argument('--cold-store', metavar='PATHS_FILE', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cold_store:
+        logging.disable(logging.WARNING)
+        print(json.dumps(measure_cold_store(args.cold_store)))
+        return 0
+
+    if args.files < 1:
+        parser.error("--files debe ser al menos 1")
+
+    layouts = LAYOUTS if args.layout == 'both' else (args.layout,)
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'files': args.files,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'layouts': {},
+    }
+
+    base = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix='archive_bench_'))
+    base.mkdir(parents=True, exist_ok=True)
+    try:
+        for layout in layouts:
+            workdir = base / layout
+            if workdir.exists():
+                shutil.rmtree(workdir)
+            workdir.mkdir()
+            report['layouts'][layout] = run_layout(workdir, args.files, layout)
+    finally:
+        if not args.keep:
+            shutil.rmtree(base, ignore_errors=True)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Resultados en {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -40,7 +40,7 @@ echo "  python3 archive_uploader.py ~/Documents/libros \"Carlos Fuentes\""
 echo "  python3 archive_uploader.py ~/Videos/conferencias \"Eduardo Galeano\" --collection opensource"
 echo ""
 echo "📁 El script creará:"
-echo "  - .archive_progress.json (progreso guardado)"
+echo "  - .archive_progress.db (progreso guardado)"
 echo "  - .archive_upload.log (registro de actividades)"
 echo ""
 echo "🔧 Para configurar credenciales de Archive.org:"
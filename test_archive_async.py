@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import threading
+from pathlib import Path
+
+from archive_async import AsyncUploadEngine
+from archive_retry import RetryLater
+
+
+class FakeUploader:
+    logger = logging.getLogger('test')
+
+
+def test_run_jobs_requeues_retry_later():
+    attempts = {'a': 0, 'b': 0}
+
+    def job(name):
+        def run():
+            attempts[name] += 1
+            if attempts[name] < 3:
+                raise RetryLater(0.01, TimeoutError('503 SlowDown'))
+            return 1, 0
+        return run
+
+    engine = AsyncUploadEngine(FakeUploader(), concurrency=2, io_threads=2)
+    assert engine.execute_jobs([job('a'), job('b')]) == (2, 0)
+    assert attempts == {'a': 3, 'b': 3}
+
+
+def test_run_jobs_counts_failures_as_errors():
+    def broken():
+        raise ValueError('boom')
+
+    engine = AsyncUploadEngine(FakeUploader())
+    assert engine.execute_jobs([broken, lambda: (1, 0)]) == (1, 1)
+
+
+class RecordingUploader(FakeUploader):
+    """Anota en qué hilo corre cada llamada del uploader"""
+
+    def __init__(self):
+        self.threads = {}
+
+    def _record(self, name):
+        self.threads.setdefault(name, set()).add(threading.get_ident())
+
+    def is_uploaded(self, file_id):
+        self._record('is_uploaded')
+        return False
+
+    def check_duplicate(self, file_path):
+        return 'md5', False
+
+    def prepare_upload(self, file_path):
+        self._record('prepare_upload')
+        return 'autor-a', {}
+
+    def transfer_file(self, file_path, identifier, metadata):
+        return []
+
+    def finish_upload(self, file_path, identifier, item, md5):
+        return True
+
+
+def test_blocking_calls_stay_off_the_event_loop():
+    uploader = RecordingUploader()
+    loop_threads = set()
+
+    def files():
+        uploader._record('scan')
+        yield from (Path(f'{i}.mp3') for i in range(5))
+
+    def on_result(file_path, ok):
+        uploader._record('on_result')
+
+    async def run():
+        loop_threads.add(threading.get_ident())
+        return await AsyncUploadEngine(uploader, concurrency=3, io_threads=2).run(files(), on_result)
+
+    assert asyncio.run(run()) == (5, 0)
+    assert set(uploader.threads) == {'scan', 'is_uploaded', 'prepare_upload', 'on_result'}
+    for threads in uploader.threads.values():
+        assert loop_threads.isdisjoint(threads)
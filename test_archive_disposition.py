@@ -0,0 +1,86 @@
+import errno
+import os
+
+from archive_disposition import Disposer
+from archive_store import ProgressStore
+
+
+def make_file(directory, name, content=b'data'):
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / name
+    path.write_bytes(content)
+    return path
+
+
+def test_move_never_overwrites(tmp_path):
+    source = make_file(tmp_path / 'src', 'a.mp3', b'new')
+    make_file(tmp_path / 'src' / 'Uploaded', 'a.mp3', b'old')
+    store = ProgressStore(str(tmp_path / 'progress.db'))
+
+    destination = Disposer(store).dispose(source)
+
+    assert destination == tmp_path / 'src' / 'Uploaded' / 'a_1.mp3'
+    assert destination.read_bytes() == b'new'
+    assert (tmp_path / 'src' / 'Uploaded' / 'a.mp3').read_bytes() == b'old'
+    assert not source.exists()
+    assert store.pending_dispositions() == []
+
+
+def test_keep_leaves_file_in_place(tmp_path):
+    source = make_file(tmp_path / 'src', 'a.mp3')
+    disposer = Disposer(ProgressStore(str(tmp_path / 'progress.db')), mode='keep')
+    assert disposer.dispose(source) == source
+    assert source.exists()
+    assert not (tmp_path / 'src' / 'Uploaded').exists()
+
+
+def test_rename_fallback_without_hardlinks(tmp_path, monkeypatch):
+    source = make_file(tmp_path / 'src', 'a.mp3')
+
+    def no_link(src, dst):
+        raise OSError(errno.EPERM, 'sin enlaces duros')
+
+    monkeypatch.setattr(os, 'link', no_link)
+    destination = Disposer(ProgressStore(str(tmp_path / 'progress.db'))).dispose(source)
+    assert destination.read_bytes() == b'data'
+    assert not source.exists()
+
+
+def test_recover_interrupted_moves(tmp_path):
+    src = tmp_path / 'src'
+    uploaded = src / 'Uploaded'
+    linked = make_file(src, 'linked.mp3')       # corte tras el enlace, antes de borrar el origen
+    untouched = make_file(src, 'untouched.mp3')  # corte antes del enlace
+    done = make_file(src, 'done.mp3')            # corte tras mover, antes de borrar la intención
+    uploaded.mkdir()
+    store = ProgressStore(str(tmp_path / 'progress.db'))
+    for path in (linked, untouched, done):
+        store.begin_disposition(str(path), str(uploaded / path.name))
+    os.link(linked, uploaded / 'linked.mp3')
+    os.rename(done, uploaded / 'done.mp3')
+    inode = os.stat(uploaded / 'linked.mp3').st_ino
+
+    resolved = Disposer(store).recover()
+
+    assert resolved == {str(path): str(uploaded / path.name) for path in (linked, untouched, done)}
+    assert sorted(os.listdir(src)) == ['Uploaded']
+    assert sorted(os.listdir(uploaded)) == ['done.mp3', 'linked.mp3', 'untouched.mp3']
+    assert os.stat(uploaded / 'linked.mp3').st_ino == inode  # sin copia
+    assert store.pending_dispositions() == []
+
+
+def test_uploader_construction_does_not_move_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from archive_uploader import ArchiveUploader
+    source = make_file(tmp_path / 'src', 'a.mp3')
+    store = ProgressStore('.archive_progress.db')
+    store.begin_disposition(str(source), str(tmp_path / 'src' / 'Uploaded' / 'a.mp3'))
+    store.close()
+
+    uploader = ArchiveUploader('Autor', 'opensource', preflight=False, extract_metadata=False)
+    assert source.exists()
+    assert len(uploader.progress.pending_dispositions()) == 1
+
+    uploader.recover_dispositions()
+    assert not source.exists()
+    assert uploader.progress.pending_dispositions() == []
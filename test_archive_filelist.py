@@ -0,0 +1,151 @@
+import itertools
+import types
+from pathlib import Path
+
+import archive_filelist
+from archive_filelist import FileListModel, VirtualFileList
+
+ROW_HEIGHT = 20
+HEADER_HEIGHT = 25
+
+
+class FakeTreeview:
+    """Treeview sin Tk: guarda los items y los repintados pendientes"""
+
+    def __init__(self, parent, **kwargs):
+        self.items = {}
+        self.idle = []
+        self.inserted = 0
+        self._ids = itertools.count()
+
+    def heading(self, column, **kwargs):
+        pass
+
+    def column(self, column, **kwargs):
+        pass
+
+    def bind(self, sequence, callback):
+        pass
+
+    def insert(self, parent, index):
+        item = f'I{next(self._ids)}'
+        self.items[item] = None
+        self.inserted += 1
+        return item
+
+    def delete(self, *items):
+        for item in items:
+            del self.items[item]
+
+    def item(self, item, text, values):
+        self.items[item] = (text, *values)
+
+    def bbox(self, item):
+        position = list(self.items).index(item)
+        return 0, HEADER_HEIGHT + position * ROW_HEIGHT, 300, ROW_HEIGHT
+
+    def after_idle(self, callback):
+        self.idle.append(callback)
+
+    def run_idle(self):
+        callbacks, self.idle = self.idle, []
+        for callback in callbacks:
+            callback()
+
+
+class FakeScrollbar:
+    def __init__(self, parent, **kwargs):
+        self.position = None
+
+    def set(self, first, last):
+        self.position = (first, last)
+
+
+def rows(count, start=0):
+    return [(Path(f'/m/{n:05d}.mp3'), 'audio' if n % 2 else 'movies', n) for n in range(start, start + count)]
+
+
+def make_list(monkeypatch, count=0, height=6):
+    monkeypatch.setattr(archive_filelist, 'ttk', types.SimpleNamespace(Treeview=FakeTreeview,
+                                                                       Scrollbar=FakeScrollbar))
+    model = FileListModel()
+    model.extend(rows(count))
+    return VirtualFileList(None, model, str, height=height)
+
+
+def shown(files):
+    return [files.tree.items[item][0] for item in files._items]
+
+
+def test_model_filter_and_deferred_sort():
+    model = FileListModel()
+    model.extend(rows(10))
+    model.set_filter('audio', (3, None))
+    model.sort_by('size', reverse=True)
+    assert [model.row(n)[2] for n in range(len(model))] == [9, 7, 5, 3]
+
+    # Las filas nuevas se filtran al llegar y se ordenan al pedir una fila
+    model.extend(rows(4, start=10))
+    assert model.view == [9, 7, 5, 3, 11, 13]
+    assert model.row(0)[2] == 13
+    assert model.view == [13, 11, 9, 7, 5, 3]
+
+    model.sort_by(None)
+    model.set_filter()
+    assert model.view is None and len(model) == model.total == 14
+    assert model.total_bytes == sum(range(14))
+
+
+def test_only_visible_rows_are_materialized(monkeypatch):
+    files = make_list(monkeypatch, 100000)
+
+    assert len(files.tree.items) == 6
+    assert shown(files) == [f'{n:05d}.mp3' for n in range(6)]
+    assert files.scrollbar.position == (0.0, 6 / 100000)
+
+    files.scroll(50)
+    assert shown(files)[0] == '00050.mp3'
+    files.yview('moveto', '0.5')
+    assert shown(files)[0] == '50000.mp3'
+    files.yview('scroll', '1', 'pages')
+    assert shown(files)[0] == '50006.mp3'
+
+    # Desplazarse más allá del final deja la última página completa
+    files.yview('moveto', '1.0')
+    assert shown(files)[-1] == '99999.mp3' and len(shown(files)) == 6
+    files.scroll(-10 ** 6)
+    assert files.offset == 0
+    assert files.tree.inserted == 6
+
+
+def test_window_follows_filter_and_widget_height(monkeypatch):
+    files = make_list(monkeypatch, 1000)
+    files.scroll(400)
+
+    files.set_filter('audio')
+    assert files.offset == 0
+    assert shown(files) == ['00001.mp3', '00003.mp3', '00005.mp3', '00007.mp3', '00009.mp3', '00011.mp3']
+
+    files.set_filter('audio', (None, 5))
+    assert shown(files) == ['00001.mp3', '00003.mp3', '00005.mp3']
+    assert files.scrollbar.position == (0.0, 1.0)
+
+    files.set_filter()
+    files._on_configure(types.SimpleNamespace(height=HEADER_HEIGHT + 10 * ROW_HEIGHT))
+    assert files.rows == 10 and len(files.tree.items) == 10
+
+
+def test_extend_batches_share_one_refresh(monkeypatch):
+    files = make_list(monkeypatch)
+    assert files.tree.items == {}
+
+    for start in range(0, 50, 10):
+        files.extend(rows(10, start))
+    assert len(files.tree.idle) == 1
+
+    files.tree.run_idle()
+    assert shown(files) == [f'{n:05d}.mp3' for n in range(6)]
+    assert files.scrollbar.position == (0.0, 6 / 50)
+
+    files.clear()
+    assert files.tree.items == {} and files.scrollbar.position == (0.0, 1.0)
@@ -0,0 +1,53 @@
+import os
+from pathlib import Path
+
+from archive_identifiers import IdentifierRegistry, collision_suffix
+from archive_store import ProgressStore
+
+
+def test_collision_resolved_against_registry_across_batches(tmp_path):
+    registry = IdentifierRegistry(ProgressStore(str(tmp_path / 'progress.db')))
+
+    first = registry.assign({'/a/01.mp3': 'autor-01'})
+    second = registry.assign({'/b/01.mp3': 'autor-01'}, keys={'/b/01.mp3': 'b/01.mp3'})
+
+    assert first == {'/a/01.mp3': 'autor-01'}
+    assert second == {'/b/01.mp3': 'autor-01' + collision_suffix('b/01.mp3')}
+
+
+def test_concurrent_processes_do_not_share_an_identifier(tmp_path, monkeypatch):
+    db = str(tmp_path / 'progress.db')
+    one = IdentifierRegistry(ProgressStore(db))
+    other_store = ProgressStore(db)
+    other = IdentifierRegistry(other_store)
+    # El otro proceso comprobó el registro antes de que este registrara
+    monkeypatch.setattr(other_store, 'taken_identifiers', lambda identifiers: {})
+
+    assert one.assign_one('/a/01.mp3', 'autor-01') == 'autor-01'
+    identifier = other.assign_one('/b/01.mp3', 'autor-01', key='b/01.mp3')
+
+    assert identifier == 'autor-01' + collision_suffix('b/01.mp3')
+    assert ProgressStore(db).get_identifiers(['/a/01.mp3', '/b/01.mp3']) == {
+        '/a/01.mp3': 'autor-01', '/b/01.mp3': identifier}
+
+
+def test_suffix_does_not_depend_on_working_directory(tmp_path, monkeypatch):
+    from archive_uploader import ArchiveUploader
+    for album in ('a', 'b'):
+        (tmp_path / 'material' / album).mkdir(parents=True)
+        (tmp_path / 'material' / album / '01.mp3').write_bytes(b'x')
+
+    def identifiers(cwd, directory):
+        cwd.mkdir()
+        monkeypatch.chdir(cwd)
+        uploader = ArchiveUploader('Autor', 'opensource', preflight=False, extract_metadata=False)
+        files = uploader.scan_directory(directory)
+        assigned = uploader.assign_identifiers(files)
+        uploader.progress.close()
+        return sorted(assigned.values())
+
+    relative = identifiers(tmp_path / 'run1', Path(os.path.relpath(tmp_path / 'material', tmp_path / 'run1')))
+    absolute = identifiers(tmp_path / 'run2', tmp_path / 'material')
+
+    assert relative == absolute
+    assert relative == sorted('autor-01' + collision_suffix(f'{album}/01.mp3') for album in ('a', 'b'))
@@ -0,0 +1,89 @@
+import os
+import time
+
+import pytest
+
+from archive_jobqueue import ACQUIRED, BUSY, FINISHED, JobQueue
+
+
+@pytest.fixture
+def workers(tmp_path):
+    queues = [JobQueue(tmp_path, worker_id=name) for name in ('a', 'b')]
+    yield queues
+    for queue in queues:
+        queue.close()
+
+
+def make_file(tmp_path, name='a.mp3', content=b'data'):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return path
+
+
+def test_lease_is_exclusive_until_released(tmp_path, workers):
+    a, b = workers
+    path = make_file(tmp_path)
+
+    assert a.acquire(path) == ACQUIRED
+    assert b.acquire(path) == BUSY
+
+    a.release(path, done=True)
+    assert b.acquire(path) == FINISHED
+
+
+def test_failed_job_goes_back_to_the_queue(tmp_path, workers):
+    a, b = workers
+    path = make_file(tmp_path)
+
+    assert a.acquire(path) == ACQUIRED
+    a.release(path, done=False)
+    assert b.acquire(path) == ACQUIRED
+
+
+def test_expired_lease_is_taken_over(tmp_path, workers):
+    a, b = workers
+    path = make_file(tmp_path)
+    assert a.acquire(path) == ACQUIRED
+
+    # El trabajador "a" dejó de latir hace más que el TTL
+    lease = a._path('lease', a.key(path))
+    past = time.time() - a.ttl - 60
+    os.utime(lease, (past, past))
+
+    assert b.acquire(path) == ACQUIRED
+    assert b._owner(lease) == 'b'
+
+
+def test_changed_file_is_a_new_job(tmp_path, workers):
+    a, b = workers
+    path = make_file(tmp_path)
+    assert a.acquire(path) == ACQUIRED
+    a.release(path, done=True)
+
+    path.write_bytes(b'other content')
+    assert b.acquire(path) == ACQUIRED
+
+
+def test_claim_yields_only_acquired_files(tmp_path, workers):
+    a, b = workers
+    paths = [make_file(tmp_path, f'{i}.mp3') for i in range(4)]
+    assert a.acquire(paths[0]) == ACQUIRED
+    assert a.acquire(paths[1]) == ACQUIRED
+    a.release(paths[1], done=True)
+
+    claimed = b.claim(paths, recheck=0)
+    assert [next(claimed), next(claimed)] == paths[2:]
+
+    # El archivo que tenía "a" se retoma en cuanto lo suelta
+    a.release(paths[0], done=False)
+    assert list(claimed) == paths[:1]
+
+
+def test_reopen_after_failed_verification(tmp_path, workers):
+    a, b = workers
+    path = make_file(tmp_path)
+    assert a.acquire(path) == ACQUIRED
+    a.release(path, done=True)
+
+    a.reopen(path)
+    assert b.acquire(path) == ACQUIRED
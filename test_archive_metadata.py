@@ -0,0 +1,149 @@
+import builtins
+import zlib
+
+import archive_metadata
+from archive_metadata import extract_metadata
+
+
+def classic_pdf(objects, padding=0, info=True):
+    """PDF con tabla xref clásica; `padding` bytes de relleno tras el primer objeto"""
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = {}
+    for number, body in objects.items():
+        offsets[number] = len(out)
+        out += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+        if padding and number == 1:
+            out += b'%' + b'0' * padding + b'\n'
+    xref = len(out)
+    size = max(objects) + 1
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % size
+    for number in range(1, size):
+        out += b'%010d 00000 n \n' % offsets[number]
+    out += b'trailer\n<< /Size %d /Root 1 0 R%s >>\nstartxref\n%d\n%%%%EOF\n' % (
+        size, b' /Info 4 0 R' if info else b'', xref)
+    return bytes(out)
+
+
+OBJECTS = {
+    1: b'<< /Type /Catalog /Pages 2 0 R >>',
+    2: b'<< /Type /Pages /Kids [3 0 R] /Count 7 >>',
+    3: b'<< /Type /Page /Parent 2 0 R >>',
+    4: b'<< /Title (Bhagavad-gita \\(1972\\)) /Author <FEFF004100630061> /CreationDate (D:19720101) >>',
+}
+
+
+def xref_stream_pdf():
+    """PDF 1.5 con los objetos en un flujo de objetos y un flujo xref con predictor PNG"""
+    out = bytearray(b'%PDF-1.5\n')
+    packed = [1, 2, 3, 4]
+    bodies = [OBJECTS[number] + b' ' for number in packed]
+    header, position = [], 0
+    for number, body in zip(packed, bodies):
+        header.append(b'%d %d' % (number, position))
+        position += len(body)
+    header = b' '.join(header) + b' '
+    content = zlib.compress(header + b''.join(bodies))
+    objstm = len(out)
+    out += b'5 0 obj\n<< /Type /ObjStm /N 4 /First %d /Length %d /Filter /FlateDecode >>\nstream\n' % (
+        len(header), len(content)) + content + b'\nendstream\nendobj\n'
+    xref = len(out)
+    rows = [(0, 0, 0)] + [(2, 5, index) for index in range(4)] + [(1, objstm, 0), (1, xref, 0)]
+    previous = bytes(6)
+    data = bytearray()
+    for kind, field, index in rows:
+        row = bytes([kind]) + field.to_bytes(4, 'big') + bytes([index])
+        data += b'\x02' + bytes((a - b) & 0xFF for a, b in zip(row, previous))  # predictor PNG "Up"
+        previous = row
+    stream = zlib.compress(bytes(data))
+    out += (b'6 0 obj\n<< /Type /XRef /Size 7 /W [1 4 1] /Root 1 0 R /Info 4 0 R /Length %d '
+            b'/Filter /FlateDecode /DecodeParms << /Columns 6 /Predictor 12 >> >>\nstream\n' % len(stream))
+    out += stream + b'\nendstream\nendobj\nstartxref\n%d\n%%%%EOF\n' % xref
+    return bytes(out)
+
+
+EXPECTED = {'title': 'Bhagavad-gita (1972)', 'artist': 'Aca', 'date': '1972-01-01', 'pages': 7}
+
+
+def test_pdf_classic_xref(tmp_path):
+    path = tmp_path / 'book.pdf'
+    path.write_bytes(classic_pdf(OBJECTS))
+    assert extract_metadata(str(path)) == EXPECTED
+
+
+def test_pdf_xref_stream_and_object_stream(tmp_path):
+    path = tmp_path / 'book.pdf'
+    path.write_bytes(xref_stream_pdf())
+    assert extract_metadata(str(path)) == EXPECTED
+
+
+def test_pdf_large_file_reads_only_xref_and_objects(tmp_path, monkeypatch):
+    path = tmp_path / 'scan.pdf'
+    path.write_bytes(classic_pdf(OBJECTS, padding=32 * 1024 * 1024))
+    read = []
+
+    class CountingFile:
+        def __init__(self, f):
+            self._f = f
+
+        def read(self, *args):
+            data = self._f.read(*args)
+            read.append(len(data))
+            return data
+
+        def __getattr__(self, name):
+            return getattr(self._f, name)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self._f.close()
+
+    monkeypatch.setattr(archive_metadata, 'open',
+                        lambda *args, **kwargs: CountingFile(builtins.open(*args, **kwargs)), raising=False)
+    assert extract_metadata(str(path)) == EXPECTED
+    assert sum(read) < 1024 * 1024
+
+
+def test_pdf_without_xref_falls_back_to_window(tmp_path):
+    data = classic_pdf(OBJECTS)
+    path = tmp_path / 'broken.pdf'
+    path.write_bytes(data[:data.index(b'xref')] + b'trailer\n<< /Root 1 0 R /Info 4 0 R >>\n')
+    assert extract_metadata(str(path)) == EXPECTED
+
+
+def test_damaged_files_return_empty(tmp_path):
+    for name, content in (('a.pdf', b'%PDF-1.4\n garbage'), ('b.mp3', b'ID3\x04\x00'), ('c.mp4', b'\x00' * 3)):
+        path = tmp_path / name
+        path.write_bytes(content)
+        assert extract_metadata(str(path)) == {}
+
+
+def test_first_file_skips_the_pool(tmp_path, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    from archive_store import ProgressStore
+
+    extractor = archive_metadata.MetadataExtractor(ProgressStore(str(tmp_path / 'p.db')), workers=2)
+    pools = []
+
+    def pool():
+        pools.append(len(pulled))
+        extractor._executor = extractor._executor or ThreadPoolExecutor(2)
+        return extractor._executor
+
+    monkeypatch.setattr(extractor, '_pool', pool)
+    pulled = []
+
+    def scanned():
+        for n in range(200):
+            path = tmp_path / f'{n}.txt'
+            path.write_bytes(b'x')
+            pulled.append(n)
+            yield path
+
+    stream = extractor.iter_extract(scanned())
+    assert next(stream)[0] == tmp_path / '0.txt'
+    assert pulled == [0] and pools == []
+
+    assert [path.name for path, _ in stream] == [f'{n}.txt' for n in range(1, 200)]
+    extractor.close()
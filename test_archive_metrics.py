@@ -0,0 +1,117 @@
+import json
+import types
+
+import archive_metrics
+from archive_metrics import Histogram, Metrics, NullMetrics, SECONDS_BUCKETS
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def fake_time(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(archive_metrics, 'time', types.SimpleNamespace(
+        perf_counter=lambda: clock.now, time=lambda: clock.now))
+    return clock
+
+
+def test_nested_phases_are_exclusive(monkeypatch):
+    clock = fake_time(monkeypatch)
+    metrics = Metrics()
+
+    with metrics.timer('upload'):
+        clock.advance(1)
+        with metrics.timer('hash'):
+            clock.advance(2)
+            with metrics.timer('scan'):
+                clock.advance(4)
+        clock.advance(8)
+
+    assert metrics.phase_totals() == {'upload': 9, 'hash': 2, 'scan': 4}
+
+
+def test_timed_iter_measures_production(monkeypatch):
+    clock = fake_time(monkeypatch)
+    metrics = Metrics()
+
+    def produce():
+        for n in range(3):
+            clock.advance(1)
+            yield n
+
+    consumed = []
+    for n in metrics.timed_iter(produce(), 'scan'):
+        clock.advance(10)  # El consumo no cuenta
+        consumed.append(n)
+
+    assert consumed == [0, 1, 2]
+    assert metrics.phase_totals() == {'scan': 3}
+    assert metrics.summary()['histograms']['phase_seconds{phase="scan"}']['count'] == 4
+
+
+def test_histogram_percentiles():
+    histogram = Histogram(SECONDS_BUCKETS)
+    assert histogram.percentile(50) == 0.0
+    for _ in range(90):
+        histogram.observe(0.01)
+    for _ in range(10):
+        histogram.observe(5.0)
+
+    assert histogram.count == 100 and histogram.min == 0.01 and histogram.max == 5.0
+    assert 0.008 <= histogram.percentile(50) <= 0.016
+    assert 4.096 <= histogram.percentile(99) <= 5.0
+    assert histogram.percentile(100) == 5.0
+
+
+def test_prometheus_and_json_export(tmp_path, monkeypatch):
+    clock = fake_time(monkeypatch)
+    metrics = Metrics()
+    metrics.inc('files_total', status='success')
+    metrics.inc('files_total', 2, status='error')
+    metrics.transfer(4096, 2.0)
+    clock.advance(4)
+
+    prometheus_path = tmp_path / 'metrics.prom'
+    json_path = tmp_path / 'metrics.json'
+    metrics.write(str(prometheus_path), str(json_path))
+
+    lines = prometheus_path.read_text(encoding='utf-8').splitlines()
+    assert 'archive_uploader_files_total{status="error"} 2' in lines
+    assert 'archive_uploader_files_total{status="success"} 1' in lines
+    assert 'archive_uploader_bytes_uploaded_total 4096' in lines
+    assert lines.count('# TYPE archive_uploader_files_total counter') == 1
+    assert 'archive_uploader_file_bytes_bucket{le="4096"} 1' in lines
+    assert 'archive_uploader_file_bytes_bucket{le="+Inf"} 1' in lines
+    assert 'archive_uploader_throughput_bytes_per_second_sum 2048' in lines
+    assert lines[-1] == 'archive_uploader_run_seconds 4'
+
+    # Las cubetas son acumulativas
+    buckets = [int(line.rsplit(' ', 1)[1]) for line in lines
+               if line.startswith('archive_uploader_file_bytes_bucket')]
+    assert buckets == sorted(buckets)
+
+    summary = json.loads(json_path.read_text(encoding='utf-8'))
+    assert summary['counters'] == {'files_total{status="error"}': 2, 'files_total{status="success"}': 1,
+                                   'bytes_uploaded_total': 4096}
+    assert summary['throughput_bytes_per_second'] == 1024
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_null_metrics_share_the_interface(tmp_path):
+    public = {name for name in dir(Metrics) if not name.startswith('_')}
+    public -= {'to_prometheus', 'summary'}
+    assert public <= set(dir(NullMetrics))
+
+    metrics = NullMetrics()
+    with metrics.timer('scan'):
+        metrics.inc('files_total', status='success')
+        metrics.transfer(10, 1.0)
+    assert list(metrics.timed_iter([1, 2], 'scan')) == [1, 2]
+    assert metrics.phase_totals() == {}
+    metrics.write(str(tmp_path / 'metrics.prom'))
+    assert not (tmp_path / 'metrics.prom').exists()
@@ -0,0 +1,121 @@
+import archive_multipart
+from archive_multipart import MIN_PART_SIZE, MultipartUpload
+from archive_store import ProgressStore
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.ok = status_code < 400
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise ConnectionError(f'HTTP {self.status_code}')
+
+
+class FakeS3Session:
+    """Servidor multiparte en memoria que registra cada llamada"""
+
+    access_key = 'access'
+    secret_key = 'secret'
+
+    def __init__(self, fail_parts=()):
+        self.calls = []
+        self.fail_parts = set(fail_parts)
+        self.uploads = {}
+        self.initiated = 0
+
+    def send(self, request, timeout=None):
+        self.initiated += 1
+        upload_id = f'UP{self.initiated}'
+        self.uploads[upload_id] = {}
+        self.calls.append(('initiate', upload_id))
+        return FakeResponse(content=f'<InitiateMultipartUploadResult><UploadId>{upload_id}</UploadId>'
+                                    f'</InitiateMultipartUploadResult>'.encode())
+
+    def put(self, url, params, data, auth, timeout):
+        number, upload_id = params['partNumber'], params['uploadId']
+        data.read()
+        if number in self.fail_parts:
+            self.fail_parts.discard(number)
+            self.calls.append(('fail', number))
+            raise ConnectionError('conexión cortada')
+        etag = f'"etag-{upload_id}-{number}"'
+        self.uploads[upload_id][number] = etag
+        self.calls.append(('part', number, upload_id))
+        return FakeResponse(headers={'ETag': etag})
+
+    def get(self, url, params, auth, timeout):
+        parts = self.uploads.get(params['uploadId'])
+        if parts is None:
+            return FakeResponse(404)
+        body = ''.join(f'<Part><PartNumber>{n}</PartNumber><ETag>{e}</ETag></Part>' for n, e in parts.items())
+        return FakeResponse(content=f'<ListPartsResult>{body}</ListPartsResult>'.encode())
+
+    def post(self, url, params, data, headers, auth, timeout):
+        self.calls.append(('complete', params['uploadId']))
+        return FakeResponse()
+
+    def delete(self, url, params, auth, timeout):
+        self.calls.append(('abort', params['uploadId']))
+        self.uploads.pop(params['uploadId'], None)
+
+
+def make_file(tmp_path, parts=3):
+    path = tmp_path / 'video.mp4'
+    with open(path, 'wb') as f:
+        f.truncate(MIN_PART_SIZE * parts)
+    return path
+
+
+def test_retry_in_same_process_continues_checkpoint(tmp_path):
+    path = make_file(tmp_path)
+    store = ProgressStore(str(tmp_path / 'progress.db'))
+    session = FakeS3Session(fail_parts={2})
+    upload = MultipartUpload(session, store, part_size=MIN_PART_SIZE)
+
+    try:
+        upload.upload(path, 'item', {}, resume=False)
+    except ConnectionError:
+        pass
+    upload.upload(path, 'item', {}, resume=False)
+
+    assert [call[0] for call in session.calls].count('initiate') == 1
+    assert 'abort' not in [call[0] for call in session.calls]
+    assert [call[1] for call in session.calls if call[0] == 'part'] == [1, 2, 3]
+    assert store.get_multipart(str(path)) is None
+
+
+def test_checkpoint_from_previous_run_needs_resume(tmp_path):
+    path = make_file(tmp_path)
+    store = ProgressStore(str(tmp_path / 'progress.db'))
+    session = FakeS3Session(fail_parts={2})
+    try:
+        MultipartUpload(session, store, part_size=MIN_PART_SIZE).upload(path, 'item', {})
+    except ConnectionError:
+        pass
+    # Una ejecución nueva no conoce los UploadIds de la anterior
+    archive_multipart._started_here.clear()
+
+    MultipartUpload(session, store, part_size=MIN_PART_SIZE).upload(path, 'item', {}, resume=False)
+
+    assert ('abort', 'UP1') in session.calls
+    assert ('complete', 'UP2') in session.calls
+
+
+def test_resume_skips_parts_confirmed_by_server(tmp_path):
+    path = make_file(tmp_path)
+    store = ProgressStore(str(tmp_path / 'progress.db'))
+    session = FakeS3Session(fail_parts={3})
+    try:
+        MultipartUpload(session, store, part_size=MIN_PART_SIZE).upload(path, 'item', {})
+    except ConnectionError:
+        pass
+    archive_multipart._started_here.clear()
+    session.calls.clear()
+
+    MultipartUpload(session, store, part_size=MIN_PART_SIZE).upload(path, 'item', {}, resume=True)
+
+    assert session.calls == [('part', 3, 'UP1'), ('complete', 'UP1')]
@@ -0,0 +1,119 @@
+from archive_network import MIN_BURST_BYTES, AdaptiveConcurrency, BandwidthLimiter
+
+
+class FakeClock:
+    """Reloj manual: sleep() avanza el tiempo en lugar de esperar"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_limiter_keeps_rate_under_limit():
+    clock = FakeClock()
+    rate = 256 * 1024
+    limiter = BandwidthLimiter(rate, clock=clock, sleep=clock.sleep)
+    start = clock.now
+
+    sent = 0
+    for size in [8192, 65536, 300000, 1, 131072] * 40:
+        limiter.consume(size)
+        sent += size
+        # En todo momento: lo enviado no supera lo que permite la tasa
+        assert sent <= rate * (clock.now - start) + 1e-6
+
+    # Y no se espera más de lo necesario
+    assert sent >= rate * (clock.now - start) - 1
+
+
+def test_limiter_allows_one_burst_after_idle():
+    clock = FakeClock()
+    rate = 100 * 1024
+    limiter = BandwidthLimiter(rate, clock=clock, sleep=clock.sleep)
+
+    clock.sleep(60)
+    limiter.consume(MIN_BURST_BYTES)
+    assert clock.now == 1060
+
+    # La inactividad no acumula más de una ráfaga
+    limiter.consume(rate)
+    assert clock.now > 1060
+
+
+def test_limiter_rate_change_applies_immediately():
+    clock = FakeClock()
+    limiter = BandwidthLimiter(1024 * 1024, clock=clock, sleep=clock.sleep)
+    limiter.consume(1024 * 1024)
+
+    limiter.set_rate(None)
+    before = clock.now
+    limiter.consume(50 * 1024 * 1024)
+    assert clock.now == before
+
+    limiter.set_rate(512 * 1024)
+    limiter.consume(512 * 1024)
+    assert clock.now - before >= 1.0
+
+
+MB = 1024 ** 2
+
+
+def run_batch(control, clock, seconds, size=MB):
+    """Llenar todos los huecos, avanzar el reloj y liberarlos"""
+    started = [control.acquire() for _ in range(control.limit)]
+    clock.sleep(seconds)
+    for start in started:
+        control.release(start, size)
+
+
+def test_concurrency_grows_while_throughput_improves():
+    clock = FakeClock()
+    changes = []
+    control = AdaptiveConcurrency(initial=1, maximum=4, clock=clock,
+                                  on_change=lambda old, new, reason: changes.append((old, new)))
+
+    # Cada subida tarda 1 s: más huecos = más rendimiento
+    for _ in range(12):
+        run_batch(control, clock, 1.0)
+
+    assert control.limit == 4
+    assert changes == [(1, 2), (2, 3), (3, 4)]
+
+
+def test_concurrency_stops_growing_when_throughput_is_flat():
+    clock = FakeClock()
+    control = AdaptiveConcurrency(initial=2, maximum=16, clock=clock)
+
+    # El tiempo de cada lote crece con el límite: el rendimiento no mejora
+    for _ in range(20):
+        run_batch(control, clock, float(control.limit))
+
+    assert control.limit == 3
+
+
+def test_concurrency_halves_on_throttle():
+    clock = FakeClock()
+    changes = []
+    control = AdaptiveConcurrency(initial=8, clock=clock,
+                                  on_change=lambda old, new, reason: changes.append((old, new)))
+    clock.sleep(1)
+
+    stale = control.acquire()
+    first = control.acquire()
+    clock.sleep(1)
+    control.release(first, throttled=True)
+    assert control.limit == 4
+
+    # Una subida iniciada antes del recorte no vuelve a recortar
+    control.release(stale, throttled=True)
+    assert control.limit == 4
+
+    clock.sleep(1)
+    control.release(control.acquire(), throttled=True)
+    assert control.limit == 2
+    assert changes == [(8, 4), (4, 2)]
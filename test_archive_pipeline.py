@@ -0,0 +1,62 @@
+import threading
+
+from archive_pipeline import Pipeline, Stage
+
+
+def test_items_pass_through_stages_in_order():
+    seen = []
+    done = []
+
+    def stage(name, forward=True):
+        def run(item):
+            item['stages'].append(name)
+            return forward(item) if callable(forward) else forward
+        return run
+
+    pipeline = Pipeline([
+        Stage('a', stage('a'), workers=2),
+        # Los pares terminan en la segunda etapa (como un duplicado en la de hash)
+        Stage('b', stage('b', lambda item: item['n'] % 2 == 1), workers=2),
+        Stage('c', stage('c')),
+    ], on_done=done.append, report_interval=0)
+
+    assert pipeline.run({'n': n, 'stages': []} for n in range(10)) == 10
+
+    assert sorted(item['n'] for item in done) == list(range(10))
+    for item in done:
+        assert item['stages'] == (['a', 'b', 'c'] if item['n'] % 2 else ['a', 'b'])
+
+
+def test_failed_stage_is_retried_after_its_delay():
+    attempts = {}
+    done = []
+
+    def flaky(item):
+        attempts[item] = attempts.get(item, 0) + 1
+        if attempts[item] < 3:
+            raise TimeoutError('503 SlowDown')
+        return True
+
+    pipeline = Pipeline([Stage('upload', flaky, workers=2)], on_done=done.append,
+                        on_error=lambda item, error: 0.01, report_interval=0)
+    pipeline.run(['a', 'b'])
+
+    assert sorted(done) == ['a', 'b']
+    assert attempts == {'a': 3, 'b': 3}
+
+
+def test_stop_abandons_waiting_retries_through_on_done():
+    stop = threading.Event()
+    done, abandoned = [], []
+
+    def failing(item):
+        stop.set()
+        raise TimeoutError('503 SlowDown')
+
+    pipeline = Pipeline([Stage('upload', failing)], on_done=done.append,
+                        on_error=lambda item, error: 3600, on_abandon=abandoned.append,
+                        report_interval=0)
+    pipeline.run(['a'], should_stop=stop.is_set)
+
+    assert abandoned == ['a']
+    assert done == ['a']
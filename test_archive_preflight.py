@@ -0,0 +1,64 @@
+from archive_preflight import RemoteIndex
+from archive_store import ProgressStore
+from archive_uploader import ArchiveUploader
+
+
+class StubSession:
+    """Sesión de búsqueda falsa: responde con los identificadores que conoce"""
+
+    def __init__(self, existing, fail=False):
+        self.existing = set(existing)
+        self.fail = fail
+        self.queries = []
+
+    def search_items(self, query, fields):
+        self.queries.append(query)
+        if self.fail:
+            raise ConnectionError('sin red')
+        return [{'identifier': identifier} for identifier in sorted(self.existing) if f'"{identifier}"' in query]
+
+
+def test_remote_index_batches_and_caches(tmp_path):
+    index = RemoteIndex(ProgressStore(str(tmp_path / 'p.db')), batch_size=2)
+    session = StubSession({'b', 'd'})
+
+    assert index.existing(['a', 'b', 'c', 'd', 'e', 'a'], session) == {'b', 'd'}
+    assert len(session.queries) == 3
+
+    # Positivos y negativos salen de la caché
+    assert index.existing(['a', 'b', 'd', 'e'], session) == {'b', 'd'}
+    assert len(session.queries) == 3
+
+
+def test_remote_index_does_not_cache_failures(tmp_path):
+    index = RemoteIndex(ProgressStore(str(tmp_path / 'p.db')))
+
+    assert index.existing(['a', 'b'], StubSession({'a'}, fail=True)) == set()
+
+    session = StubSession({'a'})
+    assert index.existing(['a', 'b'], session) == {'a'}
+    assert len(session.queries) == 1
+
+
+def test_preflight_marks_existing_items_as_remote(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    uploader = ArchiveUploader('Autor', 'opensource', extract_metadata=False)
+    files = []
+    for name in ('uno', 'dos', 'tres'):
+        path = tmp_path / f'{name}.mp3'
+        path.write_bytes(name.encode())
+        files.append(path)
+    uploader.progress[str(files[2])] = {'status': 'success', 'identifier': 'subido',
+                                        'date': '2025-01-01T00:00:00'}
+    identifier = uploader.assign_identifiers([files[0]])[files[0]]
+    uploader._session = StubSession({identifier})
+
+    assert uploader.preflight(files) == 1
+
+    entry = uploader.progress[str(files[0])]
+    assert entry['status'] == 'remote' and entry['identifier'] == identifier
+    assert uploader.is_uploaded(str(files[0]))
+    assert str(files[1]) not in uploader.progress
+    # Lo ya subido no se vuelve a consultar: dos identificadores en una consulta
+    assert [query.count('"') for query in uploader._session.queries] == [4]
+    assert uploader.progress[str(files[2])]['status'] == 'success'
@@ -0,0 +1,78 @@
+import random
+
+import requests
+
+from archive_retry import PERMANENT, TRANSIENT, RetryPolicy, classify_error, retry_after
+
+
+def http_error(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    return requests.HTTPError(f"{status}", response=response)
+
+
+def test_classify_error():
+    table = [
+        (http_error(429), TRANSIENT),
+        (http_error(503), TRANSIENT),
+        (http_error(503, {'Retry-After': '7'}), TRANSIENT),
+        (http_error(500), TRANSIENT),
+        (http_error(507), TRANSIENT),
+        (http_error(400), PERMANENT),
+        (http_error(401), PERMANENT),
+        (http_error(403), PERMANENT),
+        (http_error(404), PERMANENT),
+        (requests.ConnectionError('reset'), TRANSIENT),
+        (requests.Timeout('read'), TRANSIENT),
+        (ConnectionResetError(), TRANSIENT),
+        (TimeoutError(), TRANSIENT),
+        (Exception('503 SlowDown'), TRANSIENT),
+        (FileNotFoundError('a.mp3'), PERMANENT),
+        (ValueError('identificador no válido'), PERMANENT),
+    ]
+    for error, expected in table:
+        assert classify_error(error) == expected, error
+
+
+def test_retry_after_header():
+    table = [
+        ({}, None),
+        ({'Retry-After': '7'}, 7.0),
+        ({'Retry-After': '-3'}, 0.0),
+        ({'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'}, 0.0),
+        ({'Retry-After': 'pronto'}, None),
+    ]
+    for headers, expected in table:
+        assert retry_after(http_error(503, headers)) == expected, headers
+
+
+def test_delay_honours_retry_after():
+    policy = RetryPolicy(max_retries=4, base_delay=2.0, max_delay=60.0)
+    table = [
+        (http_error(429, {'Retry-After': '12'}), 12.0),
+        (http_error(503, {'Retry-After': '0'}), 0.0),
+        (http_error(503, {'Retry-After': '3600'}), 60.0),
+    ]
+    for error, expected in table:
+        assert policy.delay(1, error) == expected
+
+
+def test_delay_backs_off_without_retry_after():
+    random.seed(0)
+    policy = RetryPolicy(max_retries=10, base_delay=2.0, max_delay=30.0)
+    for error in (http_error(429), http_error(503), requests.ConnectionError(), requests.Timeout()):
+        # Tope por intento: 2, 4, 8, 16 y luego siempre 30
+        for failures, cap in ((1, 2), (2, 4), (3, 8), (4, 16), (5, 30), (9, 30)):
+            for _ in range(20):
+                assert cap / 2 <= policy.delay(failures, error) <= cap
+
+
+def test_no_delay_for_permanent_or_exhausted():
+    policy = RetryPolicy(max_retries=2)
+    for status in (400, 401, 403, 404):
+        assert policy.delay(1, http_error(status)) is None
+    assert policy.delay(2, http_error(503)) is not None
+    assert policy.delay(3, http_error(503)) is None
+    assert policy.delay(3, http_error(503, {'Retry-After': '1'})) is None
+    assert RetryPolicy(max_retries=0).delay(1, requests.Timeout()) is None
@@ -0,0 +1,95 @@
+import os
+
+import archive_scanner
+from archive_scanner import IgnoreRules, ScanManifest, iter_files
+
+EXTENSIONS = {'.mp3', '.tmp'}
+
+
+def make_tree(root, paths):
+    for rel_path in paths:
+        path = root / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'x')
+
+
+def scanned(root, **kwargs):
+    return [path.relative_to(root).as_posix() for path in iter_files(root, EXTENSIONS, **kwargs)]
+
+
+def test_ignore_rules_match():
+    rules = IgnoreRules(['# comentario', '', '*.tmp', 'borradores/', '2019/crudo/*'])
+    table = [
+        ('a.tmp', 'a.tmp', False, True),
+        ('x/y/a.tmp', 'a.tmp', False, True),
+        ('a.mp3', 'a.mp3', False, False),
+        ('x/borradores', 'borradores', True, True),
+        ('x/borradores', 'borradores', False, False),
+        ('2019/crudo/a.mp3', 'a.mp3', False, True),
+        ('2020/crudo/a.mp3', 'a.mp3', False, False),
+        ('# comentario', '# comentario', False, False),
+    ]
+    for rel_path, name, is_dir, expected in table:
+        assert rules.match(rel_path, name, is_dir) == expected, rel_path
+
+
+def test_ignore_rules_negation():
+    rules = IgnoreRules(['*.tmp', '!final.tmp', 'viejo/final.tmp', '\\!raro.mp3'])
+    table = [
+        ('a.tmp', 'a.tmp', True),
+        ('final.tmp', 'final.tmp', False),
+        ('x/final.tmp', 'final.tmp', False),
+        ('viejo/final.tmp', 'final.tmp', True),
+        ('!raro.mp3', '!raro.mp3', True),
+        ('raro.mp3', 'raro.mp3', False),
+    ]
+    for rel_path, name, expected in table:
+        assert rules.match(rel_path, name, False) == expected, rel_path
+
+
+def test_scan_prunes_ignored_directories(tmp_path):
+    make_tree(tmp_path, ['a.mp3', 'a.tmp', 'final.tmp', 'borradores/b.mp3', 'borradores/final.tmp',
+                         'disco/c.mp3', 'Uploaded/d.mp3'])
+    rules = IgnoreRules(['*.tmp', '!final.tmp', 'borradores/'])
+
+    # Lo que está dentro de una carpeta descartada no se recupera con "!"
+    assert scanned(tmp_path, ignore=rules) == ['a.mp3', 'final.tmp', 'disco/c.mp3']
+
+
+def test_manifest_replays_unchanged_directories(tmp_path, monkeypatch):
+    root = tmp_path / 'audio'
+    make_tree(root, ['a.mp3', 'uno/b.mp3', 'uno/sub/c.mp3', 'dos/d.mp3'])
+    for directory in (root, root / 'uno', root / 'uno' / 'sub', root / 'dos'):
+        os.utime(directory, ns=(10 ** 18, 10 ** 18))
+    manifest_path = str(tmp_path / 'manifest.json')
+
+    listed = []
+    real_scandir = os.scandir
+
+    def scandir(path):
+        listed.append(os.path.relpath(path, root))
+        return real_scandir(path)
+
+    monkeypatch.setattr(archive_scanner.os, 'scandir', scandir)
+    expected = ['a.mp3', 'dos/d.mp3', 'uno/b.mp3', 'uno/sub/c.mp3']
+
+    assert scanned(root, manifest=ScanManifest(manifest_path)) == expected
+    assert len(listed) == 4
+
+    # Sin cambios: todo sale del manifiesto guardado, sin listar nada
+    listed.clear()
+    manifest = ScanManifest(manifest_path)
+    assert scanned(root, manifest=manifest) == expected
+    assert listed == []
+    assert manifest.signature(root / 'uno' / 'b.mp3') == (1, (root / 'uno' / 'b.mp3').stat().st_mtime_ns)
+
+    # Un archivo nuevo cambia el mtime de su carpeta: solo esa se vuelve a listar
+    (root / 'uno' / 'e.mp3').write_bytes(b'x')
+    assert scanned(root, manifest=ScanManifest(manifest_path)) == expected[:3] + ['uno/e.mp3', 'uno/sub/c.mp3']
+    assert listed == ['uno']
+
+    # Reglas distintas invalidan el manifiesto
+    listed.clear()
+    assert scanned(root, manifest=ScanManifest(manifest_path), ignore=IgnoreRules(['dos/'])) == \
+        ['a.mp3', 'uno/b.mp3', 'uno/e.mp3', 'uno/sub/c.mp3']
+    assert sorted(listed) == ['.', 'uno', 'uno/sub']
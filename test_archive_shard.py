@@ -0,0 +1,86 @@
+import pytest
+
+from archive_shard import Shard, parse_shard, shard_of
+
+
+def test_parse_shard():
+    assert parse_shard('2/4') == (2, 4)
+    for text in ('0/4', '5/4', '1/0', 'x', '1-4'):
+        with pytest.raises(ValueError):
+            parse_shard(text)
+
+
+def test_every_file_goes_to_exactly_one_shard(tmp_path):
+    paths = [tmp_path / f'dir{i % 7}' / f'{i}.mp3' for i in range(500)]
+    shards = [Shard(index, 4) for index in range(1, 5)]
+
+    owners = [[shard.index for shard in shards if shard.owns_path(path, tmp_path)] for path in paths]
+
+    assert all(len(owner) == 1 for owner in owners)
+    counts = [sum(owner == [index] for owner in owners) for index in range(1, 5)]
+    assert min(counts) > 500 / 4 * 0.7
+
+
+def test_assignment_does_not_depend_on_mount_point(tmp_path):
+    shard = Shard(1, 3)
+    for i in range(50):
+        rel = f'álbum/{i}.mp3'
+        assert shard.owns_path(tmp_path / 'a' / rel, tmp_path / 'a') == \
+            shard.owns_path(tmp_path / 'mnt' / 'b' / rel, tmp_path / 'mnt' / 'b')
+        assert shard.owns(rel) == (shard_of(rel, 3) == 1)
+
+
+def test_progress_database_per_shard():
+    assert Shard(2, 4).progress_db('.archive_progress.db') == '.archive_progress.shard2of4.db'
+
+
+def shard_uploaders(tmp_path, monkeypatch, count):
+    monkeypatch.chdir(tmp_path)
+    from archive_uploader import ArchiveUploader
+    uploaders = []
+    for index in range(1, count + 1):
+        shard = Shard(index, count)
+        uploader = ArchiveUploader('Autor', 'opensource', preflight=False, extract_metadata=False,
+                                   progress_db=shard.progress_db('.archive_progress.db'))
+        uploader.shard = shard
+        uploaders.append(uploader)
+    return uploaders
+
+
+def test_uploader_filters_scanned_files(tmp_path, monkeypatch):
+    root = tmp_path / 'material'
+    root.mkdir()
+    for i in range(40):
+        (root / f'{i}.mp3').write_bytes(b'x')
+
+    owned = []
+    for uploader in shard_uploaders(tmp_path, monkeypatch, 2):
+        owned.append(set(uploader.shard_files(uploader.scan_directory(root))))
+        uploader.progress.close()
+
+    assert owned[0].isdisjoint(owned[1])
+    assert owned[0] | owned[1] == set(root.iterdir())
+    assert (tmp_path / '.archive_progress.shard1of2.db').exists()
+
+
+def test_same_named_files_land_on_one_shard(tmp_path, monkeypatch):
+    root = tmp_path / 'material'
+    for album in ('a', 'b', 'c'):
+        (root / album).mkdir(parents=True)
+        for track in range(1, 9):
+            (root / album / f'{track:02d}.mp3').write_bytes(b'x')
+
+    identifiers = []
+    owners = {}
+    for uploader in shard_uploaders(tmp_path, monkeypatch, 2):
+        owned = list(uploader.shard_files(uploader.scan_directory(root)))
+        for file_path in owned:
+            owners.setdefault(file_path.name, set()).add(uploader.shard.index)
+        identifiers.extend(uploader.assign_identifiers(owned).values())
+        uploader.progress.close()
+
+    # Cada "01.mp3" de todos los álbumes lo sube un solo equipo, que les da identificadores distintos
+    assert all(len(shards) == 1 for shards in owners.values())
+    assert len({min(shards) for shards in owners.values()}) == 2
+    assert len(identifiers) == 24
+    assert len(set(identifiers)) == 24
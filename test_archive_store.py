@@ -0,0 +1,111 @@
+import json
+import sqlite3
+
+import pytest
+
+from archive_store import MIGRATIONS, MergeConflictError, ProgressStore
+
+
+def entry(status, date, identifier='autor-a'):
+    return {'status': status, 'identifier': identifier, 'date': date}
+
+
+def test_migrates_an_older_database(tmp_path):
+    path = str(tmp_path / 'progress.db')
+    conn = sqlite3.connect(path)
+    conn.executescript(f'{MIGRATIONS[0]}; PRAGMA user_version = 1;')
+    conn.execute("INSERT INTO progress (path, status, data) VALUES ('a.mp3', 'success', ?)",
+                 (json.dumps({'status': 'success'}),))
+    conn.commit()
+    conn.close()
+
+    store = ProgressStore(path)
+
+    assert store._conn.execute('PRAGMA user_version').fetchone()[0] == len(MIGRATIONS)
+    assert store['a.mp3'] == {'status': 'success'}
+    store.queue_verification('a.mp3', 'autor-a', 'a.mp3', 1, 'md5', 0)
+    assert store.count_verifications() == 1
+
+
+def test_indexed_lookups(tmp_path):
+    store = ProgressStore(str(tmp_path / 'progress.db'))
+    store.update({'a.mp3': entry('success', '2025-01-01', 'autor-a'),
+                  'b.mp3': entry('error', '2025-01-01', 'autor-b')})
+
+    assert store.by_status('error') == [('b.mp3', entry('error', '2025-01-01', 'autor-b'))]
+    assert [path for path, _ in store.by_identifier('autor-a')] == ['a.mp3']
+    assert store.count_by_status() == {'success': 1, 'error': 1}
+
+
+def test_legacy_json_imported_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'legacy.json').write_text(json.dumps({'a.mp3': entry('success', '2025-01-01')}))
+    store = ProgressStore('progress.db')
+
+    assert store.import_legacy('legacy.json') == 1
+    del store['a.mp3']
+    assert store.import_legacy('legacy.json') == 0
+    assert 'a.mp3' not in store
+
+
+def test_damaged_legacy_json_is_an_error(tmp_path):
+    (tmp_path / 'legacy.json').write_text('{"a.mp3": {"status": ')
+    store = ProgressStore(str(tmp_path / 'progress.db'))
+    with pytest.raises(ValueError):
+        store.import_json(str(tmp_path / 'legacy.json'))
+
+
+def test_merge_keeps_success_and_newest(tmp_path):
+    store = ProgressStore(str(tmp_path / 'main.db'))
+    store.update({
+        'done.mp3': entry('success', '2025-01-01'),
+        'old.mp3': entry('error', '2025-01-01'),
+        'new.mp3': entry('error', '2025-03-01'),
+        'dup.mp3': entry('duplicate', '2025-01-01'),
+        'remote.mp3': entry('remote', '2025-01-01'),
+        'later.mp3': entry('remote', '2025-01-01'),
+    })
+    store.register_identifiers({'/a/done.mp3': 'autor-done'})
+    other = ProgressStore(str(tmp_path / 'shard.db'))
+    other.update({
+        'done.mp3': entry('error', '2025-05-01'),
+        'old.mp3': entry('success', '2025-02-01'),
+        'new.mp3': entry('error', '2025-02-01'),
+        'only.mp3': entry('success', '2025-02-01'),
+        'dup.mp3': entry('error', '2025-05-01'),
+        'remote.mp3': entry('retry', '2025-05-01'),
+        'later.mp3': entry('success', '2025-02-01'),
+    })
+    other.register_identifiers({'/b/only.mp3': 'autor-only'})
+    other.close()
+
+    assert store.merge(str(tmp_path / 'shard.db')) == 3
+
+    assert store['done.mp3']['status'] == 'success'
+    assert store['old.mp3']['status'] == 'success'
+    assert store['new.mp3']['date'] == '2025-03-01'
+    assert store['only.mp3']['status'] == 'success'
+    # Un error o reintento más reciente no vuelve a abrir un duplicado ni un item remoto
+    assert store['dup.mp3']['status'] == 'duplicate'
+    assert store['remote.mp3']['status'] == 'remote'
+    assert store['later.mp3']['status'] == 'success'
+    assert store.get_identifiers(['/a/done.mp3', '/b/only.mp3']) == {
+        '/a/done.mp3': 'autor-done', '/b/only.mp3': 'autor-only'}
+
+
+def test_merge_reports_identifier_conflicts(tmp_path):
+    store = ProgressStore(str(tmp_path / 'main.db'))
+    store.register_identifiers({'/a/01.mp3': 'autor-01'})
+    store['/a/01.mp3'] = entry('success', '2025-01-01', 'autor-01')
+    other = ProgressStore(str(tmp_path / 'shard.db'))
+    other.register_identifiers({'/b/01.mp3': 'autor-01'})
+    other['/b/01.mp3'] = entry('success', '2025-01-01', 'autor-01')
+    other.close()
+
+    with pytest.raises(MergeConflictError) as error:
+        store.merge(str(tmp_path / 'shard.db'))
+
+    assert error.value.conflicts == [('autor-01', '/a/01.mp3', '/b/01.mp3')]
+    # Nada se fusionó a medias
+    assert '/b/01.mp3' not in store
+    assert store.get_identifiers(['/b/01.mp3']) == {}
@@ -0,0 +1,100 @@
+import requests
+
+from archive_uploader import ArchiveUploader
+
+
+def make_uploader(tmp_path, monkeypatch, **kwargs):
+    monkeypatch.chdir(tmp_path)
+    return ArchiveUploader('Autor', 'opensource', preflight=False, extract_metadata=False, **kwargs)
+
+
+def test_file_size_is_current_after_scan(tmp_path, monkeypatch):
+    uploader = make_uploader(tmp_path, monkeypatch, multipart_threshold=1000)
+    audio = tmp_path / 'audio'
+    audio.mkdir()
+    path = audio / 'a.mp3'
+    path.write_bytes(b'x' * 10)
+    assert uploader.scan_directory(audio) == [path]
+
+    # El archivo crece después del escaneo (p. ej. una grabación que sigue copiándose)
+    path.write_bytes(b'x' * 5000)
+
+    assert uploader.get_file_size(path) == 5000
+    assert uploader.use_multipart(path)
+
+
+class FakeItem:
+    def __init__(self):
+        self.keys = []
+
+    def upload_file(self, body, key, metadata, queue_derive):
+        self.keys.append(key)
+        response = requests.Response()
+        response.status_code = 200
+        return response
+
+
+def test_interrupted_group_keeps_uploaded_keys(tmp_path, monkeypatch):
+    uploader = make_uploader(tmp_path, monkeypatch, disposition='keep', multipart_threshold=0)
+    files = []
+    for album in ('a', 'b'):
+        (tmp_path / album).mkdir()
+        files.append(tmp_path / album / 'x.mp3')
+        files[-1].write_bytes(album.encode())
+    first, second = files
+    # Una ejecución anterior subió b/x.mp3 como "x.mp3" y se cortó antes de a/x.mp3
+    uploader.progress[str(second)] = {'status': 'success', 'identifier': 'autor-g', 'key': 'x.mp3',
+                                      'date': '2025-01-01T00:00:00'}
+    item = FakeItem()
+    monkeypatch.setattr(uploader, 'get_item', lambda identifier: item)
+
+    assert uploader.upload_group('autor-g', 'g', files) == (2, 0)
+
+    assert item.keys == ['a_x.mp3']
+    assert uploader.progress[str(first)]['key'] == 'a_x.mp3'
+
+
+def test_group_keys_do_not_depend_on_order(tmp_path, monkeypatch):
+    uploader = make_uploader(tmp_path, monkeypatch)
+    files = [tmp_path / 'b' / 'x.mp3', tmp_path / 'a' / 'x.mp3', tmp_path / 'a' / 'y.mp3']
+
+    keys = uploader.group_keys('autor-g', files)
+
+    assert keys == uploader.group_keys('autor-g', list(reversed(files)))
+    assert keys == {files[1]: 'x.mp3', files[0]: 'b_x.mp3', files[2]: 'y.mp3'}
+
+
+def test_finished_jobs_drop_extracted_metadata(tmp_path, monkeypatch):
+    uploader = make_uploader(tmp_path, monkeypatch)
+    done = tmp_path / 'done.mp3'
+    duplicate = tmp_path / 'duplicate.mp3'
+    for path in (done, duplicate):
+        path.write_bytes(b'same content')
+        uploader._media_info[str(path)] = {'title': path.stem}
+    uploader.progress[str(done)] = {'status': 'success', 'md5': uploader.file_md5(done),
+                                    'date': '2025-01-01T00:00:00'}
+
+    assert not uploader.stage_hash({'file_path': done})
+    assert not uploader.stage_hash({'file_path': duplicate})
+
+    assert uploader._media_info == {}
+
+
+def test_first_file_skips_the_preflight_batch(tmp_path, monkeypatch):
+    uploader = make_uploader(tmp_path, monkeypatch)
+    batches = []
+    monkeypatch.setattr(uploader, 'preflight', lambda batch: batches.append(len(batch)))
+    pulled = []
+
+    def scanned():
+        for n in range(300):
+            pulled.append(n)
+            yield tmp_path / f'{n}.mp3'
+
+    stream = uploader.preflight_files(scanned())
+    assert next(stream) == tmp_path / '0.mp3'
+    assert pulled == [0]
+
+    assert len(list(stream)) == 299
+    assert batches[:4] == [1, 2, 4, 8]
+    assert max(batches) == 100
@@ -0,0 +1,71 @@
+import pytest
+
+from archive_store import ProgressStore
+from archive_verify import Verifier, compare_listing
+
+
+def make_verifier(tmp_path, listing, on_verified=None, on_failed=None):
+    store = ProgressStore(str(tmp_path / 'progress.db'))
+    results = {'verified': [], 'failed': []}
+    verifier = Verifier(
+        store, lambda identifier: listing.get(identifier, []),
+        on_verified or (lambda path, row: results['verified'].append(path)),
+        on_failed or (lambda path, row, reason: results['failed'].append(path)),
+        batch_size=10)
+    return store, verifier, results
+
+
+def test_compare_listing():
+    row = {'key': 'a.mp3', 'size': 3, 'md5': 'abc'}
+    assert compare_listing(row, {'a.mp3': {'size': '3', 'md5': 'abc'}}) == (True, '')
+    assert compare_listing(row, {})[0] is None
+    assert compare_listing(row, {'a.mp3': {'size': '3'}})[0] is None
+    assert compare_listing(row, {'a.mp3': {'size': '4', 'md5': 'abc'}})[0] is False
+    assert compare_listing(row, {'a.mp3': {'size': '3', 'md5': 'xyz'}})[0] is False
+
+
+def test_batch_verifies_fails_and_postpones(tmp_path):
+    listing = {'item': [{'name': 'ok.mp3', 'size': '3', 'md5': 'aaa'},
+                        {'name': 'bad.mp3', 'size': '3', 'md5': 'zzz'}]}
+    store, verifier, results = make_verifier(tmp_path, listing)
+    verifier.queue('ok.mp3', 'item', 'ok.mp3', 3, 'aaa')
+    verifier.queue('bad.mp3', 'item', 'bad.mp3', 3, 'bbb')
+    verifier.queue('late.mp3', 'item', 'late.mp3', 3, 'ccc')
+
+    assert verifier.verify_batch(due_only=False) == 3
+
+    assert results == {'verified': ['ok.mp3'], 'failed': ['bad.mp3']}
+    pending = store.due_verifications(10)
+    assert [row['path'] for row in pending] == ['late.mp3']
+    assert pending[0]['attempts'] == 1
+
+
+def test_row_survives_a_crash_before_the_result_is_recorded(tmp_path):
+    listing = {'item': [{'name': 'ok.mp3', 'size': '3', 'md5': 'aaa'}]}
+
+    def crash(path, row):
+        raise KeyboardInterrupt  # el proceso muere mientras se libera el archivo
+
+    store, verifier, _ = make_verifier(tmp_path, listing, on_verified=crash)
+    verifier.queue('ok.mp3', 'item', 'ok.mp3', 3, 'aaa')
+    with pytest.raises(KeyboardInterrupt):
+        verifier.verify_batch(due_only=False)
+    assert verifier.backlog() == 1
+
+    # Al volver a arrancar el archivo se verifica y se libera
+    _, verifier, results = make_verifier(tmp_path, listing)
+    verifier.verify_batch(due_only=False)
+    assert results['verified'] == ['ok.mp3']
+    assert verifier.backlog() == 0
+
+
+def test_callback_error_keeps_row_pending(tmp_path):
+    listing = {'item': [{'name': 'ok.mp3', 'size': '3', 'md5': 'aaa'}]}
+
+    def broken(path, row):
+        raise OSError('disco lleno')
+
+    store, verifier, _ = make_verifier(tmp_path, listing, on_verified=broken)
+    verifier.queue('ok.mp3', 'item', 'ok.mp3', 3, 'aaa')
+    verifier.verify_batch(due_only=False)
+    assert [row['path'] for row in store.due_verifications(10)] == ['ok.mp3']
@@ -0,0 +1,41 @@
+import os
+import time
+
+from archive_watch import IN_MOVED_FROM, DirectoryWatcher
+
+
+def deliver(watcher, path, now):
+    watcher._touch(str(path))
+    signature, _ = watcher._pending[str(path)]
+    watcher._pending[str(path)] = (signature, now - watcher.settle)
+    return watcher._settled()
+
+
+def test_delivered_files_are_forgotten(tmp_path):
+    watcher = DirectoryWatcher(tmp_path, ['.mp3'], poll_interval=1, settle=0.1)
+    watcher.start()
+    path = tmp_path / 'a.mp3'
+    path.write_bytes(b'x')
+    now = time.monotonic()
+
+    assert deliver(watcher, path, now) == [path]
+    # Mientras está en curso, un evento sin cambios no lo vuelve a entregar
+    assert deliver(watcher, path, now) == []
+
+    watcher.forget(path)
+    assert watcher._delivered == {}
+
+
+def test_moved_away_files_are_dropped(tmp_path):
+    watcher = DirectoryWatcher(tmp_path, ['.mp3'], poll_interval=1, settle=0.1)
+    watcher.start()
+    path = tmp_path / 'a.mp3'
+    path.write_bytes(b'x')
+    assert deliver(watcher, path, time.monotonic()) == [path]
+
+    (tmp_path / 'Uploaded').mkdir()
+    os.rename(path, tmp_path / 'Uploaded' / 'a.mp3')
+    watcher._handle_events([(str(tmp_path), 'a.mp3', IN_MOVED_FROM)])
+
+    assert watcher._delivered == {}
+    assert watcher._pending == {}